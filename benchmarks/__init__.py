@@ -0,0 +1,11 @@
+"""Бенчмарки проекта.
+
+Django настраивается при импорте пакета, поэтому модули бенчмарков запускаются
+как python -m benchmarks.<имя>."""
+
+import os
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
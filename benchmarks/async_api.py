@@ -0,0 +1,232 @@
+"""Бенчмарк API привычек под WSGI (gunicorn, потоки) и ASGI (uvicorn) при
+медленной БД.
+
+Серверы запускаются отдельными процессами на временной базе данных и ходят в
+Postgres через TCP-прокси, который задерживает каждый ответ БД на --db-latency
+миллисекунд. --clients клиентов одновременно запрашивают список привычек с
+JWT; выводятся запросы в секунду и перцентили времени ответа. Под WSGI число
+одновременно обрабатываемых запросов ограничено --workers x --threads, под
+ASGI — только нагрузкой на процессор.
+
+python -m benchmarks.async_api --clients 50 --requests 1000 --db-latency 50
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import aiohttp
+from django.db import connection
+from rest_framework_simplejwt.tokens import AccessToken
+
+from benchmarks.utils import benchmark_database, report
+from habits.models import Habit
+from users.models import User
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class SlowDatabaseProxy:
+    """TCP-прокси к Postgres, задерживающий ответы БД на latency секунд."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.port = free_port()
+        self.loop = asyncio.new_event_loop()
+        self.started = threading.Event()
+
+    async def open_upstream(self):
+        settings = connection.settings_dict
+        host, port = settings["HOST"] or "localhost", settings["PORT"] or 5432
+        if host.startswith("/"):
+            return await asyncio.open_unix_connection(f"{host}/.s.PGSQL.{port}")
+        return await asyncio.open_connection(host, port)
+
+    async def pipe(self, reader, writer, delay):
+        try:
+            while data := await reader.read(65536):
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, client_reader, client_writer):
+        server_reader, server_writer = await self.open_upstream()
+        await asyncio.gather(
+            self.pipe(client_reader, server_writer, 0),
+            self.pipe(server_reader, client_writer, self.latency),
+        )
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(
+            asyncio.start_server(self.handle, "127.0.0.1", self.port)
+        )
+        self.started.set()
+        self.loop.run_forever()
+
+    def __enter__(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        self.started.wait()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def start_server(command, proxy):
+    env = dict(
+        os.environ,
+        DEBUG="False",
+        POSTGRES_DB=connection.settings_dict["NAME"],
+        POSTGRES_HOST="127.0.0.1",
+        POSTGRES_PORT=str(proxy.port),
+    )
+    return subprocess.Popen(
+        command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(url, headers, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession(headers=headers) as session:
+        while True:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} не отвечает")
+            await asyncio.sleep(0.2)
+
+
+async def load(url, headers, clients, requests_count):
+    """Выполняет requests_count запросов clients клиентами одновременно и
+    возвращает (запросов в секунду, времена ответов в мс)."""
+
+    latencies = []
+    remaining = requests_count
+
+    async def get(session):
+        async with session.get(url) as response:
+            await response.read()
+            assert response.status == 200, response.status
+
+    async def client(session):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            await get(session)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    connector = aiohttp.TCPConnector(limit=clients)
+    async with aiohttp.ClientSession(headers=headers, connector=connector) as session:
+        # Прогрев: соединения клиентов и воркеры сервера
+        await asyncio.gather(*(get(session) for _ in range(clients)))
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+    return requests_count / elapsed, latencies
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--db-latency", type=float, default=50, help="мс")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=4, help="потоков gunicorn")
+    args = parser.parse_args()
+
+    servers = {
+        f"WSGI gunicorn {args.workers}x{args.threads} threads": [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "config.wsgi:application",
+            "--worker-class",
+            "gthread",
+            "--workers",
+            str(args.workers),
+            "--threads",
+            str(args.threads),
+        ],
+        f"ASGI uvicorn {args.workers} workers": [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "config.asgi:application",
+            "--workers",
+            str(args.workers),
+            "--lifespan",
+            "off",
+            "--no-access-log",
+        ],
+    }
+
+    results = {}
+    with benchmark_database(), SlowDatabaseProxy(args.db_latency / 1000) as proxy:
+        user = User.objects.create(email="user@email.com")
+        Habit.objects.bulk_create(
+            Habit(
+                user=user,
+                place="дома",
+                do_at="2024-10-05T07:00:00+03:00",
+                action=f"отжиматься {i}",
+                reward="съесть конфетку",
+                duration=60,
+            )
+            for i in range(100)
+        )
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        # Соединение бенчмарка не должно мешать удалению базы после замеров
+        connection.close()
+
+        for name, command in servers.items():
+            port = free_port()
+            if "gunicorn" in command:
+                command = command + ["--bind", f"127.0.0.1:{port}"]
+            else:
+                command = command + ["--host", "127.0.0.1", "--port", str(port)]
+            url = f"http://127.0.0.1:{port}/habits/"
+            process = start_server(command, proxy)
+            try:
+                asyncio.run(wait_ready(url, headers))
+                rps, latencies = asyncio.run(
+                    load(url, headers, args.clients, args.requests)
+                )
+            finally:
+                process.terminate()
+                process.wait()
+            results[f"{name}, req/s"] = rps
+            for q in (50, 95, 99):
+                results[f"{name}, p{q}, ms"] = percentile(latencies, q)
+    report(
+        f"habit list, {args.clients} clients, database latency {args.db_latency} ms",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    main()
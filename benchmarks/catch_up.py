@@ -0,0 +1,50 @@
+"""Бенчмарк переноса просроченных привычек после простоя планировщика.
+
+python -m benchmarks.catch_up --habits 1000000
+"""
+
+import argparse
+
+from django.db import connection
+
+from benchmarks.utils import benchmark_database, report, timer
+from habits.models import Habit
+from habits.tasks import catch_up_overdue_habits
+from users.models import User
+
+
+def seed(habits_count):
+    """Создает просроченные привычки одним INSERT ... SELECT FROM generate_series."""
+
+    user = User.objects.create(email="user@email.com", tg_chat_id="1")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Habit._meta.db_table}
+                (user_id, place, do_at, action, is_enjoyable, periodicity,
+                 reward, duration, is_public, updated_at)
+            SELECT %s, 'дома', NOW() - (i %% 1000) * interval '1 hour', 'отжиматься',
+                false, 1 + i %% 7, 'съесть конфетку', 60, false, NOW()
+            FROM generate_series(1, %s) AS i
+            """,
+            [user.pk, habits_count],
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--habits", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    results = {}
+    with benchmark_database():
+        with timer(results, "seed, s"):
+            seed(args.habits)
+        with timer(results, "catch up, s"):
+            results["moved"] = catch_up_overdue_habits(batch_size=args.batch_size)
+    report(f"catch_up_overdue_habits, {args.habits} overdue habits", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Бенчмарк загрузки больших фикстур: loaddata против stream_loaddata.
+
+Генерирует фикстуры users.json и habits.json (пятая часть привычек ссылается
+на случайную привычку, в том числе идущую в файле позже) и загружает их
+каждой командой в отдельном процессе. Выводятся время загрузки и пиковая
+память процесса. loaddata читает файл целиком, поэтому на больших фикстурах
+его можно пропустить флагом --skip-loaddata.
+
+python -m benchmarks.fixture_load --habits 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.db import connection
+
+from benchmarks.utils import benchmark_database, report
+from habits.models import Habit
+from users.models import User
+
+HABITS_PER_USER = 100
+
+
+def write_fixtures(directory, habits_count):
+    """Записывает фикстуры построчно, не держа их в памяти."""
+
+    users_count = max(1, habits_count // HABITS_PER_USER)
+    users_path = os.path.join(directory, "users.json")
+    with open(users_path, "w", encoding="utf-8") as file:
+        file.write("[\n")
+        for pk in range(1, users_count + 1):
+            user = {
+                "model": "users.user",
+                "pk": pk,
+                "fields": {
+                    "password": "!",
+                    "email": f"user_{pk}@email.com",
+                    "is_active": True,
+                    "date_joined": "2024-10-01T00:00:00Z",
+                },
+            }
+            file.write(("" if pk == 1 else ",\n") + json.dumps(user))
+        file.write("\n]\n")
+
+    habits_path = os.path.join(directory, "habits.json")
+    random.seed(0)
+    with open(habits_path, "w", encoding="utf-8") as file:
+        file.write("[\n")
+        for pk in range(1, habits_count + 1):
+            related = random.randint(1, habits_count) if pk % 5 == 0 else None
+            habit = {
+                "model": "habits.habit",
+                "pk": pk,
+                "fields": {
+                    "user": 1 + pk % users_count,
+                    "place": "дома",
+                    "do_at": "2024-10-05T07:00:00Z",
+                    "action": f"отжиматься {pk}",
+                    "is_enjoyable": related is None,
+                    "related_habit": related,
+                    "periodicity": 1,
+                    "reward": None,
+                    "duration": 60,
+                    "is_public": pk % 2 == 0,
+                    "updated_at": "2024-10-05T07:00:00Z",
+                },
+            }
+            file.write(
+                ("" if pk == 1 else ",\n") + json.dumps(habit, ensure_ascii=False)
+            )
+        file.write("\n]\n")
+    return [users_path, habits_path]
+
+
+def run(command, paths):
+    """Запускает команду manage.py на временной базе; возвращает (секунды, МБ)."""
+
+    # При DEBUG Django хранит текст последних запросов, в том числе многомегабайтных
+    env = dict(os.environ, DEBUG="False", POSTGRES_DB=connection.settings_dict["NAME"])
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "manage.py", command, *paths],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f"{command} завершился с кодом {process.returncode}")
+    # ru_maxrss в Linux — в килобайтах
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def truncate():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"TRUNCATE {Habit._meta.db_table}, {User._meta.db_table} "
+            "RESTART IDENTITY CASCADE"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--habits", type=int, default=1_000_000)
+    parser.add_argument("--skip-loaddata", action="store_true")
+    args = parser.parse_args()
+
+    commands = ["stream_loaddata"]
+    if not args.skip_loaddata:
+        commands.insert(0, "loaddata")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, benchmark_database():
+        paths = write_fixtures(directory, args.habits)
+        results["fixture size, MB"] = sum(map(os.path.getsize, paths)) / 2**20
+        # Соединение бенчмарка не должно держать блокировки во время загрузки
+        connection.close()
+        for command in commands:
+            elapsed, memory = run(command, paths)
+            results[f"{command}, s"] = elapsed
+            results[f"{command}, habits/s"] = args.habits / elapsed
+            results[f"{command}, peak memory, MB"] = memory
+            loaded = Habit.objects.count()
+            assert loaded == args.habits, loaded
+            truncate()
+            connection.close()
+    report(f"fixture load, {args.habits} habits", results)
+
+
+if __name__ == "__main__":
+    main()
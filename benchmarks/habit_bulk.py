@@ -0,0 +1,70 @@
+"""Бенчмарк импорта привычек: по одной через POST /habits/ против /habits/bulk/.
+
+python -m benchmarks.habit_bulk --habits 2000 --batch-size 500
+"""
+
+import argparse
+import time
+
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import benchmark_database, report
+from habits.models import Habit
+from users.models import User
+
+
+def habit_data(related_habit_id, i):
+    return {
+        "place": "дома",
+        "do_at": "2024-10-05T07:00:00+03:00",
+        "action": f"отжиматься {i}",
+        "related_habit": related_habit_id if i % 2 else None,
+        "reward": None if i % 2 else "съесть конфетку",
+        "duration": 60,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--habits", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    results = {}
+    with benchmark_database():
+        user = User.objects.create(email="user@email.com")
+        client = APIClient()
+        client.force_authenticate(user=user)
+        related = Habit.objects.create(
+            user=user,
+            place="дома",
+            do_at="2024-10-05T07:00:00+03:00",
+            action="лежать",
+            is_enjoyable=True,
+            duration=60,
+        )
+        data = [habit_data(related.pk, i) for i in range(args.habits)]
+
+        start = time.perf_counter()
+        for item in data:
+            response = client.post(reverse("habits:habit-list"), item, format="json")
+            assert response.status_code == 201, response.content
+        results["one at a time, habits/s"] = args.habits / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(0, args.habits, args.batch_size):
+            response = client.post(
+                reverse("habits:habit-bulk"),
+                data[i : i + args.batch_size],
+                format="json",
+            )
+            assert response.status_code == 201, response.content
+        results[f"bulk by {args.batch_size}, habits/s"] = args.habits / (
+            time.perf_counter() - start
+        )
+    report(f"habit import, {args.habits} habits", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Бенчмарк календаря привычек: векторное вычисление времен выполнения NumPy
+(/habits/calendar/) против вложенных циклов Python по привычкам и дням.
+
+Запрос выполняется в процессе бенчмарка через ASGI-клиент Django, цикл Python
+считает и форматирует те же времена по тем же строкам привычек.
+
+python -m benchmarks.habit_calendar --habits 100000 --days 90
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import resource
+import time
+from datetime import datetime
+from datetime import time as day_start
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from benchmarks.utils import benchmark_database, report
+from habits.models import Habit
+from habits.serializers import datetime_to_representation
+from users.models import User
+
+
+def seed(habits_count):
+    """Привычки с периодичностью от 1 до 7 дней и разным временем выполнения."""
+
+    user = User.objects.create(email="user@email.com")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Habit._meta.db_table}
+                (user_id, place, do_at, action, is_enjoyable, periodicity,
+                 reward, duration, is_public, updated_at)
+            SELECT %s, 'дома', NOW() + i * interval '7 minutes', 'отжиматься ' || i,
+                false, 1 + i %% 7, 'съесть конфетку', 60, false, NOW()
+            FROM generate_series(1, %s) AS i
+            """,
+            [user.pk, habits_count],
+        )
+        cursor.execute(f"ANALYZE {Habit._meta.db_table}")
+    return user
+
+
+def peak_memory_mb():
+    # ru_maxrss в Linux — в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def calendar(client, params, headers):
+    response = await client.get(
+        reverse("habits:habit-calendar"), params, headers=headers
+    )
+    assert response.status_code == 200, response.status_code
+    size = occurrences = 0
+    async for part in response.streaming_content:
+        size += len(part)
+        occurrences += part.count(b'","') + part.count(b"\n")
+    return size, occurrences
+
+
+def python_loops(start, end):
+    """Те же времена выполнения циклом по привычкам и дням."""
+
+    zone = timezone.get_current_timezone()
+    occurrences = 0
+    for pk, do_at, periodicity in (
+        Habit.objects.order_by("id")
+        .values_list("id", "do_at", "periodicity")
+        .iterator(chunk_size=2000)
+    ):
+        period = timedelta(days=max(periodicity, 1))
+        moment = do_at + period * math.ceil((start - do_at) / period)
+        times = []
+        while moment < end:
+            times.append(datetime_to_representation(moment, zone))
+            moment += period
+        occurrences += len(times)
+        json.dumps({"habit": pk, "occurrences": times})
+    return occurrences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--habits", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    results = {}
+    with benchmark_database():
+        user = seed(args.habits)
+        client = AsyncClient()
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        first_day = timezone.localdate()
+        last_day = first_day + timedelta(days=args.days - 1)
+        params = {"from": first_day.isoformat(), "to": last_day.isoformat()}
+        results["baseline peak memory, MB"] = peak_memory_mb()
+
+        start = time.perf_counter()
+        size, occurrences = asyncio.run(calendar(client, params, headers))
+        elapsed = time.perf_counter() - start
+        results["occurrences"] = occurrences
+        results["numpy, s"] = elapsed
+        results["numpy, occurrences/s"] = occurrences / elapsed
+        results["numpy, MB"] = size / 2**20
+        results["numpy, peak memory, MB"] = peak_memory_mb()
+
+        zone = timezone.get_current_timezone()
+        start_at, end_at = (
+            timezone.make_aware(datetime.combine(day, day_start.min), zone)
+            for day in (first_day, last_day + timedelta(days=1))
+        )
+        start = time.perf_counter()
+        loop_occurrences = python_loops(start_at, end_at)
+        elapsed = time.perf_counter() - start
+        results["python loops, s"] = elapsed
+        results["python loops, occurrences/s"] = loop_occurrences / elapsed
+        assert loop_occurrences == occurrences, (loop_occurrences, occurrences)
+        # Соединение потока sync_to_async не должно мешать удалению базы
+        asyncio.run(sync_to_async(connections.close_all)())
+    report(f"habit calendar, {args.habits} habits, {args.days} days", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Бенчмарк выгрузки привычек: поток /habits/export/ против постраничного
+чтения списка и загрузки всех строк в память.
+
+Запросы выполняются в процессе бенчмарка через ASGI-клиент Django. Пиковая
+память процесса (ru_maxrss) не уменьшается, поэтому замеры идут по
+возрастанию ожидаемой памяти: сначала поток, в конце — все строки в памяти.
+Полное чтение списка по страницам оценивается по --pages страницам.
+
+python -m benchmarks.habit_export --habits 1000000
+"""
+
+import argparse
+import asyncio
+import resource
+import time
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from benchmarks.utils import benchmark_database, report
+from habits.models import Habit
+from habits.serializers import HabitValuesSerializer
+from users.models import User
+
+
+def seed(habits_count):
+    user = User.objects.create(email="user@email.com")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Habit._meta.db_table}
+                (user_id, place, do_at, action, is_enjoyable, periodicity,
+                 reward, duration, is_public, updated_at)
+            SELECT %s, 'дома', NOW() + i * interval '1 minute', 'отжиматься ' || i,
+                false, 1, 'съесть конфетку', 60, false, NOW()
+            FROM generate_series(1, %s) AS i
+            """,
+            [user.pk, habits_count],
+        )
+        cursor.execute(f"ANALYZE {Habit._meta.db_table}")
+    return user
+
+
+def peak_memory_mb():
+    # ru_maxrss в Linux — в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def export(client, params, headers):
+    response = await client.get(reverse("habits:habit-export"), params, headers=headers)
+    assert response.status_code == 200, response.status_code
+    decompressor = None
+    if response.get("Content-Encoding") == "gzip":
+        decompressor = zlib.decompressobj(wbits=31)
+    size = lines = 0
+    async for part in response.streaming_content:
+        size += len(part)
+        if decompressor is not None:
+            part = decompressor.decompress(part)
+        lines += part.count(b"\n")
+    return size, lines
+
+
+async def paginate(client, pages, headers):
+    url = reverse("habits:habit-list")
+    params = {"page_size": 10}
+    for _ in range(pages):
+        response = await client.get(url, params, headers=headers)
+        assert response.status_code == 200, response.status_code
+        url = response.json()["next"]
+        params = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--habits", type=int, default=1_000_000)
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    results = {}
+    with benchmark_database():
+        user = seed(args.habits)
+        client = AsyncClient()
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        results["baseline peak memory, MB"] = peak_memory_mb()
+
+        for name, params, extra_headers in (
+            ("ndjson", {"format": "ndjson"}, {}),
+            ("csv", {"format": "csv"}, {}),
+            ("csv gzip", {"format": "csv"}, {"Accept-Encoding": "gzip"}),
+        ):
+            start = time.perf_counter()
+            size, lines = asyncio.run(
+                export(client, params, {**headers, **extra_headers})
+            )
+            elapsed = time.perf_counter() - start
+            results[f"export {name}, s"] = elapsed
+            results[f"export {name}, habits/s"] = args.habits / elapsed
+            results[f"export {name}, MB"] = size / 2**20
+            results[f"export {name}, peak memory, MB"] = peak_memory_mb()
+            assert lines >= args.habits, lines
+
+        start = time.perf_counter()
+        asyncio.run(paginate(client, args.pages, headers))
+        per_page = (time.perf_counter() - start) / args.pages
+        results["pages of 10, ms per page"] = per_page * 1000
+        results["pages of 10, estimated total, s"] = per_page * args.habits / 10
+
+        start = time.perf_counter()
+        serializer = HabitValuesSerializer()
+        rows = serializer.to_representation(
+            list(serializer.values(Habit.objects.order_by("do_at", "id")))
+        )
+        results["all rows in memory, s"] = time.perf_counter() - start
+        results["all rows in memory, peak memory, MB"] = peak_memory_mb()
+        del rows
+        # Соединение потока sync_to_async не должно мешать удалению базы
+        asyncio.run(sync_to_async(connections.close_all)())
+    report(f"habit export, {args.habits} habits", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Бенчмарк пагинации списка привычек: номер страницы (OFFSET + COUNT) против курсора.
+
+python -m benchmarks.habit_pagination --habits 150000 --pages 1 100 1000 10000
+"""
+
+import argparse
+import statistics
+import time
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.db import connection
+from django.urls import reverse
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIClient
+
+from benchmarks.utils import benchmark_database, report
+from habits.models import Habit
+from habits.paginators import Cursor, HabitPaginator
+from habits.views import HabitViewSet
+from users.models import User
+
+PAGE_SIZE = 10
+
+
+class OffsetPaginator(PageNumberPagination):
+    """Прежняя пагинация по номеру страницы."""
+
+    page_size = PAGE_SIZE
+
+
+def seed(habits_count):
+    """Создает привычки одного пользователя одним INSERT ... SELECT FROM generate_series."""
+
+    user = User.objects.create(email="user@email.com")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Habit._meta.db_table}
+                (user_id, place, do_at, action, is_enjoyable, periodicity,
+                 reward, duration, is_public, updated_at)
+            SELECT %s, 'дома', NOW() - i * interval '1 minute', 'отжиматься',
+                false, 1, 'съесть конфетку', 60, i %% 2 = 0, NOW()
+            FROM generate_series(1, %s) AS i
+            """,
+            [user.pk, habits_count],
+        )
+        cursor.execute(f"ANALYZE {Habit._meta.db_table}")
+    return user
+
+
+def measure(client, url, params, repeat):
+    """Медиана времени ответа в миллисекундах."""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, params)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.content
+    return statistics.median(timings)
+
+
+def cursor_params(user, page):
+    """Курсор на начало страницы page (считается заранее, вне замера)."""
+
+    if page == 1:
+        return {}
+    last = (
+        Habit.objects.filter(user=user)
+        .order_by(*HabitPaginator.ordering)
+        .values_list("do_at", "pk")[(page - 1) * PAGE_SIZE - 1]
+    )
+    paginator = HabitPaginator()
+    paginator.base_url = "http://testserver/"
+    url = paginator.encode_cursor(Cursor(*last, False))
+    return {"cursor": parse_qs(urlsplit(url).query)["cursor"][0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--habits", type=int, default=150_000)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = {}
+    with benchmark_database():
+        user = seed(args.habits)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        url = reverse("habits:habit-list")
+
+        with mock.patch.object(HabitViewSet, "pagination_class", OffsetPaginator):
+            for page in args.pages:
+                results[f"offset, page {page}, ms"] = measure(
+                    client, url, {"page": page}, args.repeat
+                )
+        for page in args.pages:
+            results[f"cursor, page {page}, ms"] = measure(
+                client,
+                url,
+                {**cursor_params(user, page), "page_size": PAGE_SIZE},
+                args.repeat,
+            )
+    report(f"habit list pagination, {args.habits} habits", results)
+
+
+if __name__ == "__main__":
+    main()
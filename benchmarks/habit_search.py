@@ -0,0 +1,99 @@
+"""Бенчмарк поиска публичных привычек: полнотекстовый поиск по GIN-индексу
+против icontains (полный просмотр таблицы).
+
+python -m benchmarks.habit_search --habits 1000000
+"""
+
+import argparse
+import statistics
+import time
+from unittest import mock
+
+from django.db import connection
+
+from benchmarks.utils import benchmark_database, report
+from habits import search
+from habits.models import Habit
+from users.models import User
+
+ACTIONS = [
+    "отжиматься",
+    "приседать",
+    "читать книгу",
+    "гулять",
+    "медитировать",
+    "бегать",
+    "плавать",
+    "учить английский",
+    "пить воду",
+    "растягиваться",
+]
+PLACES = ["дома", "в парке", "в зале", "на работе", "в бассейне", "на улице"]
+
+
+def seed(habits_count):
+    """Создает публичные привычки одним INSERT ... SELECT FROM generate_series.
+
+    Каждое действие дополнено номером, поэтому запрос по номеру находит
+    несколько привычек, а по действию — десятую часть."""
+
+    user = User.objects.create(email="user@email.com")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Habit._meta.db_table}
+                (user_id, place, do_at, action, is_enjoyable, periodicity,
+                 reward, duration, is_public, updated_at)
+            SELECT %s, (%s::text[])[1 + i %% %s], NOW() - i * interval '1 minute',
+                (%s::text[])[1 + i %% %s] || ' ' || (i / 100),
+                false, 1, 'съесть конфетку', 60, true, NOW()
+            FROM generate_series(1, %s) AS i
+            """,
+            [user.pk, PLACES, len(PLACES), ACTIONS, len(ACTIONS), habits_count],
+        )
+        cursor.execute(f"ANALYZE {Habit._meta.db_table}")
+
+
+def median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def first_page(query, page_size=10):
+    queryset = search.search(Habit.objects.filter(is_public=True), query)
+    return queryset.order_by("-rank", "-id").values("id", "rank")[:page_size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--habits", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    queries = {
+        "rare": f"плавать {args.habits // 200}",
+        "frequent": "медитировать",
+        "prefix": "медит",
+    }
+    results = {}
+    with benchmark_database():
+        seed(args.habits)
+        for name, query in queries.items():
+            plan = first_page(query).explain()
+            results[f"{name} {query!r}, uses index"] = "habit_public_search_idx" in plan
+            results[f"{name} {query!r}, full text, ms"] = median_ms(
+                lambda: list(first_page(query)), args.repeat
+            )
+            with mock.patch("habits.search.uses_full_text_search", return_value=False):
+                results[f"{name} {query!r}, icontains, ms"] = median_ms(
+                    lambda: list(first_page(query)), args.repeat
+                )
+    report(f"public habit search, {args.habits} public habits", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Микробенчмарк сериализации списка привычек: ModelSerializer + JSONRenderer
+против values() + HabitValuesSerializer + ORJSONRenderer.
+
+python -m benchmarks.habit_serialization --habits 10000
+"""
+
+import argparse
+import statistics
+import time
+
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks.utils import benchmark_database, report
+from config.renderers import ORJSONRenderer
+from habits.models import Habit
+from habits.serializers import HabitSerializer, HabitValuesSerializer
+from users.models import User
+
+
+def seed(habits_count):
+    """Создает привычки одним INSERT ... SELECT FROM generate_series."""
+
+    user = User.objects.create(email="user@email.com")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Habit._meta.db_table}
+                (user_id, place, do_at, action, is_enjoyable, periodicity,
+                 reward, duration, is_public, updated_at)
+            SELECT %s, 'дома', NOW() - i * interval '1 minute', 'отжиматься',
+                false, 1, 'съесть конфетку', 60, false, NOW()
+            FROM generate_series(1, %s) AS i
+            """,
+            [user.pk, habits_count],
+        )
+
+
+def median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--habits", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    results = {}
+    with benchmark_database():
+        seed(args.habits)
+        queryset = Habit.objects.order_by("-do_at", "-id")
+        values_serializer = HabitValuesSerializer()
+
+        model_data = HabitSerializer(queryset, many=True).data
+        values_data = values_serializer.to_representation(
+            values_serializer.values(queryset)
+        )
+        assert JSONRenderer().render(model_data) == ORJSONRenderer().render(values_data)
+
+        results["ModelSerializer, query + serialize, ms"] = median_ms(
+            lambda: HabitSerializer(queryset.all(), many=True).data, args.repeat
+        )
+        results["values(), query + serialize, ms"] = median_ms(
+            lambda: values_serializer.to_representation(
+                values_serializer.values(queryset.all())
+            ),
+            args.repeat,
+        )
+        results["JSONRenderer, ms"] = median_ms(
+            lambda: JSONRenderer().render(model_data), args.repeat
+        )
+        results["ORJSONRenderer, ms"] = median_ms(
+            lambda: ORJSONRenderer().render(values_data), args.repeat
+        )
+    report(f"habit list serialization, {args.habits} habits", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Бенчмарк статистики выполнения привычек: чтение готовых дневных агрегатов и
+серий против пересчета по журналу выполнений.
+
+Для каждого пользователя создаются привычки с отметками за --days дней (каждый
+седьмой день пропущен). Замеряются отметка о выполнении с обновлением
+агрегатов, статистика привычки и пользователя из агрегатов и та же статистика
+пользователя, посчитанная по всему журналу HabitCompletion.
+
+python -m benchmarks.habit_stats --users 1000 --habits-per-user 10 --days 365
+"""
+
+import argparse
+import statistics
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from benchmarks.utils import benchmark_database, report
+from config import settings
+from habits import completions
+from habits.models import (Habit, HabitCompletion, HabitDailyStat, HabitStreak,
+                           UserStreak)
+from users.models import User
+
+
+def seed(users_count, habits_per_user, days):
+    """Создает пользователей, привычки, журнал и агрегаты запросами
+    INSERT ... SELECT FROM generate_series."""
+
+    User.objects.bulk_create(
+        User(email=f"user_{i}@email.com") for i in range(users_count)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Habit._meta.db_table}
+                (user_id, place, do_at, action, is_enjoyable, periodicity,
+                 reward, duration, is_public, updated_at)
+            SELECT u.id, 'дома',
+                date_trunc('day', NOW() AT TIME ZONE %s) AT TIME ZONE %s
+                    + interval '1 day 7 hours',
+                'отжиматься ' || i, false, 1, 'съесть конфетку', 60, false, NOW()
+            FROM {User._meta.db_table} AS u, generate_series(1, %s) AS i
+            """,
+            [settings.TIME_ZONE, settings.TIME_ZONE, habits_per_user],
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {HabitCompletion._meta.db_table}
+                (habit_id, occurrence, completed_at)
+            SELECT h.id, h.do_at - d * interval '1 day', NOW()
+            FROM {Habit._meta.db_table} AS h, generate_series(2, %s) AS d
+            WHERE d %% 7 <> 0
+            """,
+            [days],
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {HabitDailyStat._meta.db_table}
+                (habit_id, user_id, date, completions)
+            SELECT c.habit_id, h.user_id, (c.occurrence AT TIME ZONE %s)::date, 1
+            FROM {HabitCompletion._meta.db_table} AS c
+            JOIN {Habit._meta.db_table} AS h ON h.id = c.habit_id
+            """,
+            [settings.TIME_ZONE],
+        )
+        for model in (Habit, HabitCompletion, HabitDailyStat):
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    daily = HabitDailyStat.objects.order_by()
+    HabitStreak.objects.bulk_create(
+        build_streaks(
+            HabitStreak,
+            "habit_id",
+            daily.order_by("habit_id", "date").values_list("habit_id", "date"),
+            gap=1,
+        )
+    )
+    UserStreak.objects.bulk_create(
+        build_streaks(
+            UserStreak,
+            "user_id",
+            daily.order_by("user_id", "date").values_list("user_id", "date").distinct(),
+            gap=completions.USER_STREAK_GAP,
+        )
+    )
+
+
+def build_streaks(model, key, rows, gap):
+    """Серии по строкам (ключ, день), упорядоченным по ключу и дню."""
+
+    streak = None
+    for pk, date in rows.iterator(chunk_size=10000):
+        if streak is None or getattr(streak, key) != pk:
+            if streak is not None:
+                yield streak
+            streak = model(**{key: pk})
+        streak.extend(date, gap)
+    if streak is not None:
+        yield streak
+
+
+def replay_user_stats(user, weeks, today):
+    """Статистика пользователя по всему журналу выполнений (без агрегатов)."""
+
+    rows = HabitCompletion.objects.filter(habit__user=user).values_list(
+        "habit_id", "occurrence", "habit__do_at", "habit__periodicity"
+    )
+    days = set()
+    habits = {}
+    for habit_id, occurrence, do_at, periodicity in rows:
+        date = timezone.localdate(occurrence)
+        days.add((habit_id, date))
+        first_on = habits.get(habit_id, (None, None, None, date))[3]
+        habits[habit_id] = (habit_id, do_at, periodicity, min(first_on, date))
+    streak = UserStreak()
+    for date in sorted({date for _, date in days}):
+        streak.extend(date, completions.USER_STREAK_GAP)
+    start = completions.week_starts(today, weeks)[0]
+    completed = Counter(
+        (habit_id, date - timedelta(days=date.weekday()))
+        for habit_id, date in days
+        if start <= date <= today
+    )
+    return {
+        **completions.streak_stats(streak, completions.USER_STREAK_GAP, today),
+        "weeks": completions.weekly_adherence(
+            list(habits.values()), completed, weeks, today
+        ),
+    }
+
+
+def median_ms(function, arguments):
+    timings = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--habits-per-user", type=int, default=10)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    results = {}
+    with benchmark_database():
+        seed(args.users, args.habits_per_user, args.days)
+        results["completions in log"] = HabitCompletion.objects.count()
+        today = timezone.localdate()
+        habits = list(Habit.objects.order_by("?")[: args.repeat])
+        users = list(User.objects.order_by("?")[: args.repeat])
+
+        occurrence = habits[0].do_at - timedelta(days=1)
+        results["complete, ms"] = median_ms(
+            lambda habit: completions.complete(habit, occurrence), habits
+        )
+        for weeks in (4, 52):
+            results[f"habit stats, {weeks} weeks, ms"] = median_ms(
+                lambda habit: completions.habit_stats(habit, weeks, today), habits
+            )
+            results[f"user stats, {weeks} weeks, ms"] = median_ms(
+                lambda user: completions.user_stats(user, weeks, today), users
+            )
+            results[f"user stats from log, {weeks} weeks, ms"] = median_ms(
+                lambda user: replay_user_stats(user, weeks, today), users
+            )
+        # Обе реализации дают одинаковый результат
+        assert completions.user_stats(users[0], 52, today) == replay_user_stats(
+            users[0], 52, today
+        )
+    report(
+        f"habit stats, {args.users} users x {args.habits_per_user} habits x "
+        f"{args.days} days",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    main()
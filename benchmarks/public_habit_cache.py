@@ -0,0 +1,104 @@
+"""Бенчмарк ленты публичных привычек: запросов в секунду с кэшем и без него.
+
+python -m benchmarks.public_habit_cache --habits 10000 --requests 2000
+
+Без Redis под рукой можно запустить с --fake-redis (Redis в памяти процесса).
+"""
+
+import argparse
+import time
+from unittest import mock
+
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import benchmark_database, report
+from habits import cache
+from habits.models import Habit
+from users.models import User
+
+
+def seed(habits_count):
+    """Создает публичные привычки одним INSERT ... SELECT FROM generate_series."""
+
+    user = User.objects.create(email="user@email.com")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Habit._meta.db_table}
+                (user_id, place, do_at, action, is_enjoyable, periodicity,
+                 reward, duration, is_public, updated_at)
+            SELECT %s, 'дома', NOW() - i * interval '1 minute', 'отжиматься',
+                false, 1, 'съесть конфетку', 60, true, NOW()
+            FROM generate_series(1, %s) AS i
+            """,
+            [user.pk, habits_count],
+        )
+    return user
+
+
+def requests_per_second(client, urls, requests_count):
+    start = time.perf_counter()
+    for i in range(requests_count):
+        response = client.get(urls[i % len(urls)])
+        assert response.status_code == 200, response.content
+    return requests_count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--habits", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--fake-redis", action="store_true")
+    args = parser.parse_args()
+
+    patchers = [mock.patch("habits.cache.settings.HABIT_PUBLIC_CACHE_ENABLED", True)]
+    if args.fake_redis:
+        import fakeredis
+
+        server = fakeredis.FakeServer()
+        patchers += [
+            mock.patch(
+                "habits.cache.get_redis",
+                return_value=fakeredis.FakeRedis(server=server),
+            ),
+            mock.patch(
+                "habits.cache.get_async_redis",
+                side_effect=lambda: fakeredis.FakeAsyncRedis(server=server),
+            ),
+        ]
+
+    results = {}
+    with benchmark_database():
+        user = seed(args.habits)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        list_url = reverse("habits:public-list")
+        first_page = client.get(list_url).json()
+        urls = [list_url, first_page["next"]] + [
+            reverse("habits:public-retrieve", args=(habit["id"],))
+            for habit in first_page["results"]
+        ]
+
+        results["cache off, req/s"] = requests_per_second(client, urls, args.requests)
+        for patcher in patchers:
+            patcher.start()
+        try:
+            cache.bump_version()
+            results["cache on, req/s"] = requests_per_second(
+                client, urls, args.requests
+            )
+            cache._local.clear()
+            with mock.patch("habits.cache.settings.HABIT_PUBLIC_CACHE_VERSION_TTL", 0):
+                results["cache on, version read every request, req/s"] = (
+                    requests_per_second(client, urls, args.requests)
+                )
+        finally:
+            for patcher in patchers:
+                patcher.stop()
+    report(f"public habit feed, {args.habits} public habits", results)
+
+
+if __name__ == "__main__":
+    main()
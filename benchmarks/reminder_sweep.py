@@ -0,0 +1,94 @@
+"""Бенчмарк рассылки напоминаний: время обхода и число запросов к БД.
+
+python -m benchmarks.reminder_sweep --habits 100000 --shards 4
+"""
+
+import argparse
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from benchmarks.utils import benchmark_database, report, timer
+from habits.models import Habit
+from habits.tasks import send_habit_reminder_shard
+from users.models import User
+
+
+class NullTask:
+    """Заглушка задачи отправки сообщения, не обращающаяся к сети и брокеру."""
+
+    def delay(self, *args, **kwargs):
+        pass
+
+    def apply_async(self, *args, **kwargs):
+        pass
+
+
+def seed(habits_count, users_count):
+    """Создает пользователей и привычки, которые нужно выполнить в ближайшие минуты."""
+
+    users = User.objects.bulk_create(
+        User(email=f"user_{i}@email.com", tg_chat_id=str(i)) for i in range(users_count)
+    )
+    do_at = timezone.now() + timedelta(minutes=3)
+    enjoyable = Habit.objects.bulk_create(
+        Habit(
+            user=user,
+            place="дома",
+            do_at=do_at,
+            action="лежать",
+            is_enjoyable=True,
+            duration=60,
+        )
+        for user in users
+    )
+    Habit.objects.bulk_create(
+        (
+            Habit(
+                user=users[i % users_count],
+                place="дома",
+                do_at=do_at,
+                action="отжиматься",
+                related_habit=enjoyable[i % users_count] if i % 2 else None,
+                reward=None if i % 2 else "съесть конфетку",
+                duration=60,
+            )
+            for i in range(habits_count)
+        ),
+        batch_size=10_000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--habits", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--shards", type=int, default=1)
+    args = parser.parse_args()
+
+    results = {}
+    with benchmark_database():
+        with timer(results, "seed, s"):
+            seed(args.habits, args.users)
+
+        # Сеть не участвует в замере: отправка сообщений подменяется заглушкой
+        with mock.patch("habits.tasks.deliver_scheduled_messages", NullTask()):
+            with CaptureQueriesContext(connection) as queries:
+                with timer(results, "sweep, s"):
+                    results["reminders"] = sum(
+                        send_habit_reminder_shard(shard, args.shards)
+                        for shard in range(args.shards)
+                    )
+
+        results["queries"] = len(queries)
+    report(
+        f"send_habit_reminder, {args.habits} due habits, {args.shards} shard(s)",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    main()
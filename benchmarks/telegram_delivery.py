@@ -0,0 +1,116 @@
+"""Бенчмарк отправки сообщений в телеграм: сообщений в секунду.
+
+Сравнивает прежний способ (requests.get без сессии и таймаута на каждое
+сообщение) с AsyncTelegramClient (одновременная отправка пачки через asyncio).
+Вместо api.telegram.org используется локальная заглушка с задержкой ответа:
+
+    python -m benchmarks.telegram_delivery --messages 2000 --latency 0.02
+"""
+
+import argparse
+import json
+import multiprocessing
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from benchmarks.utils import report, timer
+from habits.telegram import AsyncTelegramClient, EventLoopThread, RateLimiter
+
+
+class TelegramStubHandler(BaseHTTPRequestHandler):
+    """Заглушка sendMessage, отвечающая с заданной задержкой."""
+
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело пишутся отдельно: без TCP_NODELAY на соединениях
+    # keep-alive ответ ждал бы отложенного ACK клиента
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        time.sleep(self.server.latency)
+        content = json.dumps({"ok": True, "result": {}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TelegramStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def serve(latency, port):
+    server = TelegramStubServer(("127.0.0.1", 0), TelegramStubHandler)
+    server.latency = latency
+    port.value = server.server_port
+    server.serve_forever()
+
+
+def start_stub_server(latency):
+    """Запускает заглушку в отдельном процессе, чтобы она не делила GIL с клиентом."""
+
+    port = multiprocessing.Value("i", 0)
+    process = multiprocessing.Process(target=serve, args=(latency, port), daemon=True)
+    process.start()
+    while not port.value:
+        time.sleep(0.01)
+    return process, port.value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    server, port = start_stub_server(args.latency)
+    url = f"http://127.0.0.1:{port}/bot"
+    messages = [(str(i), "Время отжиматься!") for i in range(args.messages)]
+
+    results = {}
+    with timer(results, "requests.get per message, s"):
+        for chat_id, text in messages:
+            requests.get(
+                f"{url}TOKEN/sendMessage", params={"chat_id": chat_id, "text": text}
+            )
+
+    # Лимиты телеграма отключены, чтобы замерить саму отправку
+    async_client = AsyncTelegramClient(
+        url=url,
+        token="TOKEN",
+        limiter=RateLimiter(global_rate=10**9, chat_rate=10**9),
+        concurrency=args.concurrency,
+    )
+    loop_thread = EventLoopThread()
+    with timer(results, "AsyncTelegramClient.send_messages, s"):
+        loop_thread.run(async_client.send_messages(messages))
+    loop_thread.run(async_client.aclose())
+    loop_thread.stop()
+
+    results["requests.get, msg/s"] = (
+        args.messages / results["requests.get per message, s"]
+    )
+    results["AsyncTelegramClient, msg/s"] = (
+        args.messages / results["AsyncTelegramClient.send_messages, s"]
+    )
+    server.terminate()
+    report(
+        f"Telegram delivery, {args.messages} messages, latency {args.latency} s",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    main()
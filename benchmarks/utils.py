@@ -0,0 +1,48 @@
+"""Общие функции для бенчмарков.
+
+Бенчмарки запускаются на отдельной тестовой базе данных, которая создается
+перед замером и удаляется после него, поэтому рабочие данные не затрагиваются:
+
+    python -m benchmarks.reminder_sweep --habits 100000
+"""
+
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def benchmark_database():
+    """Создает тестовую базу данных на время бенчмарка."""
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def timer(results, name):
+    """Замеряет время выполнения блока и сохраняет его в results[name]."""
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        results[name] = time.perf_counter() - start
+
+
+def report(title, results):
+    """Выводит результаты замеров."""
+
+    print(title)
+    for name, value in results.items():
+        if isinstance(value, float):
+            print(f"  {name}: {value:.3f}")
+        else:
+            print(f"  {name}: {value}")
@@ -0,0 +1,87 @@
+"""Асинхронные обработчики во вьюхах DRF.
+
+DRF вызывает обработчики синхронно. AsyncAPIViewMixin заменяет dispatch
+корутиной: обработчики, объявленные через async def, выполняются в цикле
+событий и обращаются к БД через асинхронный ORM Django, а синхронные
+обработчики того же вьюсета (например, update и destroy) вместе с
+аутентификацией и проверкой прав выполняются в потоке через sync_to_async.
+Под ASGI число одновременных запросов не ограничено числом потоков воркера:
+поток занимается только на время самого запроса к БД. Под WSGI и в тестах
+Django запускает такие вьюхи через async_to_sync.
+"""
+
+from inspect import iscoroutinefunction
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.decorators import classonlymethod
+
+
+class AsyncAPIViewMixin:
+    """Асинхронный dispatch для APIView и вьюсетов DRF."""
+
+    @classonlymethod
+    def as_view(cls, *args, **initkwargs):
+        view = super().as_view(*args, **initkwargs)
+        # Django вызывает вьюху как корутину, только если она так помечена
+        return markcoroutinefunction(view)
+
+    def get_handler(self, request):
+        if request.method.lower() in self.http_method_names:
+            return getattr(self, request.method.lower(), self.http_method_not_allowed)
+        return self.http_method_not_allowed
+
+    def sync_handle(self, request, handler, *args, **kwargs):
+        self.initial(request, *args, **kwargs)
+        return handler(request, *args, **kwargs)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            handler = self.get_handler(request)
+            if iscoroutinefunction(handler):
+                await sync_to_async(self.initial)(request, *args, **kwargs)
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(self.sync_handle)(
+                    request, handler, *args, **kwargs
+                )
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncGenericAPIViewMixin(AsyncAPIViewMixin):
+    """Асинхронные get_object и paginate_queryset для GenericAPIView."""
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        if hasattr(self.paginator, "apaginate_queryset"):
+            return await self.paginator.apaginate_queryset(
+                queryset, self.request, view=self
+            )
+        # Стандартные пагинаторы DRF выполняют запросы синхронно
+        return await sync_to_async(self.paginator.paginate_queryset)(
+            queryset, self.request, view=self
+        )
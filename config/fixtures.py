@@ -0,0 +1,246 @@
+"""Потоковая загрузка больших фикстур Django в формате JSON (команда stream_loaddata).
+
+В отличие от loaddata файл не читается в память целиком: объекты разбираются
+по одному через JSONDecoder.raw_decode из буфера фиксированного размера и
+преобразуются стандартным десериализатором Django. Подряд идущие объекты одной
+модели сохраняются пачками, по одному INSERT ... SELECT FROM unnest(...) на
+пачку, и каждая пачка фиксируется своей транзакцией, поэтому в памяти
+находится только текущая пачка.
+
+Модели сохраняются в порядке файла (dumpdata упорядочивает их по
+зависимостям), а ссылки модели на саму себя (Habit.related_habit) сначала
+сохраняются как NULL и проставляются одним UPDATE в конце загрузки: объект
+может ссылаться на объект, который в файле идет позже. Ссылки копятся во
+временной таблице, а не в памяти. В конце загрузки сбрасываются
+последовательности первичных ключей.
+
+Как и loaddata, загрузчик не вызывает save() и сохраняет значения полей из
+фикстуры как есть; поля, которых в фикстуре нет, заполняются значениями по
+умолчанию (auto_now — текущим временем). Сигналы модели не отправляются.
+Объекты с уже существующими pk перезаписываются; связи многие-ко-многим только
+добавляются. Объекты должны быть с pk (как в выгрузке dumpdata).
+"""
+
+import json
+from collections import defaultdict
+
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+READ_SIZE = 1 << 20
+
+
+class FixtureError(ValueError):
+    pass
+
+
+def iter_json_array(file, read_size=READ_SIZE):
+    """Элементы JSON-массива верхнего уровня из файла, по одному."""
+
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    started = False
+
+    def skip(chars):
+        nonlocal position
+        while position < len(buffer) and buffer[position] in chars:
+            position += 1
+        return position < len(buffer)
+
+    while True:
+        # Пропускаем пробелы и разделители; при нехватке данных дочитываем файл
+        if not skip(" \t\r\n" if not started else " \t\r\n,"):
+            if eof:
+                raise FixtureError("Файл фикстуры закончился раньше массива.")
+            chunk = file.read(read_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        if not started:
+            if buffer[position] != "[":
+                raise FixtureError("Фикстура должна быть JSON-массивом.")
+            started = True
+            position += 1
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as error:
+            if eof:
+                raise FixtureError(f"Некорректный JSON: {error}") from error
+            # Объект не поместился в буфер целиком
+            chunk = file.read(read_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        position = end
+        yield item
+
+
+def self_references(model):
+    """Необязательные внешние ключи модели на саму себя."""
+
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if field.many_to_one and field.remote_field.model is model and field.null
+    ]
+
+
+class FixtureLoader:
+    """Загружает фикстуры пачками; load() можно вызывать для нескольких файлов."""
+
+    def __init__(
+        self, batch_size=5000, using=DEFAULT_DB_ALIAS, ignorenonexistent=False
+    ):
+        self.batch_size = batch_size
+        self.using = using
+        self.ignorenonexistent = ignorenonexistent
+        self.connection = connections[using]
+        self.counts = defaultdict(int)
+        self.models = set()
+        # (модель, поле) -> имя временной таблицы с отложенными ссылками
+        self.deferred = {}
+
+    def load(self, file):
+        objects = serializers.deserialize(
+            "python",
+            iter_json_array(file),
+            using=self.using,
+            ignorenonexistent=self.ignorenonexistent,
+        )
+        batch = []
+        for deserialized in objects:
+            if batch and (
+                type(deserialized.object) is not type(batch[0].object)
+                or len(batch) >= self.batch_size
+            ):
+                self.save(batch)
+                batch = []
+            batch.append(deserialized)
+        if batch:
+            self.save(batch)
+
+    def save(self, batch):
+        model = type(batch[0].object)
+        instances = [deserialized.object for deserialized in batch]
+        if any(instance.pk is None for instance in instances):
+            raise FixtureError(
+                f"{model._meta.label}: у каждого объекта должен быть pk."
+            )
+        deferred = defaultdict(list)
+        for field in self_references(model):
+            for instance in instances:
+                value = getattr(instance, field.attname)
+                if value is not None:
+                    deferred[field].append((instance.pk, value))
+                    setattr(instance, field.attname, None)
+
+        with transaction.atomic(using=self.using):
+            self.insert(model, instances)
+            self.save_m2m(model, batch)
+            for field, rows in deferred.items():
+                self.defer(model, field, rows)
+        self.models.add(model)
+        self.counts[model._meta.label] += len(instances)
+
+    def insert(self, model, instances):
+        """Сохраняет объекты одним INSERT ... SELECT FROM unnest(...).
+
+        Это заметно быстрее bulk_create, который собирает VALUES с параметром на
+        каждое поле каждого объекта. Объекты с уже существующими pk
+        перезаписываются, как в loaddata."""
+
+        fields = [field for field in model._meta.concrete_fields if not field.generated]
+        columns = []
+        for field in fields:
+            values = []
+            for instance in instances:
+                value = getattr(instance, field.attname)
+                # Поля, которых нет в фикстуре (например, auto_now), заполняются
+                # так же, как при сохранении
+                if value is None:
+                    value = field.pre_save(instance, add=True)
+                values.append(field.get_db_prep_save(value, self.connection))
+            columns.append(values)
+
+        table = model._meta.db_table
+        names = ", ".join(field.column for field in fields)
+        arrays = ", ".join(
+            f"%s::{field.db_type(self.connection)}[]" for field in fields
+        )
+        pk = model._meta.pk.column
+        updates = ", ".join(
+            f"{field.column} = EXCLUDED.{field.column}"
+            for field in fields
+            if not field.primary_key
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({names})
+                SELECT * FROM unnest({arrays})
+                ON CONFLICT ({pk}) DO {f"UPDATE SET {updates}" if updates else "NOTHING"}
+                """,
+                columns,
+            )
+
+    def save_m2m(self, model, batch):
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            if not through._meta.auto_created:
+                continue
+            rows = [
+                through(
+                    **{
+                        field.m2m_field_name(): deserialized.object,
+                        field.m2m_reverse_field_name() + "_id": value,
+                    }
+                )
+                for deserialized in batch
+                for value in deserialized.m2m_data.get(field.name, ())
+            ]
+            through._base_manager.using(self.using).bulk_create(
+                rows, ignore_conflicts=True
+            )
+
+    def defer(self, model, field, rows):
+        table = self.deferred.get((model, field))
+        with self.connection.cursor() as cursor:
+            if table is None:
+                table = f"fixture_{model._meta.db_table}_{field.column}"
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {table} (id bigint, value bigint)"
+                )
+                self.deferred[(model, field)] = table
+            ids, values = zip(*rows)
+            cursor.execute(
+                f"INSERT INTO {table} SELECT * FROM unnest(%s::bigint[], %s::bigint[])",
+                [list(ids), list(values)],
+            )
+
+    def finish(self):
+        """Проставляет отложенные ссылки и сбрасывает последовательности."""
+
+        with transaction.atomic(using=self.using), self.connection.cursor() as cursor:
+            for (model, field), table in self.deferred.items():
+                db_table = model._meta.db_table
+                cursor.execute(f"""
+                    UPDATE {db_table} SET {field.column} = deferred.value
+                    FROM {table} AS deferred
+                    WHERE {db_table}.{model._meta.pk.column} = deferred.id
+                    """)
+                cursor.execute(f"DROP TABLE {table}")
+            sequence_sql = self.connection.ops.sequence_reset_sql(
+                no_style(), self.models
+            )
+            for sql in sequence_sql:
+                cursor.execute(sql)
+        self.deferred = {}
+        return dict(self.counts)
@@ -0,0 +1,32 @@
+import asyncio
+import weakref
+
+import redis
+import redis.asyncio
+
+from config import settings
+
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis():
+    """Клиент Redis текущего процесса (пул соединений создается один раз)."""
+
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+    return _client
+
+
+def get_async_redis():
+    """Асинхронный клиент Redis текущего цикла событий.
+
+    Соединения redis.asyncio привязаны к циклу, в котором созданы, поэтому
+    клиент создается на каждый цикл (под ASGI он один на процесс)."""
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+    return client
@@ -0,0 +1,25 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson.
+
+    Результат совпадает с JSONRenderer при настройках по умолчанию (компактный
+    вывод, UTF-8 без экранирования, экранированные U+2028 и U+2029). Если клиент
+    запросил отступы (Accept: application/json; indent=4), используется
+    стандартный рендерер."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            # Типы, которые orjson не сериализует так же, как encoders.JSONEncoder
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
@@ -1,4 +1,5 @@
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 
@@ -69,16 +70,33 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST"),
         "PORT": os.getenv("POSTGRES_PORT"),
-    }
+    },
 }
 
+if sys.argv[1:2] == ["test"]:
+    # Только для тестов поведения на СУБД, отличной от Postgres. Версии привычек
+    # (HabitVersion) в SQLite не используются, поэтому предупреждение об
+    # ограничении nulls_distinct отключено
+    DATABASES["sqlite"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+    SILENCED_SYSTEM_CHECKS = ["models.W047"]
+
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("users.authentication.CachedJWTAuthentication",),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": (
+        "config.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "config.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -116,9 +134,18 @@ MEDIA_ROOT = BASE_DIR / "media"
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
-    "UPDATE_LAST_LOGIN": True,
+    # last_login обновляет users.serializers.LoginSerializer (см. users.last_login)
+    "UPDATE_LAST_LOGIN": False,
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.LoginSerializer",
+    # Токен содержит хэш пароля и перестает действовать после его смены
+    "CHECK_REVOKE_TOKEN": True,
 }
 
+# Буфер времени входа в Redis и период его переноса в БД (сек): на столько
+# last_login может отставать
+LAST_LOGIN_BUFFER_ENABLED = os.getenv("LAST_LOGIN_BUFFER_ENABLED", False) == "True"
+LAST_LOGIN_FLUSH_INTERVAL = int(os.getenv("LAST_LOGIN_FLUSH_INTERVAL") or 60)
+
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
@@ -126,6 +153,12 @@ CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_BROKER_URL")
 
+REDIS_URL = os.getenv("REDIS_URL") or CELERY_BROKER_URL
+
+# Токен для /metrics/ (заголовок Authorization: Bearer <токен>); без него
+# метрики не отдаются
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 
 CELERY_BEAT_SCHEDULE = {
@@ -133,10 +166,76 @@ CELERY_BEAT_SCHEDULE = {
         "task": "habits.tasks.send_habit_reminder",
         "schedule": timedelta(minutes=1),
     },
+    "deliver_scheduled_messages": {
+        "task": "habits.tasks.deliver_scheduled_messages",
+        "schedule": timedelta(seconds=10),
+    },
+    "flush_last_login": {
+        "task": "users.tasks.flush_last_login",
+        "schedule": timedelta(seconds=LAST_LOGIN_FLUSH_INTERVAL),
+    },
 }
 
-TELEGRAM_URL = "https://api.telegram.org/bot"
+# Количество шардов (задач), на которые разбивается рассылка напоминаний
+HABIT_REMINDER_SHARDS = int(os.getenv("HABIT_REMINDER_SHARDS") or 4)
+# Индекс привычек по времени выполнения в Redis (вместо запроса к таблице при рассылке)
+HABIT_DUE_INDEX_ENABLED = os.getenv("HABIT_DUE_INDEX_ENABLED", False) == "True"
+
+# Размер пачки при переносе просроченных привычек
+HABIT_CATCH_UP_BATCH_SIZE = int(os.getenv("HABIT_CATCH_UP_BATCH_SIZE") or 10000)
+
+# Планировщик напоминаний с точностью до секунды (команда run_reminder_scheduler).
+# Когда он включен, обход по beat только подстраховывает: забирает привычки,
+# напоминание о которых опоздало больше чем на HABIT_SCHEDULER_GRACE секунд
+HABIT_SCHEDULER_ENABLED = os.getenv("HABIT_SCHEDULER_ENABLED", False) == "True"
+HABIT_SCHEDULER_GRACE = int(os.getenv("HABIT_SCHEDULER_GRACE") or 60)
+# Окно загрузки привычек в планировщик и период его догрузки (сек)
+HABIT_SCHEDULER_WINDOW = int(os.getenv("HABIT_SCHEDULER_WINDOW") or 3600)
+HABIT_SCHEDULER_REFRESH = int(os.getenv("HABIT_SCHEDULER_REFRESH") or 60)
+
+# Максимальное количество привычек в одном запросе /habits/bulk/
+HABIT_BULK_MAX_SIZE = int(os.getenv("HABIT_BULK_MAX_SIZE") or 500)
+# Количество строк, читаемых за раз курсором при выгрузке /habits/export/
+HABIT_EXPORT_CHUNK_SIZE = int(os.getenv("HABIT_EXPORT_CHUNK_SIZE") or 2000)
+# Наибольшее количество дней в запросе календаря /habits/calendar/
+HABIT_CALENDAR_MAX_DAYS = int(os.getenv("HABIT_CALENDAR_MAX_DAYS") or 366)
+
+# Кэш ленты публичных привычек: LRU в памяти процесса (записей) перед Redis,
+# срок хранения ответа в Redis и период проверки версии ленты (сек)
+HABIT_PUBLIC_CACHE_ENABLED = os.getenv("HABIT_PUBLIC_CACHE_ENABLED", False) == "True"
+HABIT_PUBLIC_CACHE_LOCAL_SIZE = int(os.getenv("HABIT_PUBLIC_CACHE_LOCAL_SIZE") or 1024)
+HABIT_PUBLIC_CACHE_TTL = int(os.getenv("HABIT_PUBLIC_CACHE_TTL") or 300)
+HABIT_PUBLIC_CACHE_VERSION_TTL = float(os.getenv("HABIT_PUBLIC_CACHE_VERSION_TTL") or 1)
+
+# Кэш пользователей для аутентификации по JWT: LRU в памяти процесса (записей,
+# срок хранения в секундах) перед Redis и срок хранения в Redis (сек)
+USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", False) == "True"
+USER_CACHE_LOCAL_SIZE = int(os.getenv("USER_CACHE_LOCAL_SIZE") or 4096)
+USER_CACHE_LOCAL_TTL = float(os.getenv("USER_CACHE_LOCAL_TTL") or 5)
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL") or 300)
+
+TELEGRAM_URL = os.getenv("TELEGRAM_URL") or "https://api.telegram.org/bot"
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+# Таймаут запроса к телеграму в секундах
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT") or 10)
+# Число одновременных отправок в одном процессе
+TELEGRAM_CONCURRENCY = int(os.getenv("TELEGRAM_CONCURRENCY") or 16)
+# Лимиты телеграма: сообщений в секунду на бота и на один чат
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE") or 30)
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE") or 1)
+# Лимиты общие для всех воркеров (хранятся в Redis), иначе — для каждого процесса
+TELEGRAM_SHARED_RATE_LIMIT_ENABLED = (
+    os.getenv("TELEGRAM_SHARED_RATE_LIMIT_ENABLED", False) == "True"
+)
+# Максимальное количество сообщений в одной пачке отправки
+TELEGRAM_BATCH_SIZE = int(os.getenv("TELEGRAM_BATCH_SIZE") or 1000)
+# Очередь запланированных сообщений: срок, на который сообщение забирается
+# воркером (сек), максимальное число попыток и пачек за один запуск задачи
+SCHEDULED_MESSAGE_LEASE = int(os.getenv("SCHEDULED_MESSAGE_LEASE") or 120)
+SCHEDULED_MESSAGE_MAX_ATTEMPTS = int(os.getenv("SCHEDULED_MESSAGE_MAX_ATTEMPTS") or 5)
+SCHEDULED_MESSAGE_MAX_BATCHES = int(os.getenv("SCHEDULED_MESSAGE_MAX_BATCHES") or 50)
+# Задержка повтора в секундах, если телеграм не вернул retry_after
+TELEGRAM_RETRY_DELAY = int(os.getenv("TELEGRAM_RETRY_DELAY") or 5)
 
 CORS_ALLOWED_ORIGINS = [
     "https://127.0.0.1:8000",
@@ -1,8 +1,28 @@
 from django.contrib import admin
 
-from habits.models import Habit
+from habits.models import (Habit, HabitCompletion, ReminderDelivery,
+                           ScheduledMessage)
 
 
 @admin.register(Habit)
 class Habit(admin.ModelAdmin):
     list_filter = ("id", "do_at")
+
+
+@admin.register(ScheduledMessage)
+class ScheduledMessage(admin.ModelAdmin):
+    list_display = ("id", "chat_id", "send_at", "sent_at", "attempts", "failed_at")
+    list_filter = ("send_at", "sent_at", "failed_at")
+    search_fields = ("chat_id",)
+
+
+@admin.register(ReminderDelivery)
+class ReminderDelivery(admin.ModelAdmin):
+    list_display = ("id", "habit", "occurrence", "kind", "created_at")
+    list_filter = ("kind", "occurrence")
+
+
+@admin.register(HabitCompletion)
+class HabitCompletion(admin.ModelAdmin):
+    list_display = ("id", "habit", "occurrence", "completed_at")
+    list_filter = ("occurrence",)
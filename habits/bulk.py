@@ -0,0 +1,178 @@
+"""Массовое создание и изменение привычек (эндпоинт /habits/bulk/).
+
+Каждая привычка проверяется теми же правилами, что и в HabitSerializer, но
+связанные и изменяемые привычки выбираются для всей пачки двумя запросами, а
+сохраняется пачка через bulk_create/bulk_update в одной транзакции. Если хотя
+бы одна привычка не прошла проверку, ничего не сохраняется, а ошибки
+возвращаются списком по порядку привычек в запросе.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.serializers import ValidationError
+
+from config import settings
+from habits.models import Habit
+from habits.serializers import HabitSerializer
+from habits.signals import habits_bulk_saved
+from habits.validators import validate_duration
+
+# Поля привычки, которые можно передать при массовом создании и изменении
+FIELDS = (
+    "place",
+    "do_at",
+    "action",
+    "is_enjoyable",
+    "related_habit",
+    "periodicity",
+    "reward",
+    "duration",
+    "is_public",
+)
+
+
+class HabitBulkItemSerializer(serializers.ModelSerializer):
+    """Проверка полей одной привычки без обращений к БД.
+
+    Связанная привычка принимается как id и проверяется для всей пачки сразу."""
+
+    id = serializers.IntegerField(required=False)
+    duration = serializers.IntegerField(validators=[validate_duration])
+    related_habit = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = Habit
+        fields = ("id",) + FIELDS
+
+
+def validate_fields(items, partial):
+    """Проверяет поля привычек одним экземпляром сериализатора (поля создаются
+    один раз на пачку).
+
+    Возвращает [(проверенные поля или None, ошибки), ...] в порядке items."""
+
+    serializer = HabitBulkItemSerializer(partial=partial)
+    results = []
+    for item in items:
+        try:
+            results.append((serializer.run_validation(item), {}))
+        except ValidationError as error:
+            results.append((None, error.detail))
+    return results
+
+
+def prepare(data, user):
+    """Проверяет пачку привычек и возвращает объекты для сохранения
+    [(привычка, создается ли), ...] в порядке запроса.
+
+    Выбрасывает ValidationError со списком ошибок по привычкам."""
+
+    if not isinstance(data, list):
+        raise ValidationError({"non_field_errors": ["Ожидается список привычек."]})
+    if not data:
+        raise ValidationError({"non_field_errors": ["Список привычек пуст."]})
+    if len(data) > settings.HABIT_BULK_MAX_SIZE:
+        raise ValidationError(
+            {
+                "non_field_errors": [
+                    f"Не больше {settings.HABIT_BULK_MAX_SIZE} привычек за один запрос."
+                ]
+            }
+        )
+
+    is_update = [isinstance(item, dict) and "id" in item for item in data]
+    results = [None] * len(data)
+    for partial in (False, True):
+        indexes = [i for i, update in enumerate(is_update) if update == partial]
+        checked = validate_fields([data[i] for i in indexes], partial)
+        for i, result in zip(indexes, checked):
+            results[i] = result
+    errors = [dict(item_errors) for attrs, item_errors in results]
+
+    # Изменяемые привычки пользователя (администратора — любые) одним запросом
+    update_ids = [
+        attrs["id"] for attrs, _ in results if attrs is not None and "id" in attrs
+    ]
+    existing = Habit.objects.filter(pk__in=update_ids)
+    if not user.is_staff:
+        existing = existing.filter(user=user)
+    existing = existing.in_bulk()
+
+    seen_ids = set()
+    for i, (attrs, _) in enumerate(results):
+        if attrs is None or "id" not in attrs:
+            continue
+        if attrs["id"] not in existing:
+            errors[i]["id"] = ["Привычка не найдена."]
+        elif attrs["id"] in seen_ids:
+            errors[i]["id"] = ["Привычка указана в запросе несколько раз."]
+        seen_ids.add(attrs["id"])
+
+    # Связанные привычки (новые и уже указанные у изменяемых) одним запросом
+    related_ids = {
+        attrs["related_habit"]
+        for attrs, _ in results
+        if attrs is not None and attrs.get("related_habit") is not None
+    }
+    related_ids |= {
+        habit.related_habit_id for habit in existing.values() if habit.related_habit_id
+    }
+    related = Habit.objects.only("id", "is_enjoyable").in_bulk(related_ids)
+
+    does_not_exist = serializers.PrimaryKeyRelatedField.default_error_messages[
+        "does_not_exist"
+    ]
+    habits = []
+    for i, (attrs, _) in enumerate(results):
+        if attrs is None or errors[i]:
+            habits.append(None)
+            continue
+        attrs = dict(attrs)
+        if "related_habit" in attrs:
+            related_id = attrs.pop("related_habit")
+            if related_id is not None and related_id not in related:
+                errors[i]["related_habit"] = [
+                    does_not_exist.format(pk_value=related_id)
+                ]
+                habits.append(None)
+                continue
+            attrs["related_habit"] = related.get(related_id)
+
+        if "id" in attrs:
+            habit = existing[attrs.pop("id")]
+            if habit.related_habit_id and "related_habit" not in attrs:
+                habit.related_habit = related[habit.related_habit_id]
+            for field, value in attrs.items():
+                setattr(habit, field, value)
+        else:
+            habit = Habit(user=user, **attrs)
+
+        # Те же проверки, что в HabitSerializer.Meta.validators, по итоговому состоянию
+        state = {field: getattr(habit, field) for field in FIELDS}
+        for validator in HabitSerializer.Meta.validators:
+            try:
+                validator(state)
+            except ValidationError as error:
+                errors[i].setdefault("non_field_errors", []).extend(error.detail)
+        habits.append(habit)
+
+    if any(errors):
+        raise ValidationError(errors)
+    return [(habit, not update) for habit, update in zip(habits, is_update)]
+
+
+def save(prepared):
+    """Сохраняет проверенные привычки в одной транзакции и возвращает их."""
+
+    created = [habit for habit, is_created in prepared if is_created]
+    updated = [habit for habit, is_created in prepared if not is_created]
+    with transaction.atomic():
+        Habit.objects.bulk_create(created)
+        if updated:
+            now = timezone.now()
+            for habit in updated:
+                habit.updated_at = now
+            Habit.objects.bulk_update(updated, FIELDS + ("updated_at",))
+        habits_bulk_saved(created + updated)
+    return [habit for habit, is_created in prepared]
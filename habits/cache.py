@@ -0,0 +1,100 @@
+"""Кэш ответов ленты публичных привычек.
+
+Два уровня: LRU в памяти процесса и Redis, общий для всех процессов. Ключи
+содержат номер версии habits:public:version, который увеличивается сигналами
+модели Habit при изменении публичных привычек, поэтому старые ответы просто
+перестают читаться и истекают по TTL. Версия запоминается в процессе на
+HABIT_PUBLIC_CACHE_VERSION_TTL секунд, чтобы попадание в локальный кэш не
+обращалось к Redis; на это время другие процессы могут отдавать прежнюю версию.
+Кэш включается настройкой HABIT_PUBLIC_CACHE_ENABLED.
+"""
+
+import hashlib
+import json
+import time
+
+from config import settings
+from config.lru import LRUCache
+from config.redis_client import get_async_redis, get_redis
+from habits import metrics
+
+KEY_PREFIX = "habits:public"
+VERSION_KEY = f"{KEY_PREFIX}:version"
+
+_local = LRUCache(settings.HABIT_PUBLIC_CACHE_LOCAL_SIZE)
+_version = None
+_version_checked_at = 0.0
+
+
+def is_enabled():
+    return settings.HABIT_PUBLIC_CACHE_ENABLED
+
+
+def version_is_fresh():
+    return (
+        _version is not None
+        and time.monotonic() - _version_checked_at
+        <= settings.HABIT_PUBLIC_CACHE_VERSION_TTL
+    )
+
+
+def set_version(version):
+    global _version, _version_checked_at
+    _version = int(version or 0)
+    _version_checked_at = time.monotonic()
+    return _version
+
+
+def current_version():
+    """Текущая версия ленты (из памяти процесса, если проверялась недавно)."""
+
+    if version_is_fresh():
+        return _version
+    return set_version(get_redis().get(VERSION_KEY))
+
+
+async def acurrent_version():
+    """То же, что current_version, через асинхронный клиент Redis."""
+
+    if version_is_fresh():
+        return _version
+    return set_version(await get_async_redis().get(VERSION_KEY))
+
+
+def bump_version():
+    """Делает недействительными все закэшированные ответы ленты."""
+
+    set_version(get_redis().incr(VERSION_KEY))
+    _local.clear()
+
+
+def redis_key(version, key):
+    return f"{KEY_PREFIX}:{version}:{hashlib.sha1(key.encode()).hexdigest()}"
+
+
+async def aget_or_set(key, compute):
+    """Возвращает закэшированное значение по ключу или вычисляет и сохраняет его.
+
+    compute — функция, возвращающая корутину; значение должно сериализоваться
+    в JSON."""
+
+    version = await acurrent_version()
+    value = _local.get((version, key))
+    if value is not None:
+        metrics.PUBLIC_CACHE_HITS.labels("local").inc()
+        return value
+
+    raw = await get_async_redis().get(redis_key(version, key))
+    if raw is not None:
+        metrics.PUBLIC_CACHE_HITS.labels("redis").inc()
+        value = json.loads(raw)
+    else:
+        metrics.PUBLIC_CACHE_MISSES.inc()
+        value = await compute()
+        await get_async_redis().set(
+            redis_key(version, key),
+            json.dumps(value),
+            ex=settings.HABIT_PUBLIC_CACHE_TTL,
+        )
+    _local.set((version, key), value)
+    return value
@@ -0,0 +1,194 @@
+"""Отметки о выполнении привычек и статистика по ним (эндпоинты
+/habits/<pk>/complete/, /habits/<pk>/stats/ и /habits/stats/).
+
+Отметка пишется в журнал HabitCompletion и сразу учитывается в готовых
+агрегатах: количестве выполнений привычки за день (HabitDailyStat) и сериях
+выполнений привычки и пользователя (HabitStreak, UserStreak). Статистика
+читается из них, а журнал при запросе не просматривается.
+
+Дни считаются по местному времени (TIME_ZONE). Серия привычки — дни с
+выполнением, между которыми не больше periodicity дней, серия пользователя —
+дни подряд, в которые выполнена хотя бы одна привычка. Недельное выполнение —
+доля дней по расписанию привычки (do_at + k * periodicity), в которые она
+выполнена; недели до первой отметки привычки не учитываются.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from habits.models import (HabitCompletion, HabitDailyStat, HabitStreak,
+                           UserStreak)
+
+# Серия пользователя прерывается днем без выполнений
+USER_STREAK_GAP = 1
+
+
+def periodicity_of(habit):
+    return max(habit.periodicity, 1)
+
+
+def default_occurrence(habit, now=None):
+    """Ближайшее к now время выполнения по расписанию привычки, но не позже
+    сегодняшнего дня."""
+
+    now = now or timezone.now()
+    period = timedelta(days=periodicity_of(habit))
+    occurrence = habit.do_at + round((now - habit.do_at) / period) * period
+    if timezone.localdate(occurrence) > timezone.localdate(now):
+        occurrence -= period
+    return occurrence
+
+
+def complete(habit, occurrence):
+    """Отмечает выполнение привычки; возвращает (отметка, создана ли она).
+
+    Повторная отметка того же времени выполнения ничего не меняет. Строки серий
+    блокируются, поэтому отметки одного пользователя учитываются по очереди."""
+
+    with transaction.atomic():
+        user_streak = None
+        if habit.user_id is not None:
+            user_streak, _ = UserStreak.objects.select_for_update().get_or_create(
+                user_id=habit.user_id
+            )
+        habit_streak, _ = HabitStreak.objects.select_for_update().get_or_create(
+            habit_id=habit.pk
+        )
+        completion, created = HabitCompletion.objects.get_or_create(
+            habit=habit, occurrence=occurrence
+        )
+        if not created:
+            return completion, False
+
+        date = timezone.localdate(occurrence)
+        user_days = HabitDailyStat.objects.filter(user_id=habit.user_id)
+        new_user_day = (
+            user_streak is not None and not user_days.filter(date=date).exists()
+        )
+        if HabitDailyStat.objects.add(habit.pk, habit.user_id, date) == 1:
+            habit_streak.add(
+                date,
+                periodicity_of(habit),
+                lambda: HabitDailyStat.objects.filter(habit=habit)
+                .order_by("date")
+                .values_list("date", flat=True),
+            )
+        if new_user_day:
+            user_streak.add(
+                date,
+                USER_STREAK_GAP,
+                lambda: user_days.order_by("date")
+                .values_list("date", flat=True)
+                .distinct(),
+            )
+    return completion, True
+
+
+def week_starts(today, weeks):
+    """Понедельники последних weeks недель, включая текущую, по возрастанию."""
+
+    monday = today - timedelta(days=today.weekday())
+    return [monday - timedelta(weeks=i) for i in reversed(range(weeks))]
+
+
+def expected_days(anchor, periodicity, first_on, monday, today):
+    """Количество дней по расписанию с шагом periodicity от anchor в неделе с
+    понедельника monday, не раньше first_on и не позже today."""
+
+    start = max(monday, first_on)
+    end = min(monday + timedelta(days=6), today)
+    if start > end:
+        return 0
+    start += timedelta(days=(anchor - start).days % periodicity)
+    if start > end:
+        return 0
+    return (end - start).days // periodicity + 1
+
+
+def completed_days(daily_stats, weeks, today):
+    """Дни с выполнением по привычкам и неделям: {(habit_id, понедельник): дней}.
+
+    Строки группируются в БД, поэтому их не больше, чем привычек на недели."""
+
+    rows = (
+        daily_stats.filter(date__gte=week_starts(today, weeks)[0], date__lte=today)
+        .annotate(week=TruncWeek("date"))
+        .values_list("habit_id", "week")
+        .annotate(days=Count("*"))
+        .order_by()
+    )
+    return {(habit_id, week): days for habit_id, week, days in rows}
+
+
+def weekly_adherence(habits, completed, weeks, today):
+    """Выполнение по неделям.
+
+    habits: [(habit_id, do_at, periodicity, first_on), ...] — привычки с
+    отметками, completed — результат completed_days."""
+
+    mondays = week_starts(today, weeks)
+
+    result = []
+    for monday in mondays:
+        done = expected = counted = 0
+        for habit_id, do_at, periodicity, first_on in habits:
+            habit_expected = expected_days(
+                timezone.localdate(do_at), max(periodicity, 1), first_on, monday, today
+            )
+            habit_done = completed.get((habit_id, monday), 0)
+            done += habit_done
+            expected += habit_expected
+            counted += min(habit_done, habit_expected)
+        result.append(
+            {
+                "week": monday,
+                "completed": done,
+                "expected": expected,
+                "adherence": round(counted / expected, 2) if expected else None,
+            }
+        )
+    return result
+
+
+def streak_stats(streak, gap, today):
+    if streak is None:
+        return {"current_streak": 0, "longest_streak": 0, "last_completed_on": None}
+    return {
+        "current_streak": streak.current_on(today, gap),
+        "longest_streak": streak.longest,
+        "last_completed_on": streak.last_on,
+    }
+
+
+def habit_stats(habit, weeks, today=None):
+    """Серии и выполнение по неделям для привычки."""
+
+    today = today or timezone.localdate()
+    streak = HabitStreak.objects.filter(habit=habit).first()
+    habits = []
+    if streak is not None:
+        habits.append((habit.pk, habit.do_at, habit.periodicity, streak.first_on))
+    completed = completed_days(HabitDailyStat.objects.filter(habit=habit), weeks, today)
+    return {
+        **streak_stats(streak, periodicity_of(habit), today),
+        "weeks": weekly_adherence(habits, completed, weeks, today),
+    }
+
+
+def user_stats(user, weeks, today=None):
+    """Серии и выполнение по неделям для всех привычек пользователя."""
+
+    today = today or timezone.localdate()
+    streak = UserStreak.objects.filter(user=user).first()
+    habits = HabitStreak.objects.filter(habit__user=user).values_list(
+        "habit_id", "habit__do_at", "habit__periodicity", "first_on"
+    )
+    completed = completed_days(HabitDailyStat.objects.filter(user=user), weeks, today)
+    return {
+        **streak_stats(streak, USER_STREAK_GAP, today),
+        "weeks": weekly_adherence(list(habits), completed, weeks, today),
+    }
@@ -0,0 +1,176 @@
+"""Индекс привычек по времени выполнения в Redis.
+
+Для каждого шарда рассылки хранится sorted set habits:due:<шард>, в котором
+member — id полезной привычки, score — do_at в секундах Unix. Рассылка читает
+из него привычки, которые нужно выполнить в ближайшие 5 минут, через
+ZRANGEBYSCORE вместо запроса к таблице привычек, а после фиксации транзакции
+переносит их на следующий период той же командой ZADD. Индекс включается
+настройкой HABIT_DUE_INDEX_ENABLED и поддерживается сигналами модели Habit,
+рассылкой и переносом просроченных привычек.
+"""
+
+from collections import defaultdict
+
+from config import settings
+from config.redis_client import get_redis
+from habits.models import Habit
+
+KEY_PREFIX = "habits:due"
+
+
+def is_enabled():
+    return settings.HABIT_DUE_INDEX_ENABLED
+
+
+def shard_key(shard):
+    return f"{KEY_PREFIX}:{shard}"
+
+
+def shard_of(user_id):
+    return user_id % settings.HABIT_REMINDER_SHARDS
+
+
+def is_indexed(user_id, is_enjoyable):
+    """В индекс попадают только полезные привычки, у которых есть пользователь."""
+
+    return user_id is not None and not is_enjoyable
+
+
+def add(rows):
+    """Добавляет или обновляет привычки в индексе.
+
+    rows: [(id, user_id, do_at, is_enjoyable), ...]. Привычки, которые не должны
+    быть в индексе (приятные или без пользователя), из него удаляются."""
+
+    to_add = defaultdict(dict)
+    to_remove = []
+    for pk, user_id, do_at, is_enjoyable in rows:
+        if is_indexed(user_id, is_enjoyable):
+            to_add[shard_of(user_id)][pk] = do_at.timestamp()
+        else:
+            to_remove.append(pk)
+
+    pipeline = get_redis().pipeline(transaction=False)
+    for shard, scores in to_add.items():
+        pipeline.zadd(shard_key(shard), scores)
+    if to_remove:
+        for shard in range(settings.HABIT_REMINDER_SHARDS):
+            pipeline.zrem(shard_key(shard), *to_remove)
+    pipeline.execute()
+
+
+def remove(rows):
+    """Удаляет привычки из индекса. rows: [(id, user_id), ...]."""
+
+    to_remove = defaultdict(list)
+    for pk, user_id in rows:
+        if user_id is not None:
+            to_remove[shard_of(user_id)].append(pk)
+
+    pipeline = get_redis().pipeline(transaction=False)
+    for shard, ids in to_remove.items():
+        pipeline.zrem(shard_key(shard), *ids)
+    pipeline.execute()
+
+
+def sync(ids):
+    """Обновляет записи индекса по текущему состоянию привычек в БД."""
+
+    rows = Habit.objects.filter(pk__in=ids).values_list(
+        "pk", "user_id", "do_at", "is_enjoyable"
+    )
+    add(rows)
+
+
+def get_due(shard, start, end):
+    """Возвращает из индекса шарда id привычек с do_at в интервале (start, end].
+
+    Записи не удаляются: рассылка обновляет их после фиксации транзакции, в
+    которой привычки заблокированы и перенесены, поэтому при ошибке транзакции
+    привычки остаются в индексе. Одновременные обходы могут получить одни и те
+    же id — повтор исключает блокировка строк в БД (SKIP LOCKED)."""
+
+    ids = get_redis().zrangebyscore(
+        shard_key(shard), f"({start.timestamp()}", end.timestamp()
+    )
+    return [int(pk) for pk in ids]
+
+
+def indexed_habits():
+    """Привычки, которые должны быть в индексе: (id, user_id, do_at)."""
+
+    return (
+        Habit.objects.filter(is_enjoyable=False, user__isnull=False)
+        .order_by()
+        .values_list("pk", "user_id", "do_at")
+    )
+
+
+def rebuild(batch_size=10000):
+    """Перестраивает индекс по таблице привычек.
+
+    Индекс собирается во временных ключах и подменяет текущий командой RENAME,
+    поэтому рассылка не видит наполовину заполненный индекс."""
+
+    redis = get_redis()
+    shards = settings.HABIT_REMINDER_SHARDS
+    temp_keys = [f"{shard_key(shard)}:rebuild" for shard in range(shards)]
+    redis.delete(*temp_keys)
+
+    count = 0
+    scores = defaultdict(dict)
+    for pk, user_id, do_at in indexed_habits().iterator(chunk_size=batch_size):
+        scores[shard_of(user_id)][pk] = do_at.timestamp()
+        count += 1
+        if count % batch_size == 0:
+            _flush(redis, temp_keys, scores)
+    _flush(redis, temp_keys, scores)
+
+    pipeline = redis.pipeline(transaction=True)
+    for shard, temp_key in enumerate(temp_keys):
+        pipeline.delete(shard_key(shard))
+        if redis.exists(temp_key):
+            pipeline.rename(temp_key, shard_key(shard))
+    pipeline.execute()
+    return count
+
+
+def _flush(redis, temp_keys, scores):
+    pipeline = redis.pipeline(transaction=False)
+    for shard, shard_scores in scores.items():
+        pipeline.zadd(temp_keys[shard], shard_scores)
+    pipeline.execute()
+    scores.clear()
+
+
+def check(batch_size=10000, fix=False):
+    """Сравнивает индекс с таблицей привычек.
+
+    Возвращает словарь со списками id: missing — привычки, которых нет в индексе,
+    stale — привычки с устаревшим временем выполнения, extra — лишние записи
+    (удаленные, приятные привычки или записи не в своем шарде).
+    При fix=True найденные расхождения исправляются."""
+
+    redis = get_redis()
+    expected = {}
+    for pk, user_id, do_at in indexed_habits().iterator(chunk_size=batch_size):
+        expected[pk] = (shard_of(user_id), do_at.timestamp())
+
+    missing, stale, extra = [], [], []
+    seen = set()
+    for shard in range(settings.HABIT_REMINDER_SHARDS):
+        for member, score in redis.zscan_iter(shard_key(shard), count=batch_size):
+            pk = int(member)
+            expected_shard, expected_score = expected.get(pk, (None, None))
+            if expected_shard != shard:
+                extra.append(pk)
+                if fix:
+                    redis.zrem(shard_key(shard), member)
+                continue
+            seen.add(pk)
+            if abs(score - expected_score) > 1e-3:
+                stale.append(pk)
+    missing = [pk for pk in expected if pk not in seen]
+    if fix and (missing or stale):
+        sync(missing + stale)
+    return {"missing": missing, "stale": stale, "extra": extra}
@@ -0,0 +1,218 @@
+"""Выгрузка привычек потоком NDJSON или CSV (эндпоинт /habits/export/).
+
+Строки читаются курсором на стороне сервера (.iterator()/.aiterator() с
+chunk_size=HABIT_EXPORT_CHUNK_SIZE), преобразуются пачками через
+HabitValuesSerializer и сразу отдаются клиенту, поэтому память не зависит от
+количества привычек. Привычки упорядочены по (do_at, id): прерванную выгрузку
+можно продолжить с последней полученной строки параметрами after_do_at и
+after_id. Если клиент принимает gzip, поток сжимается на лету.
+
+Django собирает в память поток, тип которого не совпадает с сервером
+(асинхронный итератор под WSGI и синхронный под ASGI), поэтому итератор
+выбирается по типу запроса.
+"""
+
+import csv
+import io
+import re
+import zlib
+
+import orjson
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import serializers
+from rest_framework.renderers import BaseRenderer
+
+from config import settings
+from habits.paginators import Cursor, HabitPaginator
+from habits.serializers import HabitValuesSerializer
+
+ACCEPTS_GZIP_RE = re.compile(r"\bgzip\b")
+# Размер части ответа: строки копятся до него, чтобы не отправлять их по одной
+WRITE_SIZE = 64 * 1024
+
+values_serializer = HabitValuesSerializer()
+
+
+class ExportRenderer(BaseRenderer):
+    """Выбирает формат выгрузки по Accept или ?format=; ошибки отдаются JSON."""
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return orjson.dumps(data)
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class HabitExportQuerySerializer(serializers.Serializer):
+    """Позиция, с которой продолжается выгрузка."""
+
+    after_do_at = serializers.DateTimeField(
+        required=False, help_text="do_at последней полученной привычки"
+    )
+    after_id = serializers.IntegerField(
+        required=False, help_text="id последней полученной привычки"
+    )
+
+    def validate(self, attrs):
+        if ("after_do_at" in attrs) != ("after_id" in attrs):
+            raise serializers.ValidationError(
+                "after_do_at и after_id указываются вместе."
+            )
+        return attrs
+
+
+def export_queryset(queryset, query_params):
+    """Строки values() для выгрузки в порядке (do_at, id) после позиции из запроса."""
+
+    serializer = HabitExportQuerySerializer(data=query_params.dict())
+    serializer.is_valid(raise_exception=True)
+    attrs = serializer.validated_data
+    if attrs:
+        # Обратное направление курсора пагинации — условие (do_at, id) > позиции
+        cursor = Cursor(attrs["after_do_at"], attrs["after_id"], True)
+        queryset = queryset.filter(HabitPaginator.position_filter(queryset, cursor))
+    return values_serializer.values(queryset.order_by("do_at", "id"))
+
+
+class NDJSONEncoder:
+    def header(self):
+        return b""
+
+    def encode(self, rows):
+        items = values_serializer.to_representation(rows)
+        return b"".join(orjson.dumps(item) + b"\n" for item in items)
+
+
+class CSVEncoder:
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def header(self):
+        self.writer.writerow(name for name, column in values_serializer.fields)
+        return self.flush()
+
+    def encode(self, rows):
+        for item in values_serializer.to_representation(rows):
+            self.writer.writerow(self.cell(value) for value in item.values())
+        return self.flush()
+
+    @staticmethod
+    def cell(value):
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return value
+
+    def flush(self):
+        data = self.buffer.getvalue().encode()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+ENCODERS = {NDJSONRenderer.format: NDJSONEncoder, CSVRenderer.format: CSVEncoder}
+
+
+class Exporter:
+    """Преобразует пачки строк encoder'ом в части ответа (при необходимости сжатые)."""
+
+    def __init__(self, encoder, compress):
+        self.encoder = encoder
+        # wbits=31 — формат gzip
+        self.compressor = zlib.compressobj(wbits=31) if compress else None
+        self.pending = [self.encoder.header()]
+        self.pending_size = len(self.pending[0])
+
+    def write(self, rows):
+        """Добавляет пачку строк; возвращает часть ответа, если накопилось
+        WRITE_SIZE байт, иначе b""."""
+
+        data = self.encoder.encode(rows)
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if self.pending_size < WRITE_SIZE:
+            return b""
+        return self.take()
+
+    def take(self):
+        data = b"".join(self.pending)
+        self.pending, self.pending_size = [], 0
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        return data
+
+    def close(self):
+        data = self.take()
+        if self.compressor is not None:
+            data += self.compressor.flush()
+        return data
+
+
+def iter_export(rows, exporter):
+    chunk = []
+    for row in rows.iterator(chunk_size=settings.HABIT_EXPORT_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) >= settings.HABIT_EXPORT_CHUNK_SIZE:
+            if data := exporter.write(chunk):
+                yield data
+            chunk = []
+    if chunk and (data := exporter.write(chunk)):
+        yield data
+    yield exporter.close()
+
+
+async def aiter_export(rows, exporter):
+    chunk = []
+    async for row in rows.aiterator(chunk_size=settings.HABIT_EXPORT_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) >= settings.HABIT_EXPORT_CHUNK_SIZE:
+            if data := exporter.write(chunk):
+                yield data
+            chunk = []
+    if chunk and (data := exporter.write(chunk)):
+        yield data
+    yield exporter.close()
+
+
+def streaming_response(request, rows, encoder):
+    """Потоковый ответ со строками rows, преобразованными encoder'ом, в формате
+    рендерера; сжимается, если клиент принимает gzip."""
+
+    renderer = request.accepted_renderer
+    compress = bool(
+        ACCEPTS_GZIP_RE.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    )
+    exporter = Exporter(encoder, compress)
+    if isinstance(request._request, ASGIRequest):
+        content = aiter_export(rows, exporter)
+    else:
+        content = iter_export(rows, exporter)
+
+    response = StreamingHttpResponse(
+        content, content_type=f"{renderer.media_type}; charset={renderer.charset}"
+    )
+    patch_vary_headers(response, ("Accept-Encoding",))
+    if compress:
+        response["Content-Encoding"] = "gzip"
+    return response
+
+
+def export_response(request, queryset):
+    """Потоковый ответ с привычками queryset в формате, выбранном рендерером."""
+
+    rows = export_queryset(queryset, request.query_params)
+    file_format = request.accepted_renderer.format
+    response = streaming_response(request, rows, ENCODERS[file_format]())
+    response["Content-Disposition"] = f'attachment; filename="habits.{file_format}"'
+    return response
@@ -0,0 +1,104 @@
+"""Фильтрация списков привычек по параметрам запроса.
+
+Фильтры рассчитаны на индексы модели Habit: свои привычки выбираются по
+(user, do_at, id), и остальные условия проверяются на диапазоне этого индекса;
+лента публичных привычек с is_enjoyable — по частичному индексу
+habit_public_enjoyable_idx; полезные привычки администратора и рассылка
+напоминаний — по частичному индексу habit_useful_do_at_idx.
+"""
+
+from django.db.models import Q
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+
+class HabitFilterSerializer(serializers.Serializer):
+    """Параметры фильтрации привычек."""
+
+    is_enjoyable = serializers.BooleanField(
+        required=False, help_text="Только приятные (true) или полезные (false)"
+    )
+    is_public = serializers.BooleanField(
+        required=False, help_text="Только публичные (true) или личные (false)"
+    )
+    periodicity = serializers.IntegerField(
+        required=False, min_value=1, max_value=7, help_text="Периодичность в днях"
+    )
+    do_at_after = serializers.DateTimeField(
+        required=False, help_text="Время выполнения не раньше (включительно)"
+    )
+    do_at_before = serializers.DateTimeField(
+        required=False, help_text="Время выполнения раньше (не включительно)"
+    )
+    has_reward = serializers.BooleanField(
+        required=False, help_text="Указано ли вознаграждение"
+    )
+    has_related_habit = serializers.BooleanField(
+        required=False, help_text="Указана ли связанная привычка"
+    )
+
+    def validate(self, attrs):
+        if (
+            "do_at_after" in attrs
+            and "do_at_before" in attrs
+            and attrs["do_at_after"] > attrs["do_at_before"]
+        ):
+            raise serializers.ValidationError(
+                {"do_at_before": ["Должно быть не раньше do_at_after."]}
+            )
+        return attrs
+
+
+class HabitFilterBackend(BaseFilterBackend):
+    """Фильтрует привычки по параметрам HabitFilterSerializer."""
+
+    def get_filter(self, request):
+        # Словарь, а не QueryDict: иначе отсутствующие BooleanField считались бы false
+        serializer = HabitFilterSerializer(data=request.query_params.dict())
+        serializer.is_valid(raise_exception=True)
+        attrs = serializer.validated_data
+
+        condition = Q()
+        for field in ("is_enjoyable", "is_public", "periodicity"):
+            if field in attrs:
+                condition &= Q(**{field: attrs[field]})
+        if "do_at_after" in attrs:
+            condition &= Q(do_at__gte=attrs["do_at_after"])
+        if "do_at_before" in attrs:
+            condition &= Q(do_at__lt=attrs["do_at_before"])
+        if "has_reward" in attrs:
+            has_reward = Q(reward__isnull=False) & ~Q(reward="")
+            condition &= has_reward if attrs["has_reward"] else ~has_reward
+        if "has_related_habit" in attrs:
+            condition &= Q(related_habit__isnull=not attrs["has_related_habit"])
+        return condition
+
+    def filter_queryset(self, request, queryset, view):
+        return queryset.filter(self.get_filter(request))
+
+    def get_schema_fields(self, view):
+        # Параметры описаны в get_schema_operation_parameters (coreapi не нужен)
+        return []
+
+    def get_schema_operation_parameters(self, view):
+        types = {
+            serializers.BooleanField: ("boolean", None),
+            serializers.IntegerField: ("integer", None),
+            serializers.DateTimeField: ("string", "date-time"),
+        }
+        parameters = []
+        for name, field in HabitFilterSerializer().fields.items():
+            schema_type, schema_format = types[type(field)]
+            schema = {"type": schema_type}
+            if schema_format:
+                schema["format"] = schema_format
+            parameters.append(
+                {
+                    "name": name,
+                    "required": False,
+                    "in": "query",
+                    "description": str(field.help_text),
+                    "schema": schema,
+                }
+            )
+        return parameters
@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from habits.tasks import catch_up_overdue_habits
+
+
+class Command(BaseCommand):
+    help = "Переносит просроченные привычки на ближайшее будущее выполнение."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Количество строк в одном UPDATE.",
+        )
+
+    def handle(self, *args, **options):
+        updated = catch_up_overdue_habits(batch_size=options["batch_size"])
+        self.stdout.write(f"Перенесено привычек: {updated}")
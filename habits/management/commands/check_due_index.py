@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand, CommandError
+
+from habits import due_index
+
+
+class Command(BaseCommand):
+    help = "Проверяет, что индекс привычек в Redis совпадает с таблицей привычек."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true", help="Исправить найденные расхождения."
+        )
+
+    def handle(self, *args, **options):
+        result = due_index.check(fix=options["fix"])
+        for name, ids in result.items():
+            self.stdout.write(f"{name}: {len(ids)} {ids[:20]}")
+        if any(result.values()) and not options["fix"]:
+            raise CommandError("Индекс не совпадает с таблицей привычек.")
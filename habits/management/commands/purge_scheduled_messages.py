@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from config import settings
+from habits.models import ScheduledMessage
+
+
+class Command(BaseCommand):
+    help = "Удаляет отправленные сообщения из очереди ScheduledMessage."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=7,
+            help="Удалить сообщения, отправленные более N дней назад (по умолчанию 7).",
+        )
+        parser.add_argument(
+            "--failed",
+            action="store_true",
+            help=(
+                "Удалить также неотправленные сообщения, исчерпавшие все попытки "
+                "или отклоненные телеграмом."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        deleted, _ = ScheduledMessage.objects.filter(
+            sent_at__lt=timezone.now() - timedelta(days=options["days"])
+        ).delete()
+        if options["failed"]:
+            failed, _ = ScheduledMessage.objects.filter(
+                Q(attempts__gte=settings.SCHEDULED_MESSAGE_MAX_ATTEMPTS)
+                | Q(failed_at__isnull=False),
+                sent_at__isnull=True,
+            ).delete()
+            deleted += failed
+        self.stdout.write(f"Удалено сообщений: {deleted}")
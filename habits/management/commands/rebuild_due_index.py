@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from habits import due_index
+
+
+class Command(BaseCommand):
+    help = "Перестраивает индекс привычек по времени выполнения в Redis."
+
+    def handle(self, *args, **options):
+        count = due_index.rebuild()
+        self.stdout.write(f"Привычек в индексе: {count}")
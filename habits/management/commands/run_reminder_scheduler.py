@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from habits.scheduler import ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Запускает планировщик, который отправляет напоминания о привычках "
+        "с точностью до секунды."
+    )
+
+    def handle(self, *args, **options):
+        ReminderScheduler().run()
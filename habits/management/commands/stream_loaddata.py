@@ -0,0 +1,45 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from config.fixtures import FixtureError, FixtureLoader
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает большие JSON-фикстуры потоково и пачками (вместо loaddata, "
+        "который читает файл в память целиком и сохраняет объекты по одному)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Файлы фикстур по порядку.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Количество объектов в одной транзакции.",
+        )
+        parser.add_argument(
+            "--ignorenonexistent",
+            action="store_true",
+            help="Пропускать поля, которых нет в моделях.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть больше 0.")
+        start = time.perf_counter()
+        loader = FixtureLoader(
+            batch_size=options["batch_size"],
+            ignorenonexistent=options["ignorenonexistent"],
+        )
+        try:
+            for path in options["paths"]:
+                with open(path, encoding="utf-8") as file:
+                    loader.load(file)
+            counts = loader.finish()
+        except FixtureError as error:
+            raise CommandError(str(error)) from error
+        for label, count in counts.items():
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(f"Загружено за {time.perf_counter() - start:.1f} с")
@@ -0,0 +1,90 @@
+"""Метрики рассылки напоминаний в формате Prometheus.
+
+Если задана переменная окружения PROMETHEUS_MULTIPROC_DIR, значения пишутся в
+файлы этого каталога и собираются со всех процессов (воркеры celery, gunicorn)
+при запросе /metrics/. Метрики отдаются только с токеном METRICS_TOKEN.
+"""
+
+import os
+
+from celery.signals import worker_process_shutdown
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+LAG_BUCKETS = (-60, -30, -10, -1, 0, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+
+SWEEP_DURATION = Histogram(
+    "habit_reminder_sweep_duration_seconds",
+    "Длительность обработки привычек одной задачей рассылки",
+    ["source"],
+)
+HABITS_SCANNED = Counter(
+    "habit_reminder_habits_scanned_total",
+    "Привычки, выбранные обходом для рассылки",
+    ["source"],
+)
+HABITS_CLAIMED = Counter(
+    "habit_reminder_habits_claimed_total",
+    "Привычки, по которым поставлены напоминания",
+    ["source"],
+)
+SCHEDULE_LAG = Histogram(
+    "habit_reminder_schedule_lag_seconds",
+    "Время постановки напоминаний минус время напоминания (do_at - 5 мин)",
+    buckets=LAG_BUCKETS,
+)
+MESSAGES_QUEUED = Counter(
+    "habit_reminder_messages_queued_total",
+    "Сообщения, добавленные в очередь ScheduledMessage",
+)
+MESSAGES_SENT = Counter("telegram_messages_sent_total", "Отправленные сообщения")
+MESSAGES_FAILED = Counter(
+    "telegram_messages_failed_total", "Сообщения, отправку которых нужно повторить"
+)
+MESSAGES_REJECTED = Counter(
+    "telegram_messages_rejected_total",
+    "Сообщения, отклоненные телеграмом без повтора (например, бот заблокирован)",
+)
+DELIVERY_LAG = Histogram(
+    "telegram_delivery_lag_seconds",
+    "Время отправки сообщения минус запланированное время отправки",
+    buckets=LAG_BUCKETS[4:],
+)
+PUBLIC_CACHE_HITS = Counter(
+    "habit_public_cache_hits_total",
+    "Попадания в кэш ленты публичных привычек",
+    ["tier"],
+)
+PUBLIC_CACHE_MISSES = Counter(
+    "habit_public_cache_misses_total", "Промахи кэша ленты публичных привычек"
+)
+REQUEST_DURATION = Histogram(
+    "telegram_request_duration_seconds",
+    "Длительность запроса sendMessage к телеграму",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+
+def registry():
+    """Реестр для выдачи метрик: в многопроцессном режиме собирается из файлов."""
+
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def render():
+    """Возвращает метрики в текстовом формате Prometheus и их content type."""
+
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
+
+
+@worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    """Удаляет gauge-файлы завершившегося процесса воркера."""
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
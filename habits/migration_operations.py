@@ -0,0 +1,43 @@
+"""Операции миграций, которые выполняются только в части СУБД."""
+
+from django.db.migrations.operations.base import Operation
+
+
+class PostgresOnly(Operation):
+    """Изменяет схему операцией operation только в Postgres; состояние моделей
+    меняется на любой СУБД.
+
+    Нужна для полей и индексов, которые есть только в Postgres (например,
+    полнотекстовый поиск), чтобы миграции проходили и на других СУБД."""
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def deconstruct(self):
+        return self.__class__.__qualname__, [self.operation], {}
+
+    @property
+    def reversible(self):
+        return self.operation.reversible
+
+    def state_forwards(self, app_label, state):
+        self.operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            self.operation.database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            self.operation.database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def describe(self):
+        return f"{self.operation.describe()} (только Postgres)"
+
+    @property
+    def migration_name_fragment(self):
+        return self.operation.migration_name_fragment
@@ -0,0 +1,96 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0003_alter_habit_options"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduledMessage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "chat_id",
+                    models.CharField(
+                        help_text="Укажите телеграм chat-id",
+                        max_length=50,
+                        verbose_name="Телеграм chat-id",
+                    ),
+                ),
+                (
+                    "text",
+                    models.TextField(
+                        help_text="Укажите текст сообщения", verbose_name="Текст"
+                    ),
+                ),
+                (
+                    "send_at",
+                    models.DateTimeField(
+                        help_text="Укажите время отправки",
+                        verbose_name="Время отправки",
+                    ),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Заполняется после отправки",
+                        null=True,
+                        verbose_name="Время фактической отправки",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0,
+                        help_text="Количество попыток отправки",
+                        verbose_name="Попытки отправки",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Укажите привычку",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="scheduled_messages",
+                        to="habits.habit",
+                        verbose_name="Привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Запланированное сообщение",
+                "verbose_name_plural": "Запланированные сообщения",
+                "ordering": ("send_at",),
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("sent_at__isnull", True)),
+                        fields=["send_at"],
+                        name="scheduled_message_pending_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0004_scheduledmessage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderDelivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "occurrence",
+                    models.DateTimeField(
+                        help_text="Дата и время выполнения привычки, о котором напоминание",
+                        verbose_name="Дата и время выполнения",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("before", "За 5 минут до начала"),
+                            ("start", "Начало привычки"),
+                            ("reward", "Приятная привычка или вознаграждение"),
+                        ],
+                        help_text="Укажите вид напоминания",
+                        max_length=10,
+                        verbose_name="Вид напоминания",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        help_text="Укажите привычку",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reminder_deliveries",
+                        to="habits.habit",
+                        verbose_name="Привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Отправленное напоминание",
+                "verbose_name_plural": "Отправленные напоминания",
+                "ordering": ("-occurrence",),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("habit", "occurrence", "kind"),
+                        name="reminder_delivery_unique_occurrence",
+                    )
+                ],
+            },
+        ),
+    ]
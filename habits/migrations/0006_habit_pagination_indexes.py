@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0005_reminderdelivery"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(fields=["do_at", "id"], name="habit_do_at_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(
+                fields=["user", "do_at", "id"], name="habit_user_do_at_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["do_at", "id"],
+                name="habit_public_do_at_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0006_habit_pagination_indexes"),
+        ("users", "0002_alter_user_options_remove_user_username_user_avatar_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitVersion",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="habit_version",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+                (
+                    "version",
+                    models.PositiveBigIntegerField(default=0, verbose_name="Версия"),
+                ),
+                ("updated_at", models.DateTimeField(verbose_name="Дата изменения")),
+            ],
+            options={
+                "verbose_name": "Версия привычек пользователя",
+                "verbose_name_plural": "Версии привычек пользователей",
+            },
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата изменения"),
+        ),
+    ]
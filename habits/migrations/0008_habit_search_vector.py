@@ -0,0 +1,54 @@
+# Generated by Django 5.1.15 on 2026-10-18 21:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+from habits.migration_operations import PostgresOnly
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0007_habit_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # Поисковый вектор и индекс создаются только в Postgres и не входят в
+    # состояние моделей: на других СУБД поиск сводится к icontains (habits.search)
+    operations = [
+        PostgresOnly(
+            migrations.SeparateDatabaseAndState(
+                database_operations=[
+                    migrations.AddField(
+                        model_name="habit",
+                        name="search_vector",
+                        field=models.GeneratedField(
+                            db_persist=True,
+                            expression=django.contrib.postgres.search.CombinedSearchVector(
+                                django.contrib.postgres.search.SearchVector(
+                                    "action", config="russian", weight="A"
+                                ),
+                                "||",
+                                django.contrib.postgres.search.SearchVector(
+                                    "place", config="russian", weight="B"
+                                ),
+                                django.contrib.postgres.search.SearchConfig("russian"),
+                            ),
+                            output_field=django.contrib.postgres.search.SearchVectorField(),
+                            verbose_name="Поисковый вектор",
+                        ),
+                    ),
+                    migrations.AddIndex(
+                        model_name="habit",
+                        index=django.contrib.postgres.indexes.GinIndex(
+                            condition=models.Q(("is_public", True)),
+                            fields=["search_vector"],
+                            name="habit_public_search_idx",
+                        ),
+                    ),
+                ]
+            )
+        ),
+    ]
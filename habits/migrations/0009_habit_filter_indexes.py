@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-18 21:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0008_habit_search_vector"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(
+                condition=models.Q(("is_enjoyable", False)),
+                fields=["do_at"],
+                name="habit_useful_do_at_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["is_enjoyable", "do_at", "id"],
+                name="habit_public_enjoyable_idx",
+            ),
+        ),
+    ]
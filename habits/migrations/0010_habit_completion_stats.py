@@ -0,0 +1,210 @@
+# Generated by Django 5.1.15 on 2026-10-18 23:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0009_habit_filter_indexes"),
+        ("users", "0002_alter_user_options_remove_user_username_user_avatar_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitStreak",
+            fields=[
+                (
+                    "current",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Текущая серия"
+                    ),
+                ),
+                (
+                    "longest",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Самая длинная серия"
+                    ),
+                ),
+                (
+                    "first_on",
+                    models.DateField(
+                        blank=True, null=True, verbose_name="Первый день с выполнением"
+                    ),
+                ),
+                (
+                    "last_on",
+                    models.DateField(
+                        blank=True,
+                        null=True,
+                        verbose_name="Последний день с выполнением",
+                    ),
+                ),
+                (
+                    "habit",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="streak",
+                        serialize=False,
+                        to="habits.habit",
+                        verbose_name="Привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Серия выполнений привычки",
+                "verbose_name_plural": "Серии выполнений привычек",
+            },
+        ),
+        migrations.CreateModel(
+            name="UserStreak",
+            fields=[
+                (
+                    "current",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Текущая серия"
+                    ),
+                ),
+                (
+                    "longest",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Самая длинная серия"
+                    ),
+                ),
+                (
+                    "first_on",
+                    models.DateField(
+                        blank=True, null=True, verbose_name="Первый день с выполнением"
+                    ),
+                ),
+                (
+                    "last_on",
+                    models.DateField(
+                        blank=True,
+                        null=True,
+                        verbose_name="Последний день с выполнением",
+                    ),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="habit_streak",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Серия выполнений пользователя",
+                "verbose_name_plural": "Серии выполнений пользователей",
+            },
+        ),
+        migrations.CreateModel(
+            name="HabitCompletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "occurrence",
+                    models.DateTimeField(
+                        help_text="Дата и время выполнения привычки, которое отмечено",
+                        verbose_name="Дата и время выполнения",
+                    ),
+                ),
+                (
+                    "completed_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата отметки"
+                    ),
+                ),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        help_text="Укажите привычку",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="completions",
+                        to="habits.habit",
+                        verbose_name="Привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Выполнение привычки",
+                "verbose_name_plural": "Выполнения привычек",
+                "ordering": ("-occurrence",),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("habit", "occurrence"),
+                        name="habit_completion_unique_occurrence",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="HabitDailyStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="Дата")),
+                (
+                    "completions",
+                    models.PositiveIntegerField(default=0, verbose_name="Выполнений"),
+                ),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="habits.habit",
+                        verbose_name="Привычка",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="habit_daily_stats",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Выполнения привычки за день",
+                "verbose_name_plural": "Выполнения привычек по дням",
+                "indexes": [
+                    models.Index(
+                        fields=["user", "date"], name="habit_daily_stat_user_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("habit", "date"), name="habit_daily_stat_unique_date"
+                    )
+                ],
+            },
+        ),
+    ]
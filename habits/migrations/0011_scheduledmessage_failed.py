@@ -0,0 +1,48 @@
+# Generated by Django 5.1.15 on 2026-10-19 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0010_habit_completion_stats"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="scheduledmessage",
+            name="scheduled_message_pending_idx",
+        ),
+        migrations.AddField(
+            model_name="scheduledmessage",
+            name="error",
+            field=models.CharField(
+                blank=True,
+                help_text="Ответ телеграма на отклоненное сообщение",
+                max_length=255,
+                null=True,
+                verbose_name="Ошибка",
+            ),
+        ),
+        migrations.AddField(
+            model_name="scheduledmessage",
+            name="failed_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Заполняется, если телеграм отклонил сообщение (повтора не будет)",
+                null=True,
+                verbose_name="Время отказа",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="scheduledmessage",
+            index=models.Index(
+                condition=models.Q(
+                    ("failed_at__isnull", True), ("sent_at__isnull", True)
+                ),
+                fields=["send_at"],
+                name="scheduled_message_pending_idx",
+            ),
+        ),
+    ]
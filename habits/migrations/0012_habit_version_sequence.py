@@ -0,0 +1,77 @@
+# Generated by Django 5.1.15 on 2026-10-19 00:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from habits.migration_operations import PostgresOnly
+
+
+class Migration(migrations.Migration):
+    """Версии привычек из общей последовательности и строка для привычек без
+    владельца.
+
+    Таблица создается заново: версии нужны только для ETag и Last-Modified,
+    после миграции клиенты один раз получат полный ответ вместо 304."""
+
+    dependencies = [
+        ("habits", "0011_scheduledmessage_failed"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="HabitVersion",
+        ),
+        migrations.CreateModel(
+            name="HabitVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="habit_versions",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+                (
+                    "version",
+                    models.PositiveBigIntegerField(default=0, verbose_name="Версия"),
+                ),
+                ("updated_at", models.DateTimeField(verbose_name="Дата изменения")),
+            ],
+            options={
+                "verbose_name": "Версия привычек пользователя",
+                "verbose_name_plural": "Версии привычек пользователей",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user",),
+                        name="habit_version_unique_user",
+                        nulls_distinct=False,
+                    )
+                ],
+            },
+        ),
+        PostgresOnly(
+            migrations.RunSQL(
+                sql="""
+                CREATE SEQUENCE habits_habitversion_version_seq
+                OWNED BY habits_habitversion.version
+                """,
+                reverse_sql="DROP SEQUENCE habits_habitversion_version_seq",
+            )
+        ),
+    ]
@@ -1,10 +1,15 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import connection, models
 from django.utils import timezone
 
 from config import settings
 
 NULLABLE = {"blank": True, "null": True}
 
+# Конфигурация полнотекстового поиска по привычкам (habits.search)
+SEARCH_CONFIG = "russian"
+
 
 class Habit(models.Model):
     user = models.ForeignKey(
@@ -62,6 +67,14 @@ class Habit(models.Model):
         help_text="Укажите, публичная ли привычка",
         default=False,
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True,
+    )
+    # Поисковый вектор (хранимый столбец search_vector из action и place) и
+    # GIN-индекс habit_public_search_idx по нему создаются только в Postgres
+    # миграцией 0008 и не входят в модель, чтобы схема работала и на других
+    # СУБД (см. habits.search)
 
     def __str__(self):
         return f"Я буду {self.action} в {timezone.localtime(self.do_at).strftime("%d.%m.%Y %H:%M")} {self.place}"
@@ -70,3 +83,492 @@ class Habit(models.Model):
         verbose_name = "Привычка"
         verbose_name_plural = "Привычки"
         ordering = ("-do_at",)
+        indexes = [
+            # ключи пагинации по курсору для всех, своих и публичных привычек
+            models.Index(fields=["do_at", "id"], name="habit_do_at_id_idx"),
+            models.Index(
+                fields=["user", "do_at", "id"], name="habit_user_do_at_id_idx"
+            ),
+            models.Index(
+                fields=["do_at", "id"],
+                condition=models.Q(is_public=True),
+                name="habit_public_do_at_id_idx",
+            ),
+            # рассылка напоминаний и фильтр is_enjoyable=false по всем привычкам
+            models.Index(
+                fields=["do_at"],
+                condition=models.Q(is_enjoyable=False),
+                name="habit_useful_do_at_idx",
+            ),
+            # фильтр is_enjoyable в ленте публичных привычек
+            models.Index(
+                fields=["is_enjoyable", "do_at", "id"],
+                condition=models.Q(is_public=True),
+                name="habit_public_enjoyable_idx",
+            ),
+        ]
+
+
+class ScheduledMessageManager(models.Manager):
+    def bulk_insert(self, rows):
+        """Добавляет сообщения в очередь одним INSERT ... SELECT FROM unnest(...).
+
+        rows: [(habit_id, chat_id, text, send_at), ...]. В отличие от bulk_create
+        не создает объекты моделей, что заметно быстрее на десятках тысяч строк."""
+
+        if not rows:
+            return 0
+        habit_ids, chat_ids, texts, send_ats = zip(*rows)
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (habit_id, chat_id, text, send_at, attempts, created_at)
+                SELECT habit_id, chat_id, text, send_at, 0, NOW()
+                FROM unnest(%s::bigint[], %s::varchar[], %s::text[], %s::timestamptz[])
+                    AS rows (habit_id, chat_id, text, send_at)
+                """,
+                [list(habit_ids), list(chat_ids), list(texts), list(send_ats)],
+            )
+            return cursor.rowcount
+
+
+class ScheduledMessage(models.Model):
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        verbose_name="Привычка",
+        help_text="Укажите привычку",
+        related_name="scheduled_messages",
+        **NULLABLE,
+    )
+    chat_id = models.CharField(
+        max_length=50,
+        verbose_name="Телеграм chat-id",
+        help_text="Укажите телеграм chat-id",
+    )
+    text = models.TextField(
+        verbose_name="Текст",
+        help_text="Укажите текст сообщения",
+    )
+    send_at = models.DateTimeField(
+        verbose_name="Время отправки",
+        help_text="Укажите время отправки",
+    )
+    sent_at = models.DateTimeField(
+        verbose_name="Время фактической отправки",
+        help_text="Заполняется после отправки",
+        **NULLABLE,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name="Попытки отправки",
+        help_text="Количество попыток отправки",
+        default=0,
+    )
+    failed_at = models.DateTimeField(
+        verbose_name="Время отказа",
+        help_text="Заполняется, если телеграм отклонил сообщение (повтора не будет)",
+        **NULLABLE,
+    )
+    error = models.CharField(
+        max_length=255,
+        verbose_name="Ошибка",
+        help_text="Ответ телеграма на отклоненное сообщение",
+        **NULLABLE,
+    )
+    created_at = models.DateTimeField(
+        verbose_name="Дата создания",
+        auto_now_add=True,
+    )
+
+    objects = ScheduledMessageManager()
+
+    def __str__(self):
+        return f"{self.chat_id}: {self.text}"
+
+    class Meta:
+        verbose_name = "Запланированное сообщение"
+        verbose_name_plural = "Запланированные сообщения"
+        ordering = ("send_at",)
+        indexes = [
+            # Очередь на отправку: только неотправленные и не отклоненные
+            # сообщения по времени отправки
+            models.Index(
+                fields=["send_at"],
+                condition=models.Q(sent_at__isnull=True, failed_at__isnull=True),
+                name="scheduled_message_pending_idx",
+            ),
+        ]
+
+
+class ReminderDeliveryQuerySet(models.QuerySet):
+    def for_habit(self, habit, days):
+        """Напоминания по привычке за последние days дней (по индексу habit, occurrence)."""
+
+        return self.filter(
+            habit=habit, occurrence__gte=timezone.now() - timedelta(days=days)
+        ).order_by("-occurrence", "id")
+
+
+class ReminderDeliveryManager(models.Manager.from_queryset(ReminderDeliveryQuerySet)):
+    def record(self, rows):
+        """Записывает напоминания в журнал одним INSERT ... ON CONFLICT DO NOTHING.
+
+        rows: [(habit_id, occurrence, kind), ...]. Возвращает множество ключей
+        (habit_id, occurrence, kind), которые были записаны этим вызовом: уже
+        отправленные ранее напоминания в него не попадают."""
+
+        if not rows:
+            return set()
+        habit_ids, occurrences, kinds = zip(*rows)
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (habit_id, occurrence, kind, created_at)
+                SELECT habit_id, occurrence, kind, NOW()
+                FROM unnest(%s::bigint[], %s::timestamptz[], %s::varchar[])
+                    AS rows (habit_id, occurrence, kind)
+                ON CONFLICT (habit_id, occurrence, kind) DO NOTHING
+                RETURNING habit_id, occurrence, kind
+                """,
+                [list(habit_ids), list(occurrences), list(kinds)],
+            )
+            return set(cursor.fetchall())
+
+
+class ReminderDelivery(models.Model):
+    BEFORE = "before"
+    START = "start"
+    REWARD = "reward"
+    KIND_CHOICES = (
+        (BEFORE, "За 5 минут до начала"),
+        (START, "Начало привычки"),
+        (REWARD, "Приятная привычка или вознаграждение"),
+    )
+
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        verbose_name="Привычка",
+        help_text="Укажите привычку",
+        related_name="reminder_deliveries",
+    )
+    occurrence = models.DateTimeField(
+        verbose_name="Дата и время выполнения",
+        help_text="Дата и время выполнения привычки, о котором напоминание",
+    )
+    kind = models.CharField(
+        max_length=10,
+        choices=KIND_CHOICES,
+        verbose_name="Вид напоминания",
+        help_text="Укажите вид напоминания",
+    )
+    created_at = models.DateTimeField(
+        verbose_name="Дата создания",
+        auto_now_add=True,
+    )
+
+    objects = ReminderDeliveryManager()
+
+    def __str__(self):
+        return f"{self.habit_id} {self.occurrence} {self.kind}"
+
+    class Meta:
+        verbose_name = "Отправленное напоминание"
+        verbose_name_plural = "Отправленные напоминания"
+        ordering = ("-occurrence",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["habit", "occurrence", "kind"],
+                name="reminder_delivery_unique_occurrence",
+            ),
+        ]
+
+
+class HabitVersionManager(models.Manager):
+    def bump(self, user_ids):
+        """Присваивает спискам привычек пользователей новую версию одним
+        INSERT ... ON CONFLICT DO UPDATE. Вызывается при любом изменении привычек,
+        в той же транзакции; привычки без владельца (user_id None) меняют версию
+        строки без пользователя.
+
+        Версии берутся из общей последовательности, поэтому любое изменение
+        увеличивает и наибольшую версию всех строк."""
+
+        user_ids = sorted(
+            set(user_ids), key=lambda user_id: (user_id is not None, user_id)
+        )
+        if not user_ids:
+            return
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (user_id, version, updated_at)
+                SELECT user_id, nextval('{VERSION_SEQUENCE}'), NOW()
+                FROM unnest(%s::bigint[]) AS rows (user_id)
+                ON CONFLICT (user_id) DO UPDATE
+                SET version = EXCLUDED.version, updated_at = EXCLUDED.updated_at
+                """,
+                [user_ids],
+            )
+
+    async def afor_user(self, user):
+        """Версия и время последнего изменения привычек пользователя, для
+        администратора — всех привычек.
+
+        Версия всех привычек — количество строк и наибольшая версия: версия
+        растет при любом изменении, а если строки только удалялись, меняется
+        количество."""
+
+        if user.is_staff:
+            versions = await self.aaggregate(
+                version=models.Max("version"),
+                rows=models.Count("pk"),
+                updated_at=models.Max("updated_at"),
+            )
+            return (
+                f"{versions['rows']}.{versions['version'] or 0}",
+                versions["updated_at"],
+            )
+        row = await self.filter(user=user).values_list("version", "updated_at").afirst()
+        if row is None:
+            return "0", None
+        return str(row[0]), row[1]
+
+
+# Последовательность версий HabitVersion (создается миграцией 0012, только в Postgres)
+VERSION_SEQUENCE = "habits_habitversion_version_seq"
+
+
+class HabitVersion(models.Model):
+    """Счетчик изменений привычек пользователя для ETag и Last-Modified.
+
+    Строка без пользователя считает изменения привычек без владельца."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
+        verbose_name="Пользователь",
+        related_name="habit_versions",
+    )
+    version = models.PositiveBigIntegerField(
+        verbose_name="Версия",
+        default=0,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+    )
+
+    objects = HabitVersionManager()
+
+    def __str__(self):
+        return f"{self.user_id} {self.version}"
+
+    class Meta:
+        verbose_name = "Версия привычек пользователя"
+        verbose_name_plural = "Версии привычек пользователей"
+        constraints = [
+            # Одна строка на пользователя и одна строка без пользователя
+            models.UniqueConstraint(
+                fields=["user"],
+                name="habit_version_unique_user",
+                nulls_distinct=False,
+            ),
+        ]
+
+
+class HabitCompletion(models.Model):
+    """Отметка о выполнении привычки в одно из ее времен выполнения."""
+
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        verbose_name="Привычка",
+        help_text="Укажите привычку",
+        related_name="completions",
+    )
+    occurrence = models.DateTimeField(
+        verbose_name="Дата и время выполнения",
+        help_text="Дата и время выполнения привычки, которое отмечено",
+    )
+    completed_at = models.DateTimeField(
+        verbose_name="Дата отметки",
+        auto_now_add=True,
+    )
+
+    def __str__(self):
+        return f"{self.habit_id} {self.occurrence}"
+
+    class Meta:
+        verbose_name = "Выполнение привычки"
+        verbose_name_plural = "Выполнения привычек"
+        ordering = ("-occurrence",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["habit", "occurrence"],
+                name="habit_completion_unique_occurrence",
+            ),
+        ]
+
+
+class HabitDailyStatManager(models.Manager):
+    def add(self, habit_id, user_id, date):
+        """Учитывает выполнение привычки за день одним INSERT ... ON CONFLICT DO UPDATE.
+
+        Возвращает количество выполнений привычки за этот день с учетом нового."""
+
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (habit_id, user_id, date, completions)
+                VALUES (%s, %s, %s, 1)
+                ON CONFLICT (habit_id, date) DO UPDATE
+                SET completions = {table}.completions + 1
+                RETURNING completions
+                """,
+                [habit_id, user_id, date],
+            )
+            return cursor.fetchone()[0]
+
+
+class HabitDailyStat(models.Model):
+    """Количество выполнений привычки за день (по местному времени).
+
+    Ведется при каждой отметке, чтобы статистика читала дни, а не весь журнал
+    выполнений."""
+
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        verbose_name="Привычка",
+        related_name="daily_stats",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        related_name="habit_daily_stats",
+        **NULLABLE,
+    )
+    date = models.DateField(
+        verbose_name="Дата",
+    )
+    completions = models.PositiveIntegerField(
+        verbose_name="Выполнений",
+        default=0,
+    )
+
+    objects = HabitDailyStatManager()
+
+    def __str__(self):
+        return f"{self.habit_id} {self.date} {self.completions}"
+
+    class Meta:
+        verbose_name = "Выполнения привычки за день"
+        verbose_name_plural = "Выполнения привычек по дням"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["habit", "date"],
+                name="habit_daily_stat_unique_date",
+            ),
+        ]
+        indexes = [
+            # статистика пользователя по всем его привычкам
+            models.Index(fields=["user", "date"], name="habit_daily_stat_user_idx"),
+        ]
+
+
+class Streak(models.Model):
+    """Серия дней с выполнением: дни идут подряд, если между ними не больше gap дней.
+
+    Хранится готовой и продлевается отметкой за новый день; отметка задним
+    числом пересчитывает серию по дням из HabitDailyStat."""
+
+    current = models.PositiveIntegerField(
+        verbose_name="Текущая серия",
+        default=0,
+    )
+    longest = models.PositiveIntegerField(
+        verbose_name="Самая длинная серия",
+        default=0,
+    )
+    first_on = models.DateField(
+        verbose_name="Первый день с выполнением",
+        **NULLABLE,
+    )
+    last_on = models.DateField(
+        verbose_name="Последний день с выполнением",
+        **NULLABLE,
+    )
+
+    def add(self, date, gap, dates):
+        """Учитывает новый день с выполнением date; dates() — все такие дни по
+        возрастанию, если серию нужно пересчитать."""
+
+        if self.last_on is None or date > self.last_on:
+            self.extend(date, gap)
+        else:
+            self.current = self.longest = 0
+            self.first_on = self.last_on = None
+            for day in dates():
+                self.extend(day, gap)
+        self.save()
+
+    def extend(self, date, gap):
+        if self.last_on is not None and (date - self.last_on).days <= gap:
+            self.current += 1
+        else:
+            self.current = 1
+        self.first_on = self.first_on or date
+        self.last_on = date
+        self.longest = max(self.longest, self.current)
+
+    def current_on(self, today, gap):
+        """Текущая серия на день today: она прервана, если пропущен срок gap."""
+
+        if self.last_on is None or (today - self.last_on).days > gap:
+            return 0
+        return self.current
+
+    class Meta:
+        abstract = True
+
+
+class HabitStreak(Streak):
+    habit = models.OneToOneField(
+        Habit,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Привычка",
+        related_name="streak",
+    )
+
+    def __str__(self):
+        return f"{self.habit_id} {self.current}"
+
+    class Meta:
+        verbose_name = "Серия выполнений привычки"
+        verbose_name_plural = "Серии выполнений привычек"
+
+
+class UserStreak(Streak):
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Пользователь",
+        related_name="habit_streak",
+    )
+
+    def __str__(self):
+        return f"{self.user_id} {self.current}"
+
+    class Meta:
+        verbose_name = "Серия выполнений пользователя"
+        verbose_name_plural = "Серии выполнений пользователей"
@@ -0,0 +1,190 @@
+"""Календарь привычек: все времена выполнения в диапазоне дат (эндпоинт
+/habits/calendar/).
+
+Времена выполнения привычки — do_at + k * periodicity дней для любого целого k.
+Они вычисляются не циклом по привычкам и дням, а арифметикой NumPy над
+массивами (do_at, periodicity) пачки привычек: первое время в диапазоне и
+количество времен получаются целочисленным делением, а все времена —
+np.repeat со смещениями внутри привычки. Время выводится по местному времени
+(TIME_ZONE) с учетом смены смещения внутри диапазона.
+
+Привычки читаются курсором пачками по HABIT_EXPORT_CHUNK_SIZE и отдаются
+потоком NDJSON, как выгрузка (habits.export): строка на привычку со всеми ее
+временами в диапазоне.
+"""
+
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.db.models import BigIntegerField
+from django.db.models.functions import Cast, Extract
+from django.utils import timezone
+from rest_framework import serializers
+
+from config import settings
+from habits import export
+
+MICROSECOND = timedelta(microseconds=1)
+DAY = 86400 * 10**6
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class HabitCalendarQuerySerializer(serializers.Serializer):
+    """Диапазон дат календаря."""
+
+    def get_fields(self):
+        # from — ключевое слово Python, поэтому поля задаются словарем
+        return {
+            "from": serializers.DateField(help_text="Первый день (включительно)"),
+            "to": serializers.DateField(help_text="Последний день (включительно)"),
+        }
+
+    def validate(self, attrs):
+        if attrs["to"] < attrs["from"]:
+            raise serializers.ValidationError({"to": ["Должно быть не раньше from."]})
+        if (attrs["to"] - attrs["from"]).days >= settings.HABIT_CALENDAR_MAX_DAYS:
+            raise serializers.ValidationError(
+                {"to": [f"Не больше {settings.HABIT_CALENDAR_MAX_DAYS} дней."]}
+            )
+        return attrs
+
+
+def to_microseconds(value):
+    """Время в микросекундах Unix."""
+
+    return (value - EPOCH) // MICROSECOND
+
+
+def utc_offset(moment, zone):
+    """Смещение местного времени в микросекундах в момент moment (микросекунды Unix)."""
+
+    return (EPOCH + moment * MICROSECOND).astimezone(zone).utcoffset() // MICROSECOND
+
+
+def offset_segments(start, end, zone):
+    """Смещения местного времени в интервале [start, end).
+
+    Возвращает (границы, смещения): смещения[i] действует с границы[i - 1] до
+    границы[i]. Смещение проверяется раз в сутки, а момент его смены
+    уточняется двоичным поиском."""
+
+    bounds, offsets = [], [utc_offset(start, zone)]
+    moments = [*range(start, end, DAY), end - 1]
+    for previous, moment in zip(moments, moments[1:]):
+        if utc_offset(moment, zone) == offsets[-1]:
+            continue
+        low, high = previous, moment
+        while high - low > 1:
+            middle = (low + high) // 2
+            if utc_offset(middle, zone) == offsets[-1]:
+                low = middle
+            else:
+                high = middle
+        bounds.append(high)
+        offsets.append(utc_offset(high, zone))
+    return np.array(bounds, dtype=np.int64), np.array(offsets, dtype=np.int64)
+
+
+def offset_suffix(offset):
+    """Смещение в формате ISO 8601, как в HabitSerializer ("+03:00" или "Z")."""
+
+    zone = dt_timezone(offset * MICROSECOND)
+    suffix = datetime(2000, 1, 1, tzinfo=zone).isoformat()[19:]
+    return "Z" if suffix == "+00:00" else suffix
+
+
+def expand(do_at, periodicity, start, end):
+    """Времена выполнения привычек в интервале [start, end).
+
+    do_at и periodicity — массивы по привычкам, время в микросекундах Unix.
+    Возвращает (времена подряд по привычкам, количество времен каждой привычки)."""
+
+    period = np.maximum(periodicity, 1) * DAY
+    # Первое время не раньше start: do_at + ceil((start - do_at) / period) * period
+    first = do_at - np.floor_divide(do_at - start, period) * period
+    counts = np.where(first < end, (end - 1 - first) // period + 1, 0)
+    group_starts = np.repeat(np.cumsum(counts) - counts, counts)
+    steps = np.arange(counts.sum()) - group_starts
+    return np.repeat(first, counts) + steps * np.repeat(period, counts), counts
+
+
+class CalendarEncoder:
+    """Преобразует пачки строк calendar_rows в строки
+    NDJSON {"habit": id, "occurrences": [...]}; привычки без времен в диапазоне
+    пропускаются."""
+
+    def __init__(self, start, end, zone):
+        self.start = start
+        self.end = end
+        self.bounds, self.offsets = offset_segments(start, end, zone)
+        self.suffixes = np.array([offset_suffix(offset) for offset in self.offsets])
+
+    def header(self):
+        return b""
+
+    def encode(self, rows):
+        ids, do_at, periodicity = np.array(
+            [(row["id"], row["do_at_us"], row["periodicity"]) for row in rows],
+            dtype=np.int64,
+        ).T
+        occurrences, counts = expand(do_at, periodicity, self.start, self.end)
+
+        segments = np.searchsorted(self.bounds, occurrences, side="right")
+        local = (occurrences + self.offsets[segments]).astype("datetime64[us]")
+        # Как datetime.isoformat(): микросекунды выводятся, только если они есть
+        strings = np.datetime_as_string(local, unit="s").astype("U26")
+        fractional = local.astype(np.int64) % 10**6 != 0
+        if fractional.any():
+            strings[fractional] = np.datetime_as_string(local[fractional], unit="us")
+        if len(self.offsets) > 1:
+            strings = np.strings.add(strings, self.suffixes[segments])
+            suffix = ""
+        else:
+            suffix = str(self.suffixes[0])
+
+        strings = strings.tolist()
+        separator = f'{suffix}","'
+        lines = []
+        position = 0
+        for habit_id, count in zip(ids.tolist(), counts.tolist()):
+            if not count:
+                continue
+            joined = separator.join(strings[position : position + count])
+            lines.append(f'{{"habit":{habit_id},"occurrences":["{joined}{suffix}"]}}\n')
+            position += count
+        return "".join(lines).encode()
+
+
+def calendar_rows(queryset):
+    """Строки {id, do_at_us (do_at в микросекундах Unix), periodicity} привычек по id.
+
+    values(), а не values_list(): values_list() с выражением выполняет запрос
+    уже при создании итератора, и .aiterator() падает под ASGI."""
+
+    # Без tzinfo Django вычислил бы epoch от местного времени
+    epoch = Extract("do_at", "epoch", tzinfo=dt_timezone.utc)
+    return (
+        queryset.order_by("id")
+        .annotate(do_at_us=Cast(epoch * 10**6, BigIntegerField()))
+        .values("id", "do_at_us", "periodicity")
+    )
+
+
+def calendar_response(request, queryset):
+    """Потоковый ответ с временами выполнения привычек queryset в диапазоне
+    дат из запроса."""
+
+    query = HabitCalendarQuerySerializer(data=request.query_params.dict())
+    query.is_valid(raise_exception=True)
+    zone = timezone.get_current_timezone()
+    start, end = (
+        to_microseconds(timezone.make_aware(datetime.combine(day, time.min), zone))
+        for day in (
+            query.validated_data["from"],
+            query.validated_data["to"] + timedelta(days=1),
+        )
+    )
+    return export.streaming_response(
+        request, calendar_rows(queryset), CalendarEncoder(start, end, zone)
+    )
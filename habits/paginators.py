@@ -1,7 +1,199 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict, namedtuple
+from datetime import datetime
 
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+Cursor = namedtuple("Cursor", ["key", "pk", "reverse"])
+
+
+class HabitPaginator(CursorPagination):
+    """Пагинация по ключу (do_at, id) в порядке убывания.
+
+    Вместо OFFSET страница выбирается условием (do_at, id) < (курсор) по
+    составному индексу, поэтому время ответа не зависит от номера страницы.
+    Курсоры next/previous непрозрачны для клиента; общее количество привычек
+    считается только по запросу ?count=true."""
 
-class HabitPaginator(PageNumberPagination):
     page_size = 5
     page_size_query_param = "page_size"
     max_page_size = 10
+    ordering = ("-do_at", "-id")
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.page_queryset(queryset, request)
+        if page_queryset is None:
+            return None
+        if self.count_requested(request):
+            self.count = queryset.count()
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """То же, что paginate_queryset, через асинхронный ORM."""
+
+        page_queryset = self.page_queryset(queryset, request)
+        if page_queryset is None:
+            return None
+        if self.count_requested(request):
+            self.count = await queryset.acount()
+        return self.set_page([item async for item in page_queryset])
+
+    def reverse_ordering(self):
+        return [
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        ]
+
+    def count_requested(self, request):
+        return request.query_params.get(self.count_query_param) in ("true", "1")
+
+    def page_queryset(self, queryset, request):
+        """Запрос страницы (на одну запись больше размера страницы, чтобы узнать,
+        есть ли следующая)."""
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        self.count = None
+
+        if self.cursor is not None and self.cursor.reverse:
+            queryset = queryset.order_by(*self.reverse_ordering())
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.position_filter(queryset, self.cursor))
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if self.cursor is not None and self.cursor.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    @staticmethod
+    def position_filter(queryset, cursor):
+        """Условие (do_at, id) < (курсор) или > для обратного направления.
+
+        Сравнение строк целиком, в отличие от do_at < x OR (do_at = x AND id < y),
+        выполняется одним диапазоном по индексу (do_at, id)."""
+
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        operator = ">" if cursor.reverse else "<"
+        return RawSQL(
+            f"({table}.do_at, {table}.id) {operator} (%s, %s)",
+            (cursor.key, cursor.pk),
+            output_field=BooleanField(),
+        )
+
+    @staticmethod
+    def position(item):
+        """Ключ (do_at, id) объекта модели или строки values()."""
+
+        if isinstance(item, dict):
+            return item["do_at"], item["id"]
+        return item.do_at, item.pk
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            return self.encode_cursor(Cursor(*self.position(self.page[-1]), False))
+        return self.encode_cursor(self.cursor._replace(reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            return self.encode_cursor(Cursor(*self.position(self.page[0]), True))
+        return self.encode_cursor(self.cursor._replace(reverse=True))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            return Cursor(
+                self.decode_key(data["d"]), int(data["i"]), bool(data.get("r"))
+            )
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def encode_key(key):
+        return key.isoformat()
+
+    @staticmethod
+    def decode_key(value):
+        return datetime.fromisoformat(value)
+
+    def encode_cursor(self, cursor):
+        data = {"d": self.encode_key(cursor.key), "i": cursor.pk}
+        if cursor.reverse:
+            data["r"] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(data, separators=(",", ":")).encode("ascii")
+        ).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict(
+            [("next", self.get_next_link()), ("previous", self.get_previous_link())]
+        )
+        if self.count is not None:
+            response["count"] = self.count
+        response["results"] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count"] = {
+            "type": "integer",
+            "example": 123,
+            "description": "Только при ?count=true",
+        }
+        return response_schema
+
+
+class HabitSearchPaginator(HabitPaginator):
+    """Пагинация результатов поиска по ключу (rank, id) в порядке убывания
+    релевантности.
+
+    Релевантность вычисляется для каждой найденной привычки, поэтому условие
+    по курсору не использует индекс, а только отсекает показанные строки."""
+
+    ordering = ("-rank", "-id")
+
+    @staticmethod
+    def position_filter(queryset, cursor):
+        if cursor.reverse:
+            return Q(rank__gt=cursor.key) | Q(rank=cursor.key, id__gt=cursor.pk)
+        return Q(rank__lt=cursor.key) | Q(rank=cursor.key, id__lt=cursor.pk)
+
+    @staticmethod
+    def position(item):
+        return item["rank"], item["id"]
+
+    @staticmethod
+    def encode_key(key):
+        return key
+
+    @staticmethod
+    def decode_key(value):
+        return float(value)
@@ -0,0 +1,212 @@
+"""Планировщик напоминаний с точностью до секунды.
+
+Долгоживущий процесс (команда run_reminder_scheduler) загружает привычки,
+которые нужно выполнить в ближайшее окно, в иерархическое колесо таймеров и
+ставит задачу рассылки ровно в момент напоминания (за 5 минут до do_at), а не
+раз в минуту по beat. Изменения привычек приходят через Redis pub/sub из
+сигналов модели Habit.
+"""
+
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from config import settings
+from config.redis_client import get_redis
+from habits.models import Habit
+
+logger = logging.getLogger(__name__)
+
+CHANGES_CHANNEL = "habits:changed"
+
+REMINDER_LEAD = timedelta(minutes=5)
+
+
+class TimingWheel:
+    """Иерархическое колесо таймеров.
+
+    Уровень 0 состоит из slots[0] ячеек по tick секунд, каждый следующий уровень —
+    из slots[i] ячеек размером с весь предыдущий уровень. Добавление и
+    срабатывание таймера стоят O(1); когда время доходит до ячейки верхнего
+    уровня, ее элементы переносятся на нижние уровни."""
+
+    def __init__(self, start, tick=1.0, slots=(60, 60, 24)):
+        self.tick = tick
+        self.slots = slots
+        self.spans = [math.prod(slots[:level]) for level in range(len(slots))]
+        self.levels = [[[] for _ in range(size)] for size in slots]
+        self.current_tick = math.floor(start / tick)
+        self.horizon = self.spans[-1] * slots[-1]
+        self.overdue = []
+
+    def add(self, fire_at, item):
+        """Добавляет элемент, который должен сработать в момент fire_at (секунды Unix).
+
+        Возвращает False, если момент дальше горизонта колеса."""
+
+        return self._insert(math.ceil(fire_at / self.tick), item)
+
+    def _insert(self, fire_tick, item):
+        delta = fire_tick - self.current_tick
+        if delta <= 0:
+            self.overdue.append(item)
+            return True
+        if delta >= self.horizon:
+            return False
+        for level, (span, size) in enumerate(zip(self.spans, self.slots)):
+            if delta < span * size:
+                self.levels[level][(fire_tick // span) % size].append((fire_tick, item))
+                return True
+
+    def advance(self, now):
+        """Сдвигает колесо до момента now и возвращает сработавшие элементы
+        (в том числе добавленные уже просроченными)."""
+
+        fired = []
+        target_tick = math.floor(now / self.tick)
+        while self.current_tick < target_tick:
+            self.current_tick += 1
+            # сначала элементы верхних уровней переносятся ближе к нулевому
+            for level in range(len(self.slots) - 1, 0, -1):
+                span = self.spans[level]
+                if self.current_tick % span == 0:
+                    slot = (self.current_tick // span) % self.slots[level]
+                    bucket, self.levels[level][slot] = self.levels[level][slot], []
+                    for fire_tick, item in bucket:
+                        self._insert(fire_tick, item)
+            slot = self.current_tick % self.slots[0]
+            fired += [item for fire_tick, item in self.levels[0][slot]]
+            self.levels[0][slot] = []
+        fired += self.overdue
+        self.overdue = []
+        return fired
+
+
+class ReminderScheduler:
+    """Загружает привычки в колесо таймеров и ставит рассылку в момент напоминания.
+
+    Колесо содержит пары (id, do_at); актуальное время выполнения каждой привычки
+    хранится в scheduled, поэтому устаревшие записи после изменения привычки
+    просто пропускаются при срабатывании."""
+
+    def __init__(self, clock=time.time, window=None, refresh=None, dispatch=None):
+        self.clock = clock
+        self.window = window or settings.HABIT_SCHEDULER_WINDOW
+        self.refresh_interval = refresh or settings.HABIT_SCHEDULER_REFRESH
+        self.dispatch = dispatch or self._dispatch
+        self.wheel = TimingWheel(start=clock())
+        self.scheduled = {}
+        self.loaded_until = None
+        self.refreshed_at = None
+
+    @staticmethod
+    def _dispatch(ids):
+        from habits.tasks import send_habit_reminders
+
+        send_habit_reminders.delay(ids)
+
+    @staticmethod
+    def _as_datetime(timestamp):
+        return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+    def habits(self):
+        return (
+            Habit.objects.filter(is_enjoyable=False, user__isnull=False)
+            .order_by()
+            .values_list("pk", "do_at")
+        )
+
+    def schedule(self, pk, do_at):
+        self.scheduled[pk] = do_at
+        self.wheel.add((do_at - REMINDER_LEAD).timestamp(), (pk, do_at))
+
+    def load(self, start, end):
+        """Загружает привычки, напоминание о которых приходится на (start, end]."""
+
+        for pk, do_at in self.habits().filter(
+            do_at__gt=self._as_datetime(start) + REMINDER_LEAD,
+            do_at__lte=self._as_datetime(end) + REMINDER_LEAD,
+        ):
+            self.schedule(pk, do_at)
+
+    def refresh(self):
+        """Догружает следующий отрезок окна: загружается только новая часть."""
+
+        now = self.clock()
+        if self.loaded_until is None:
+            # при старте захватываются и привычки, напоминание о которых уже пора отправить
+            self.load(now - REMINDER_LEAD.total_seconds(), now + self.window)
+        else:
+            self.load(self.loaded_until, now + self.window)
+        self.loaded_until = now + self.window
+        self.refreshed_at = now
+
+    def handle_changes(self, ids):
+        """Перечитывает измененные привычки и переносит их в колесе."""
+
+        ids = set(ids)
+        rows = dict(self.habits().filter(pk__in=ids))
+        now = self.clock()
+        for pk in ids:
+            do_at = rows.get(pk)
+            fire_at = do_at and (do_at - REMINDER_LEAD).timestamp()
+            if do_at is None or not (now - 1 < fire_at <= self.loaded_until):
+                self.scheduled.pop(pk, None)
+            elif self.scheduled.get(pk) != do_at:
+                self.schedule(pk, do_at)
+
+    def tick(self):
+        """Отправляет на рассылку привычки, время напоминания о которых наступило."""
+
+        now = self.clock()
+        if (
+            self.refreshed_at is None
+            or now - self.refreshed_at >= self.refresh_interval
+        ):
+            self.refresh()
+
+        ids = []
+        for pk, do_at in self.wheel.advance(now):
+            if self.scheduled.get(pk) == do_at:
+                del self.scheduled[pk]
+                ids.append(pk)
+        if ids:
+            self.dispatch(ids)
+        return ids
+
+    def run(self):
+        """Основной цикл: раз в tick секунд сдвигает колесо и читает изменения привычек."""
+
+        pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(CHANGES_CHANNEL)
+        self.refresh()
+        logger.info("Reminder scheduler started, %s habits loaded", len(self.scheduled))
+        while True:
+            changed = []
+            message = pubsub.get_message()
+            while message:
+                changed.append(int(message["data"]))
+                message = pubsub.get_message()
+            if changed:
+                self.handle_changes(changed)
+
+            self.tick()
+            tick = self.wheel.tick
+            time.sleep(tick - self.clock() % tick)
+
+
+def publish_change(pk):
+    """Сообщает планировщику об изменении привычки."""
+
+    get_redis().publish(CHANGES_CHANNEL, pk)
+
+
+def publish_changes(pks):
+    """Сообщает планировщику об изменении пачки привычек одним обращением к Redis."""
+
+    with get_redis().pipeline(transaction=False) as pipeline:
+        for pk in pks:
+            pipeline.publish(CHANGES_CHANNEL, pk)
+        pipeline.execute()
@@ -0,0 +1,87 @@
+"""Поиск публичных привычек по действию и месту (эндпоинт /habits/public/search/).
+
+В Postgres используется полнотекстовый поиск по хранимому столбцу search_vector
+с частичным GIN-индексом habit_public_search_idx: каждое слово запроса ищется с
+учетом морфологии и как префикс («отжим» найдет «отжиматься»), а результаты
+упорядочиваются по ts_rank. Вектор хранится в строке, чтобы поиск не вычислял
+to_tsvector для каждой найденной привычки при ранжировании.
+
+Столбец и индекс есть только в Postgres (миграция 0008) и не входят в модель
+Habit, поэтому столбец указывается в запросе через RawSQL. На других СУБД поиск
+сводится к icontains по каждому слову без ранжирования.
+"""
+
+import re
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from rest_framework.serializers import ValidationError
+
+from habits.models import SEARCH_CONFIG
+
+MIN_QUERY_LENGTH = 2
+MAX_QUERY_LENGTH = 100
+MAX_QUERY_WORDS = 8
+
+WORD_RE = re.compile(r"\w+")
+
+
+def query_words(query):
+    """Слова поискового запроса; выбрасывает ValidationError для пустого или
+    слишком длинного запроса."""
+
+    query = (query or "").strip()
+    if len(query) > MAX_QUERY_LENGTH:
+        raise ValidationError(
+            {"q": [f"Не больше {MAX_QUERY_LENGTH} символов в запросе."]}
+        )
+    words = WORD_RE.findall(query.lower())[:MAX_QUERY_WORDS]
+    if sum(len(word) for word in words) < MIN_QUERY_LENGTH:
+        raise ValidationError(
+            {"q": [f"Укажите запрос не короче {MIN_QUERY_LENGTH} символов."]}
+        )
+    return words
+
+
+def uses_full_text_search(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def search_vector(queryset):
+    """Столбец search_vector привычек queryset (только Postgres)."""
+
+    table = connections[queryset.db].ops.quote_name(queryset.model._meta.db_table)
+    return RawSQL(f"{table}.search_vector", [], output_field=SearchVectorField())
+
+
+def search(queryset, query):
+    """Привычки из queryset, подходящие под запрос, с релевантностью rank."""
+
+    words = query_words(query)
+    if not uses_full_text_search(queryset):
+        condition = Q()
+        for word in words:
+            condition &= Q(action__icontains=word) | Q(place__icontains=word)
+        return queryset.filter(condition).annotate(
+            rank=Value(1.0, output_field=FloatField())
+        )
+
+    # Слова состоят только из букв, цифр и _, поэтому безопасны для to_tsquery
+    search_query = SearchQuery(
+        " & ".join(f"{word}:*" for word in words),
+        search_type="raw",
+        config=SEARCH_CONFIG,
+    )
+    # alias() не добавляет вектор в выбираемые столбцы
+    return (
+        queryset.alias(search_vector=search_vector(queryset))
+        .filter(search_vector=search_query)
+        .annotate(
+            # ts_rank возвращает real; double precision точно переносится в курсор
+            rank=Cast(SearchRank(F("search_vector"), search_query), FloatField())
+        )
+    )
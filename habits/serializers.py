@@ -1,6 +1,7 @@
+from django.utils import timezone
 from rest_framework import serializers
 
-from habits.models import Habit
+from habits.models import Habit, HabitCompletion, ReminderDelivery
 from habits.validators import (EnjoyableHabitValidator, PeriodicityValidator,
                                RelatedHabitOrRewardValidator,
                                RelatedHabitValidator, validate_duration)
@@ -11,7 +12,7 @@ class HabitSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Habit
-        fields = "__all__"
+        exclude = ("updated_at",)
         validators = [
             RelatedHabitOrRewardValidator(field_1="related_habit", field_2="reward"),
             RelatedHabitValidator(field="related_habit"),
@@ -22,3 +23,114 @@ class HabitSerializer(serializers.ModelSerializer):
             ),
             PeriodicityValidator(field="periodicity"),
         ]
+
+
+def datetime_to_representation(value, zone):
+    """То же, что DateTimeField.to_representation при формате ISO 8601."""
+
+    value = value.astimezone(zone).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+class HabitValuesSerializer:
+    """Быстрое представление привычек только для чтения.
+
+    Строки выбираются через .values(), а поля преобразуются подготовленными
+    заранее функциями. Поля, их порядок и формат значений совпадают с
+    HabitSerializer, но без создания объектов модели и полей сериализатора на
+    каждую строку."""
+
+    serializer_class = HabitSerializer
+
+    def __init__(self):
+        model = self.serializer_class.Meta.model
+        self.fields = []
+        self.datetime_fields = []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            self.fields.append((name, model._meta.get_field(field.source).attname))
+            if isinstance(field, serializers.DateTimeField):
+                self.datetime_fields.append(name)
+        self.columns = [column for name, column in self.fields]
+
+    def values(self, queryset, *extra):
+        """Строки queryset с колонками полей и дополнительными extra (например,
+        ключом пагинации)."""
+
+        return queryset.values(*self.columns, *extra)
+
+    def to_representation(self, rows):
+        """Представление строк, выбранных через values()."""
+
+        zone = timezone.get_current_timezone()
+        fields, datetime_fields = self.fields, self.datetime_fields
+        data = []
+        for row in rows:
+            item = {name: row[column] for name, column in fields}
+            for name in datetime_fields:
+                if item[name] is not None:
+                    item[name] = datetime_to_representation(item[name], zone)
+            data.append(item)
+        return data
+
+    def instance_to_representation(self, instance):
+        """Представление одного объекта модели."""
+
+        return self.to_representation([instance.__dict__])[0]
+
+
+class ReminderDeliverySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReminderDelivery
+        fields = ("occurrence", "kind", "created_at")
+
+
+class HabitCompletionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HabitCompletion
+        fields = ("id", "habit", "occurrence", "completed_at")
+        read_only_fields = ("habit", "completed_at")
+        extra_kwargs = {
+            "occurrence": {
+                "required": False,
+                "help_text": "Отмечаемое время выполнения; по умолчанию ближайшее "
+                "по расписанию привычки",
+            }
+        }
+        # Повторная отметка не ошибка: она возвращает существующую
+        validators = []
+
+    def validate_occurrence(self, value):
+        if timezone.localdate(value) > timezone.localdate():
+            raise serializers.ValidationError(
+                "Нельзя отметить выполнение в будущий день."
+            )
+        return value
+
+
+class HabitStatsQuerySerializer(serializers.Serializer):
+    weeks = serializers.IntegerField(
+        min_value=1,
+        max_value=52,
+        default=4,
+        help_text="Количество последних недель, включая текущую",
+    )
+
+
+class WeekStatsSerializer(serializers.Serializer):
+    week = serializers.DateField(help_text="Понедельник недели")
+    completed = serializers.IntegerField(help_text="Дней с выполнением")
+    expected = serializers.IntegerField(help_text="Дней по расписанию")
+    adherence = serializers.FloatField(
+        allow_null=True, help_text="Доля выполненных дней по расписанию"
+    )
+
+
+class HabitStatsSerializer(serializers.Serializer):
+    current_streak = serializers.IntegerField()
+    longest_streak = serializers.IntegerField()
+    last_completed_on = serializers.DateField(allow_null=True)
+    weeks = WeekStatsSerializer(many=True)
@@ -0,0 +1,98 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from config import settings
+from habits import cache, due_index
+from habits.models import Habit, HabitVersion
+from habits.scheduler import publish_change
+
+
+@receiver(post_init, sender=Habit)
+def remember_is_public(sender, instance, **kwargs):
+    """Запоминает признак публичности загруженной привычки.
+
+    Читается из __dict__, чтобы не загружать отложенное поле (.only())."""
+
+    instance._was_public = instance.__dict__.get("is_public")
+
+
+@receiver(post_save, sender=Habit)
+def bump_habit_version(sender, instance, **kwargs):
+    """Увеличивает версию списка привычек пользователя (для ETag) после сохранения."""
+
+    HabitVersion.objects.bump([instance.user_id])
+
+
+@receiver(post_delete, sender=Habit)
+def bump_habit_version_on_delete(sender, instance, origin=None, **kwargs):
+    """Увеличивает версию списка привычек пользователя после удаления привычки.
+
+    При каскадном удалении вместе с пользователем версия не нужна (и удаляется)."""
+
+    if getattr(origin, "model", type(origin)) is Habit:
+        HabitVersion.objects.bump([instance.user_id])
+
+
+@receiver(post_save, sender=Habit)
+def invalidate_public_cache(sender, instance, **kwargs):
+    """Сбрасывает кэш ленты публичных привычек, если изменилась публичная привычка."""
+
+    if cache.is_enabled() and (instance.is_public or instance._was_public is not False):
+        transaction.on_commit(cache.bump_version)
+    instance._was_public = instance.is_public
+
+
+@receiver(post_delete, sender=Habit)
+def invalidate_public_cache_on_delete(sender, instance, **kwargs):
+    """Сбрасывает кэш ленты публичных привычек после удаления публичной привычки."""
+
+    if cache.is_enabled() and instance.is_public:
+        transaction.on_commit(cache.bump_version)
+
+
+@receiver(post_save, sender=Habit)
+def update_due_index(sender, instance, **kwargs):
+    """Обновляет время выполнения привычки в индексе Redis после сохранения."""
+
+    if due_index.is_enabled():
+        row = (instance.pk, instance.user_id, instance.do_at, instance.is_enjoyable)
+        transaction.on_commit(lambda: due_index.add([row]))
+    if settings.HABIT_SCHEDULER_ENABLED:
+        transaction.on_commit(lambda: publish_change(instance.pk))
+
+
+@receiver(post_delete, sender=Habit)
+def remove_from_due_index(sender, instance, **kwargs):
+    """Удаляет привычку из индекса Redis после удаления."""
+
+    if due_index.is_enabled():
+        row = (instance.pk, instance.user_id)
+        transaction.on_commit(lambda: due_index.remove([row]))
+    if settings.HABIT_SCHEDULER_ENABLED:
+        pk = instance.pk
+        transaction.on_commit(lambda: publish_change(pk))
+
+
+def habits_bulk_saved(habits):
+    """Выполняет то же, что обработчики post_save выше, для привычек, сохраненных
+    через bulk_create/bulk_update (они не отправляют сигналы)."""
+
+    HabitVersion.objects.bump(habit.user_id for habit in habits)
+
+    if cache.is_enabled() and any(
+        habit.is_public or habit._was_public is not False for habit in habits
+    ):
+        transaction.on_commit(cache.bump_version)
+    for habit in habits:
+        habit._was_public = habit.is_public
+
+    if due_index.is_enabled():
+        rows = [
+            (habit.pk, habit.user_id, habit.do_at, habit.is_enjoyable)
+            for habit in habits
+        ]
+        transaction.on_commit(lambda: due_index.add(rows))
+    if settings.HABIT_SCHEDULER_ENABLED:
+        ids = [habit.pk for habit in habits]
+        transaction.on_commit(lambda: [publish_change(pk) for pk in ids])
@@ -1,72 +1,448 @@
-import datetime
+import time
+from collections import defaultdict
 from datetime import timedelta
 
-import pytz
-import requests
 from celery import shared_task
+from celery.signals import worker_ready
+from django.db import connection, transaction
+from django.db.models import DateTimeField, ExpressionWrapper, F
+from django.db.models.functions import Mod, Now
 from django.utils import timezone
 
 from config import settings
-from habits.models import Habit
+from habits import cache, due_index, metrics
+from habits.models import (Habit, HabitVersion, ReminderDelivery,
+                           ScheduledMessage)
+from habits.scheduler import publish_changes
+from habits.telegram import get_loop_thread, get_telegram_client
+
+
+def claim_scheduled_messages(current_datetime, batch_size):
+    """Забирает пачку сообщений из очереди на отправку.
+
+    Строки блокируются через SELECT ... FOR UPDATE SKIP LOCKED, а время отправки
+    сдвигается на SCHEDULED_MESSAGE_LEASE секунд: если воркер упадет во время
+    отправки, сообщения вернутся в очередь после истечения этого срока.
+    Возвращает [(id, chat_id, text, запланированное время отправки), ...]."""
+
+    with transaction.atomic():
+        ids = list(
+            ScheduledMessage.objects.filter(
+                sent_at__isnull=True,
+                failed_at__isnull=True,
+                send_at__lte=current_datetime,
+                attempts__lt=settings.SCHEDULED_MESSAGE_MAX_ATTEMPTS,
+            )
+            .select_for_update(skip_locked=True)
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        messages = list(
+            ScheduledMessage.objects.filter(pk__in=ids).values_list(
+                "pk", "chat_id", "text", "send_at"
+            )
+        )
+        ScheduledMessage.objects.filter(pk__in=ids).update(
+            send_at=current_datetime
+            + timedelta(seconds=settings.SCHEDULED_MESSAGE_LEASE),
+            attempts=F("attempts") + 1,
+        )
+    return messages
 
 
 @shared_task
-def send_telegram_message(chat_id, message):
-    """Функция отправки уведомления в телеграм."""
-
-    params = {
-        "chat_id": chat_id,
-        "text": message,
-    }
-    requests.get(
-        f"{settings.TELEGRAM_URL}{settings.TELEGRAM_TOKEN}/sendMessage", params=params
+def deliver_scheduled_messages():
+    """Отправляет в телеграм сообщения из очереди, время отправки которых наступило.
+
+    Сообщения забираются пачками по TELEGRAM_BATCH_SIZE и отправляются
+    одновременно; сообщения, которые телеграм попросил повторить позже,
+    возвращаются в очередь со сдвигом на retry_after секунд, а отклоненные
+    (например, пользователь заблокировал бота) отмечаются failed_at и больше
+    не отправляются. Частота отправки ограничивается общим ограничителем
+    процесса или всех воркеров (get_rate_limiter), а не отдельно в каждом
+    запуске задачи. Корутины отправки выполняются в общем цикле событий
+    процесса (get_loop_thread), поэтому задача может работать одновременно в
+    нескольких потоках воркера, а соединения с телеграмом переиспользуются
+    между запусками (get_telegram_client)."""
+
+    client = get_telegram_client()
+    delivered = 0
+    for _ in range(settings.SCHEDULED_MESSAGE_MAX_BATCHES):
+        current_datetime = timezone.now()
+        messages = claim_scheduled_messages(
+            current_datetime, settings.TELEGRAM_BATCH_SIZE
+        )
+        if not messages:
+            break
+
+        ids_by_message = defaultdict(list)
+        for pk, chat_id, text, send_at in messages:
+            ids_by_message[chat_id, text].append(pk)
+        retries, rejected = get_loop_thread().run(
+            client.send_messages(
+                [(chat_id, text) for pk, chat_id, text, send_at in messages]
+            )
+        )
+
+        retry_ids = defaultdict(list)
+        for chat_id, text, retry_after in retries:
+            retry_ids[retry_after].append(ids_by_message[chat_id, text].pop())
+        for retry_after, ids in retry_ids.items():
+            ScheduledMessage.objects.filter(pk__in=ids).update(
+                send_at=current_datetime + timedelta(seconds=retry_after)
+            )
+        rejected_ids = defaultdict(list)
+        for chat_id, text, error in rejected:
+            rejected_ids[error[:255]].append(ids_by_message[chat_id, text].pop())
+        for error, ids in rejected_ids.items():
+            ScheduledMessage.objects.filter(pk__in=ids).update(
+                failed_at=timezone.now(), error=error
+            )
+
+        sent_ids = [pk for ids in ids_by_message.values() for pk in ids]
+        sent_at = timezone.now()
+        ScheduledMessage.objects.filter(pk__in=sent_ids).update(sent_at=sent_at)
+        delivered += len(sent_ids)
+
+        metrics.MESSAGES_SENT.inc(len(sent_ids))
+        metrics.MESSAGES_FAILED.inc(len(retries))
+        metrics.MESSAGES_REJECTED.inc(len(rejected))
+        sent_ids = set(sent_ids)
+        for pk, chat_id, text, send_at in messages:
+            if pk in sent_ids:
+                metrics.DELIVERY_LAG.observe((sent_at - send_at).total_seconds())
+    return delivered
+
+
+def next_do_at_expression():
+    """Выражение для переноса даты выполнения привычки на следующий период."""
+
+    return ExpressionWrapper(
+        F("do_at") + F("periodicity") * timedelta(days=1),
+        output_field=DateTimeField(),
     )
 
 
+def build_reminder_messages(habit, zone=None):
+    """Формирует тексты напоминаний о привычке: за 5 мин до начала, в момент начала
+    и о приятной привычке или вознаграждении."""
+
+    do_at = timezone.localtime(habit.do_at, zone)
+    name = habit.user.first_name if habit.user.first_name else habit.user.email
+    message_1 = f"{name}, через 5 минут пора {habit.action} {habit.place}! ({do_at.strftime("%d.%m.%Y %H:%M")})"
+    message_2 = f"Время {habit.action}!"
+    if habit.related_habit:
+        message_3 = f"Ты молодец! Настало время сделать что-то приятное. Пора {habit.related_habit.action}!"
+    else:
+        message_3 = (
+            f"Ты молодец! Настало время сделать что-то приятное. Пора {habit.reward}!"
+        )
+    return message_1, message_2, message_3
+
+
+def reminder_lookahead():
+    """Насколько вперед обход по beat забирает привычки.
+
+    Если работает планировщик run_reminder_scheduler, обход забирает только
+    привычки, напоминание о которых опоздало больше чем на HABIT_SCHEDULER_GRACE
+    секунд, чтобы не отправлять их раньше планировщика."""
+
+    if settings.HABIT_SCHEDULER_ENABLED:
+        return timedelta(minutes=5) - timedelta(seconds=settings.HABIT_SCHEDULER_GRACE)
+    return timedelta(minutes=5)
+
+
+def due_habits(current_datetime, lookahead=timedelta(minutes=5)):
+    """Полезные привычки, которые нужно выполнить в ближайшие 5 минут, вместе с
+    пользователями и связанными привычками (одним запросом)."""
+
+    return (
+        Habit.objects.filter(
+            do_at__lte=current_datetime + lookahead,
+            do_at__gt=current_datetime,
+            is_enjoyable=False,
+        )
+        .select_related("user", "related_habit")
+        .only(
+            "do_at",
+            "action",
+            "place",
+            "reward",
+            "duration",
+            "periodicity",
+            "is_public",
+            "user__first_name",
+            "user__email",
+            "user__tg_chat_id",
+            "related_habit__action",
+        )
+    )
+
+
+def claim_due_habits(
+    current_datetime, shard, shards, ids=None, lookahead=timedelta(minutes=5)
+):
+    """Блокирует привычки своего шарда, которые нужно выполнить в ближайшие 5 минут.
+
+    Шард определяется остатком от деления user_id на количество шардов. Строки,
+    уже заблокированные другим шардом или пересекающимся запуском, пропускаются
+    (SELECT ... FOR UPDATE SKIP LOCKED). Если переданы ids (из индекса в Redis),
+    выбираются только эти привычки. Вызывается внутри транзакции."""
+
+    habits = due_habits(current_datetime, lookahead)
+    if ids is not None:
+        habits = habits.filter(pk__in=ids)
+    else:
+        habits = habits.alias(shard=Mod("user_id", shards)).filter(shard=shard)
+    return habits.select_for_update(skip_locked=True, of=("self",))
+
+
+def catch_up_habits_batch(current_datetime, after_id, batch_size):
+    """Переносит пачку просроченных полезных привычек на ближайшее будущее выполнение.
+
+    Один UPDATE на пачку: для каждой привычки пропускается столько целых периодов,
+    сколько прошло с do_at, время выполнения в течение суток сохраняется.
+    Пачки выбираются по возрастанию id начиная с after_id, поэтому каждая строка
+    таблицы просматривается один раз. Возвращает перенесенные привычки
+    [(id, user_id, do_at), ...] и последний просмотренный id."""
+
+    table = Habit._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH batch AS (
+                SELECT id FROM {table}
+                WHERE id > %(after_id)s
+                ORDER BY id
+                LIMIT %(batch_size)s
+            ), updated AS (
+                UPDATE {table} AS habit
+                SET updated_at = %(now)s, do_at = habit.do_at + make_interval(
+                    days => habit.periodicity * (
+                        floor(
+                            extract(epoch FROM %(now)s - habit.do_at)
+                            / (habit.periodicity * 86400)
+                        )::integer + 1
+                    )
+                )
+                FROM batch
+                WHERE habit.id = batch.id
+                    AND habit.do_at <= %(now)s
+                    AND habit.is_enjoyable = false
+                    AND habit.periodicity > 0
+                RETURNING habit.id, habit.user_id, habit.do_at
+            )
+            SELECT last.id, updated.id, updated.user_id, updated.do_at
+            FROM (SELECT max(id) AS id FROM batch) AS last
+            LEFT JOIN updated ON true
+            """,
+            {"now": current_datetime, "after_id": after_id, "batch_size": batch_size},
+        )
+        rows = cursor.fetchall()
+    updated = [(pk, user_id, do_at) for _, pk, user_id, do_at in rows if pk]
+    return updated, rows[0][0]
+
+
+@shared_task
+def catch_up_overdue_habits(batch_size=None):
+    """Переносит все просроченные полезные привычки (например, после простоя beat
+    или воркеров) на ближайшее будущее выполнение с учетом периодичности.
+
+    Возвращает количество перенесенных привычек."""
+
+    batch_size = batch_size or settings.HABIT_CATCH_UP_BATCH_SIZE
+    current_datetime = timezone.now()
+    updated_total = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            updated, last_id = catch_up_habits_batch(
+                current_datetime, last_id, batch_size
+            )
+            HabitVersion.objects.bump(user_id for _, user_id, _ in updated)
+        if last_id is None:
+            break
+        if updated and due_index.is_enabled():
+            due_index.add(
+                [(pk, user_id, do_at, False) for pk, user_id, do_at in updated]
+            )
+        # Планировщик снимает прежние напоминания и ставит новые
+        if updated and settings.HABIT_SCHEDULER_ENABLED:
+            publish_changes([pk for pk, _, _ in updated])
+        updated_total += len(updated)
+    if updated_total and cache.is_enabled():
+        cache.bump_version()
+    return updated_total
+
+
+@worker_ready.connect
+def catch_up_on_worker_ready(sender, **kwargs):
+    """При запуске воркера догоняет привычки, пропущенные за время простоя."""
+
+    catch_up_overdue_habits.delay()
+
+
 @shared_task
 def send_habit_reminder():
     """Отправляет напоминания пользователю в телеграм о необходимости выполнить полезную привычку
-    за 5 мин до ее начала, в момент выполнения, а также напоминание о приятной привычке или вознаграждении."""
+    за 5 мин до ее начала, в момент выполнения, а также напоминание о приятной привычке или вознаграждении.
 
-    # current_datetime = timezone.localtime(timezone.now())
-    zone = pytz.timezone(settings.TIME_ZONE)
-    current_datetime = datetime.datetime.now(zone)
+    Обход привычек разбивается на HABIT_REMINDER_SHARDS шардов по user_id, каждый
+    шард обрабатывается отдельной задачей."""
 
-    habits = Habit.objects.filter(
-        do_at__lte=current_datetime + timedelta(minutes=5),
-        do_at__gt=current_datetime,
-        is_enjoyable=False,
-    )
-    if habits:
-        for habit in habits:
-            message_1 = f"{habit.user.first_name if habit.user.first_name else habit.user.email}, через 5 минут пора {habit.action} {habit.place}! ({timezone.localtime(habit.do_at).strftime("%d.%m.%Y %H:%M")})"
-            message_2 = f"Время {habit.action}!"
-            if habit.user.tg_chat_id:
-                # Отправка напоминания за 5 мин до начала привычки
-                send_telegram_message(habit.user.tg_chat_id, message_1)
-                habit.do_at += timedelta(days=habit.periodicity)
-                habit.save()
-
-                # Отправка напоминания о начале привычки
-                send_telegram_message.apply_async(
-                    args=[habit.user.tg_chat_id, message_2], countdown=60
+    shards = settings.HABIT_REMINDER_SHARDS
+    for shard in range(shards):
+        send_habit_reminder_shard.delay(shard, shards)
+    return shards
+
+
+def schedule_reminders(habits, current_datetime):
+    """Ставит в очередь напоминания по заблокированным привычкам и переносит их дату
+    выполнения на следующий период. Вызывается внутри транзакции.
+
+    Напоминания сначала записываются в журнал ReminderDelivery одним
+    INSERT ... ON CONFLICT DO NOTHING, в очередь ScheduledMessage попадают только
+    впервые записанные, поэтому повтор задачи не приводит к дублям.
+    Возвращает список id обработанных привычек."""
+
+    zone = timezone.get_current_timezone()
+    start_delay = timedelta(seconds=60)
+
+    reminders = []
+    claimed_ids = []
+    index_rows = []
+    public_changed = False
+    for habit in habits:
+        if habit.user and habit.user.tg_chat_id:
+            claimed_ids.append(habit.pk)
+            public_changed |= habit.is_public
+            metrics.SCHEDULE_LAG.observe(
+                (current_datetime - habit.do_at + timedelta(minutes=5)).total_seconds()
+            )
+            index_rows.append(
+                (
+                    habit.pk,
+                    habit.user_id,
+                    habit.do_at + timedelta(days=habit.periodicity),
+                    False,
                 )
+            )
+            chat_id = habit.user.tg_chat_id
+            message_1, message_2, message_3 = build_reminder_messages(habit, zone)
+            reminders += [
+                # Напоминание за 5 мин до начала привычки
+                (
+                    (habit.pk, habit.do_at, ReminderDelivery.BEFORE),
+                    (habit.pk, chat_id, message_1, current_datetime),
+                ),
+                # Напоминание о начале привычки
+                (
+                    (habit.pk, habit.do_at, ReminderDelivery.START),
+                    (habit.pk, chat_id, message_2, current_datetime + start_delay),
+                ),
+                # Напоминание о приятной привычке или о вознаграждении
+                (
+                    (habit.pk, habit.do_at, ReminderDelivery.REWARD),
+                    (
+                        habit.pk,
+                        chat_id,
+                        message_3,
+                        current_datetime + timedelta(seconds=habit.duration + 5 * 60),
+                    ),
+                ),
+            ]
+        else:
+            print("Укажите свой tg_chat_id для рассылки напоминаний")
 
-                # Отправка напоминания о выполнении приятной привычки при ее наличии
-                if habit.related_habit:
-                    enjoyable_habit = habit.related_habit
-                    message = f"Ты молодец! Настало время сделать что-то приятное. Пора {enjoyable_habit.action}!"
-                    send_telegram_message.apply_async(
-                        args=[habit.user.tg_chat_id, message],
-                        countdown=(habit.duration + 5 * 60),
-                    )
+    if not claimed_ids:
+        return claimed_ids
 
-                # Отправка напоминания о вознаграждении при его наличии
-                else:
-                    message = f"Ты молодец! Настало время сделать что-то приятное. Пора {habit.reward}!"
-                    send_telegram_message.apply_async(
-                        args=[habit.user.tg_chat_id, message],
-                        countdown=(habit.duration + 5 * 60),
-                    )
-            else:
-                print("Укажите свой tg_chat_id для рассылки напоминаний")
+    recorded = ReminderDelivery.objects.record([key for key, message in reminders])
+    messages = [message for key, message in reminders if key in recorded]
+    ScheduledMessage.objects.bulk_insert(messages)
+    metrics.MESSAGES_QUEUED.inc(len(messages))
+
+    # Перенос даты выполнения на следующий период для всей пачки одним запросом
+    Habit.objects.filter(pk__in=claimed_ids).update(
+        do_at=next_do_at_expression(), updated_at=Now()
+    )
+    HabitVersion.objects.bump(user_id for _, user_id, _, _ in index_rows)
+    if due_index.is_enabled():
+        transaction.on_commit(lambda: due_index.add(index_rows))
+    # Дата выполнения публичных привычек видна в ленте
+    if public_changed and cache.is_enabled():
+        transaction.on_commit(cache.bump_version)
+    return claimed_ids
+
+
+def observe_sweep(source, started_at, scanned, claimed):
+    """Записывает метрики одного обхода привычек."""
+
+    metrics.SWEEP_DURATION.labels(source).observe(time.perf_counter() - started_at)
+    metrics.HABITS_SCANNED.labels(source).inc(scanned)
+    metrics.HABITS_CLAIMED.labels(source).inc(claimed)
+
+
+@shared_task
+def send_habit_reminder_shard(shard, shards):
+    """Отправляет напоминания по привычкам одного шарда.
+
+    Привычки выбираются и блокируются одним запросом, а дата выполнения всех
+    отправленных привычек переносится на следующий период одним UPDATE в той же
+    транзакции, поэтому одно напоминание не отправляется дважды. Сами сообщения
+    добавляются одним INSERT в очередь ScheduledMessage и отправляются задачей
+    deliver_scheduled_messages."""
+
+    started_at = time.perf_counter()
+    current_datetime = timezone.now()
+    lookahead = reminder_lookahead()
+    due_ids = None
+    if due_index.is_enabled():
+        due_ids = due_index.get_due(
+            shard, current_datetime, current_datetime + lookahead
+        )
+        if not due_ids:
+            return 0
+
+    with transaction.atomic():
+        habits = list(
+            claim_due_habits(
+                current_datetime, shard, shards, ids=due_ids, lookahead=lookahead
+            )
+        )
+        claimed_ids = schedule_reminders(habits, current_datetime)
+    observe_sweep("sweep", started_at, len(habits), len(claimed_ids))
+
+    # Обработанные привычки переносятся в индексе после фиксации транзакции
+    # (schedule_reminders), а записи остальных (заблокированы другим обходом,
+    # нет chat-id или запись устарела) обновляются из БД
+    if due_ids:
+        unclaimed_ids = set(due_ids) - set(claimed_ids)
+        if unclaimed_ids:
+            due_index.sync(unclaimed_ids)
+
+    # Напоминания за 5 мин до начала отправляются сразу, не дожидаясь beat
+    if claimed_ids:
+        deliver_scheduled_messages.delay()
+
+    return len(claimed_ids)
+
+
+@shared_task
+def send_habit_reminders(ids):
+    """Отправляет напоминания по указанным привычкам.
+
+    Ставится планировщиком run_reminder_scheduler ровно в момент напоминания
+    (за 5 мин до do_at). Привычки, уже обработанные обходом по beat или
+    перенесенные пользователем, не попадают в выборку."""
+
+    started_at = time.perf_counter()
+    current_datetime = timezone.now()
+    with transaction.atomic():
+        habits = list(claim_due_habits(current_datetime, 0, 1, ids=ids))
+        claimed_ids = schedule_reminders(habits, current_datetime)
+    observe_sweep("scheduler", started_at, len(habits), len(claimed_ids))
+    if claimed_ids:
+        deliver_scheduled_messages.delay()
+    return len(claimed_ids)
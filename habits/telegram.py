@@ -0,0 +1,353 @@
+import asyncio
+import os
+import threading
+import time
+
+import aiohttp
+from celery.signals import worker_process_shutdown, worker_shutdown
+
+from config import settings
+from config.redis_client import get_async_redis, get_redis
+from habits import metrics
+
+
+class TelegramRejected(Exception):
+    """Телеграм отклонил сообщение (ответ 4xx, кроме 429), например пользователь
+    заблокировал бота (403) или чат не найден (400). Повтор не поможет."""
+
+    def __init__(self, status, description):
+        super().__init__(f"{status}: {description}")
+        self.status = status
+        self.description = description
+
+
+def is_rejected(status):
+    """Ответ, после которого сообщение не отправляется повторно."""
+
+    return 400 <= status < 500 and status != 429
+
+
+class TokenBucket:
+    """Ограничитель частоты по алгоритму token bucket.
+
+    Не блокирует поток сам: reserve() забирает токен и возвращает, сколько секунд
+    нужно подождать перед отправкой, чтобы не превысить заданную частоту."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated_at = clock()
+
+    def reserve(self):
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Общий лимит на бота и лимит на каждый чат.
+
+    Лимиты действуют в пределах одного процесса воркера; общий для всех
+    воркеров лимит — RedisRateLimiter."""
+
+    def __init__(self, global_rate, chat_rate, clock=time.monotonic):
+        self.global_bucket = TokenBucket(global_rate, clock=clock)
+        self.chat_rate = chat_rate
+        self.chat_buckets = {}
+        self.clock = clock
+        self.lock = threading.Lock()
+
+    def reserve(self, chat_id):
+        """Возвращает время ожидания в секундах до отправки сообщения в чат."""
+
+        with self.lock:
+            chat_bucket = self.chat_buckets.get(chat_id)
+            if chat_bucket is None:
+                if len(self.chat_buckets) > 10_000:
+                    self._forget_idle_chats()
+                chat_bucket = self.chat_buckets[chat_id] = TokenBucket(
+                    self.chat_rate, capacity=1, clock=self.clock
+                )
+            return max(self.global_bucket.reserve(), chat_bucket.reserve())
+
+    async def areserve(self, chat_id):
+        return self.reserve(chat_id)
+
+    def _forget_idle_chats(self):
+        now = self.clock()
+        self.chat_buckets = {
+            chat_id: bucket
+            for chat_id, bucket in self.chat_buckets.items()
+            if now - bucket.updated_at < 1 / bucket.rate
+        }
+
+
+# Алгоритм GCRA, равносильный TokenBucket: для каждого ключа хранится
+# теоретическое время следующего сообщения (мс). Ожидание — насколько оно
+# позже, чем допускает запас capacity сообщений подряд. Время берется из Redis,
+# чтобы часы всех воркеров совпадали.
+RESERVE_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + tonumber(time[2]) / 1000
+local delay = 0
+for i, key in ipairs(KEYS) do
+    local interval = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    local tat = math.max(tonumber(redis.call("GET", key)) or now, now) + interval
+    redis.call("SET", key, string.format("%.3f", tat), "PX", math.ceil(tat - now) + 1)
+    delay = math.max(delay, tat - now - capacity * interval)
+end
+return string.format("%.3f", delay)
+"""
+
+
+class RedisRateLimiter:
+    """Те же лимиты, что у RateLimiter, общие для всех процессов и воркеров.
+
+    Состояние лимитов хранится в Redis (ключи telegram:rate:*) и меняется
+    атомарно одним Lua-скриптом на сообщение."""
+
+    KEY_PREFIX = "telegram:rate"
+
+    def __init__(self, global_rate, chat_rate):
+        self.args = [
+            1000 / global_rate,
+            max(global_rate, 1),
+            1000 / chat_rate,
+            1,
+        ]
+
+    def keys(self, chat_id):
+        return [f"{self.KEY_PREFIX}:bot", f"{self.KEY_PREFIX}:chat:{chat_id}"]
+
+    def reserve(self, chat_id):
+        """Возвращает время ожидания в секундах до отправки сообщения в чат."""
+
+        script = get_redis().register_script(RESERVE_SCRIPT)
+        return float(script(keys=self.keys(chat_id), args=self.args)) / 1000
+
+    async def areserve(self, chat_id):
+        script = get_async_redis().register_script(RESERVE_SCRIPT)
+        return float(await script(keys=self.keys(chat_id), args=self.args)) / 1000
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Ограничитель частоты процесса: общий для всех клиентов и запусков задач,
+    а при TELEGRAM_SHARED_RATE_LIMIT_ENABLED — и для всех воркеров (в Redis)."""
+
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                limiter_class = (
+                    RedisRateLimiter
+                    if settings.TELEGRAM_SHARED_RATE_LIMIT_ENABLED
+                    else RateLimiter
+                )
+                _limiter = limiter_class(
+                    settings.TELEGRAM_GLOBAL_RATE, settings.TELEGRAM_CHAT_RATE
+                )
+    return _limiter
+
+
+class EventLoopThread:
+    """Цикл событий asyncio, работающий в отдельном потоке.
+
+    Задачи celery отправляют в него корутины и ждут результат, поэтому
+    одновременные запуски задач в потоках воркера не создают своих циклов
+    (asyncio.run падает, если в потоке уже работает цикл)."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="telegram-loop", daemon=True
+        )
+        self.thread.start()
+
+    def run(self, coroutine):
+        """Выполняет корутину в цикле потока и возвращает ее результат."""
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+_loop_thread = None
+_loop_thread_lock = threading.Lock()
+
+
+def get_loop_thread():
+    """Цикл событий процесса для отправки сообщений (создается при первом вызове)."""
+
+    global _loop_thread
+    if _loop_thread is None:
+        with _loop_thread_lock:
+            if _loop_thread is None:
+                _loop_thread = EventLoopThread()
+    return _loop_thread
+
+
+def _reset_loop_thread():
+    # Поток цикла не копируется в дочерний процесс при fork, а сессия клиента
+    # привязана к этому циклу
+    global _loop_thread, _client
+    _loop_thread = None
+    _client = None
+
+
+os.register_at_fork(after_in_child=_reset_loop_thread)
+
+
+class AsyncTelegramClient:
+    """Асинхронный клиент для одновременной отправки пачки сообщений.
+
+    Количество одновременных запросов ограничено concurrency, лимиты телеграма
+    соблюдаются ограничителем процесса (get_rate_limiter)."""
+
+    def __init__(
+        self,
+        url=None,
+        token=None,
+        timeout=None,
+        limiter=None,
+        concurrency=None,
+    ):
+        url = url or settings.TELEGRAM_URL
+        token = token or settings.TELEGRAM_TOKEN
+        self.send_message_url = f"{url}{token}/sendMessage"
+        self.timeout = timeout or settings.TELEGRAM_TIMEOUT
+        self.concurrency = concurrency or settings.TELEGRAM_CONCURRENCY
+        self.limiter = limiter or get_rate_limiter()
+        self._session = None
+
+    def session(self):
+        """Сессия с пулом соединений: создается при первой отправке и
+        используется всеми следующими пачками, пока клиент не закрыт (aclose).
+
+        Сессия привязана к циклу событий, в котором создана, поэтому клиент
+        используется в одном цикле (в воркере — get_loop_thread)."""
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def aclose(self):
+        """Закрывает сессию и соединения клиента."""
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def send_messages(self, messages):
+        """Отправляет пачку сообщений (chat_id, text), не более concurrency запросов
+        одновременно.
+
+        Возвращает (сообщения, которые нужно повторить, с временем ожидания
+        [(chat_id, text, retry_after), ...], отклоненные сообщения с причиной
+        [(chat_id, text, error), ...]). Повторяются ответы 429, ответы 5xx и
+        сетевые ошибки; другие ответы 4xx (например, бот заблокирован)
+        отклоняют сообщение."""
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        session = self.session()
+
+        async def send(chat_id, text):
+            async with semaphore:
+                delay = await self.limiter.areserve(chat_id)
+                if delay:
+                    await asyncio.sleep(delay)
+                try:
+                    with metrics.REQUEST_DURATION.time():
+                        response = await session.post(
+                            self.send_message_url,
+                            json={"chat_id": chat_id, "text": text},
+                        )
+                    async with response:
+                        if response.status == 429:
+                            retry_after = await self._retry_after(response)
+                            return (chat_id, text, retry_after), None
+                        if is_rejected(response.status):
+                            error = TelegramRejected(
+                                response.status, await self._description(response)
+                            )
+                            return None, (chat_id, text, str(error))
+                        response.raise_for_status()
+                        # Непрочитанный ответ закрывает соединение вместо
+                        # возврата в пул сессии
+                        await response.read()
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    return (chat_id, text, settings.TELEGRAM_RETRY_DELAY), None
+                return None, None
+
+        results = await asyncio.gather(
+            *(send(chat_id, text) for chat_id, text in messages)
+        )
+        return (
+            [retry for retry, _ in results if retry],
+            [rejected for _, rejected in results if rejected],
+        )
+
+    @staticmethod
+    async def _retry_after(response):
+        try:
+            return int((await response.json())["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError, aiohttp.ContentTypeError):
+            return settings.TELEGRAM_RETRY_DELAY
+
+    @staticmethod
+    async def _description(response):
+        try:
+            return str((await response.json())["description"])
+        except (ValueError, KeyError, TypeError, aiohttp.ContentTypeError):
+            return response.reason
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_telegram_client():
+    """Клиент процесса: одна сессия и пул соединений на все запуски задач.
+
+    Клиент работает в цикле событий процесса (get_loop_thread)."""
+
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AsyncTelegramClient()
+    return _client
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def close_telegram_client(**kwargs):
+    """При остановке воркера закрывает сессию клиента и цикл событий процесса."""
+
+    global _client, _loop_thread
+    with _loop_thread_lock:
+        if _loop_thread is None:
+            return
+        if _client is not None:
+            _loop_thread.run(_client.aclose())
+            _client = None
+        _loop_thread.stop()
+        _loop_thread = None
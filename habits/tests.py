@@ -1,9 +1,52 @@
-from django.urls import reverse
+import asyncio
+import csv
+import gzip
+import json
+import math
+import os
+import tempfile
+import threading
+import warnings
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+
+import fakeredis
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models import Max
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
 from rest_framework.serializers import ValidationError
-from rest_framework.test import APITestCase
-
-from habits.models import Habit
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config import settings
+from config.fixtures import iter_json_array
+from config.renderers import ORJSONRenderer
+from habits import cache, completions, due_index, export, occurrences, search
+from habits.filters import HabitFilterBackend
+from habits.models import (Habit, HabitCompletion, HabitDailyStat, HabitStreak,
+                           HabitVersion, ReminderDelivery, ScheduledMessage)
+from habits.scheduler import CHANGES_CHANNEL, ReminderScheduler, TimingWheel
+from habits.serializers import HabitSerializer, datetime_to_representation
+from habits.tasks import (catch_up_overdue_habits, claim_scheduled_messages,
+                          deliver_scheduled_messages, due_habits,
+                          send_habit_reminder, send_habit_reminder_shard,
+                          send_habit_reminders)
+from habits.telegram import (AsyncTelegramClient, EventLoopThread, RateLimiter,
+                             RedisRateLimiter, close_telegram_client,
+                             get_loop_thread, get_telegram_client)
 from users.models import User
 
 
@@ -134,7 +177,6 @@ class HabitTestCase(APITestCase):
         data = response.json()
 
         result = {
-            "count": 3,
             "next": None,
             "previous": None,
             "results": [
@@ -246,7 +288,7 @@ class HabitTestCase(APITestCase):
         url = reverse("habits:habit-list")
         response = self.client.get(url)
         data = response.json()
-        result = {"count": 0, "next": None, "previous": None, "results": []}
+        result = {"next": None, "previous": None, "results": []}
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(data, result)
@@ -319,7 +361,6 @@ class HabitTestCase(APITestCase):
         data = response.json()
 
         result = {
-            "count": 3,
             "next": None,
             "previous": None,
             "results": [
@@ -428,6 +469,36 @@ class HabitTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_habit_reminders_creator_user_access(self):
+        """Тестирует получение отправленных напоминаний по привычке ее создателем."""
+
+        ReminderDelivery.objects.record(
+            [
+                (
+                    self.useful_habit_with_reward.pk,
+                    timezone.now(),
+                    ReminderDelivery.BEFORE,
+                ),
+                (
+                    self.useful_habit_with_reward.pk,
+                    timezone.now() - timedelta(days=30),
+                    ReminderDelivery.BEFORE,
+                ),
+            ]
+        )
+        self.client.force_authenticate(user=self.creator_user)
+        url = reverse(
+            "habits:habit-reminders", args=(self.useful_habit_with_reward.pk,)
+        )
+        response = self.client.get(url, {"days": 7})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["kind"] for item in response.json()], ["before"])
+
+        self.client.force_authenticate(user=self.regular_user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     # Тесты для проверки валидаторов
     def test_habit_create_RelatedHabitOrRewardValidator_error(self):
         """Тестирует ошибку при создании привычки с одновременным указанием связанной привычки и вознаграждения."""
@@ -581,21 +652,25 @@ class PublicHabitTestCase(APITestCase):
         url = reverse("habits:public-list")
         response = self.client.get(url)
         data = response.json()
-        result = [
-            {
-                "id": self.public_habit.pk,
-                "duration": self.public_habit.duration,
-                "place": self.public_habit.place,
-                "do_at": self.public_habit.do_at,
-                "action": self.public_habit.action,
-                "is_enjoyable": self.public_habit.is_enjoyable,
-                "periodicity": self.public_habit.periodicity,
-                "reward": self.public_habit.reward,
-                "is_public": self.public_habit.is_public,
-                "user": self.public_habit.user.pk,
-                "related_habit": self.public_habit.related_habit,
-            }
-        ]
+        result = {
+            "next": None,
+            "previous": None,
+            "results": [
+                {
+                    "id": self.public_habit.pk,
+                    "duration": self.public_habit.duration,
+                    "place": self.public_habit.place,
+                    "do_at": self.public_habit.do_at,
+                    "action": self.public_habit.action,
+                    "is_enjoyable": self.public_habit.is_enjoyable,
+                    "periodicity": self.public_habit.periodicity,
+                    "reward": self.public_habit.reward,
+                    "is_public": self.public_habit.is_public,
+                    "user": self.public_habit.user.pk,
+                    "related_habit": self.public_habit.related_habit,
+                }
+            ],
+        }
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(data, result)
@@ -618,3 +693,2542 @@ class PublicHabitTestCase(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@mock.patch("habits.tasks.deliver_scheduled_messages")
+class HabitReminderTestCase(TestCase):
+    """Класс для тестирования рассылки напоминаний о привычках."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(
+            email="user@email.com", first_name="Маша", tg_chat_id="123"
+        )
+        self.user_without_chat = User.objects.create(email="no_chat@email.com")
+        self.now = timezone.now()
+
+        self.enjoyable_habit = Habit.objects.create(
+            user=self.user,
+            place="дома",
+            do_at=self.now + timedelta(minutes=3),
+            action="лежать",
+            is_enjoyable=True,
+            duration=60,
+        )
+        self.habits = [
+            Habit.objects.create(
+                user=self.user,
+                place="дома",
+                do_at=self.now + timedelta(minutes=2),
+                action=f"отжиматься {i}",
+                related_habit=self.enjoyable_habit if i % 2 else None,
+                reward=None if i % 2 else "съесть конфетку",
+                periodicity=2,
+                duration=60,
+            )
+            for i in range(5)
+        ]
+        self.habit_without_chat = Habit.objects.create(
+            user=self.user_without_chat,
+            place="дома",
+            do_at=self.now + timedelta(minutes=2),
+            action="бегать",
+            reward="съесть конфетку",
+            duration=60,
+        )
+
+    def test_send_habit_reminder_moves_do_at(self, deliver_scheduled_messages):
+        """Тестирует перенос даты выполнения отправленных привычек на следующий период."""
+
+        self.assertEqual(send_habit_reminder_shard(0, 1), 5)
+
+        for habit in self.habits:
+            old_do_at = habit.do_at
+            habit.refresh_from_db()
+            self.assertEqual(habit.do_at, old_do_at + timedelta(days=2))
+
+        old_do_at = self.habit_without_chat.do_at
+        self.habit_without_chat.refresh_from_db()
+        self.assertEqual(self.habit_without_chat.do_at, old_do_at)
+
+        # сообщения сразу, через минуту и после выполнения привычки
+        self.assertEqual(ScheduledMessage.objects.count(), 15)
+        self.assertEqual(
+            ScheduledMessage.objects.filter(
+                send_at__lte=timezone.now(), sent_at__isnull=True
+            ).count(),
+            5,
+        )
+        deliver_scheduled_messages.delay.assert_called_once_with()
+        messages = ScheduledMessage.objects.values_list("text", flat=True)
+        self.assertIn(
+            "Ты молодец! Настало время сделать что-то приятное. Пора лежать!", messages
+        )
+        self.assertIn(
+            "Ты молодец! Настало время сделать что-то приятное. Пора съесть конфетку!",
+            messages,
+        )
+
+    def test_send_habit_reminder_query_count(self, deliver_scheduled_messages):
+        """Тестирует, что число запросов не зависит от количества привычек."""
+
+        # SAVEPOINT, SELECT с JOIN пользователей и связанных привычек, INSERT в журнал,
+        # INSERT сообщений в очередь, UPDATE, RELEASE
+        with self.assertNumQueries(7):
+            send_habit_reminder_shard(0, 1)
+
+    def test_send_habit_reminder_deduplicates_retries(self, deliver_scheduled_messages):
+        """Тестирует, что повторный обход того же выполнения привычки не дублирует напоминания."""
+
+        send_habit_reminder_shard(0, 1)
+        # повтор: дата выполнения возвращается, как если бы обход запустился снова
+        for habit in self.habits:
+            Habit.objects.filter(pk=habit.pk).update(do_at=habit.do_at)
+        send_habit_reminder_shard(0, 1)
+
+        self.assertEqual(ScheduledMessage.objects.count(), 15)
+        self.assertEqual(ReminderDelivery.objects.count(), 15)
+        self.assertEqual(
+            list(
+                ReminderDelivery.objects.for_habit(self.habits[0], days=1).values_list(
+                    "occurrence", "kind"
+                )
+            ),
+            [(self.habits[0].do_at, kind) for kind in ("before", "start", "reward")],
+        )
+
+    @mock.patch("habits.tasks.send_habit_reminder_shard")
+    def test_send_habit_reminder_dispatches_shards(
+        self, send_habit_reminder_shard_mock, deliver_scheduled_messages
+    ):
+        """Тестирует разбиение рассылки на задачи по шардам."""
+
+        with mock.patch("habits.tasks.settings.HABIT_REMINDER_SHARDS", 3):
+            send_habit_reminder()
+
+        self.assertEqual(
+            [call.args for call in send_habit_reminder_shard_mock.delay.call_args_list],
+            [(0, 3), (1, 3), (2, 3)],
+        )
+
+    def test_send_habit_reminder_shards_split_users(self, deliver_scheduled_messages):
+        """Тестирует, что каждая привычка отправляется ровно одним шардом."""
+
+        # пользователь с нечетной разницей id попадает в другой шард
+        other_user = User.objects.create(
+            pk=self.user.pk + 1001, email="other@email.com", tg_chat_id="456"
+        )
+        Habit.objects.create(
+            user=other_user,
+            place="дома",
+            do_at=self.now + timedelta(minutes=2),
+            action="бегать",
+            reward="съесть конфетку",
+            duration=60,
+        )
+
+        sent = [send_habit_reminder_shard(shard, 2) for shard in range(2)]
+
+        self.assertEqual(sent[self.user.pk % 2], 5)
+        self.assertEqual(sent[other_user.pk % 2], 1)
+        self.assertEqual(
+            [send_habit_reminder_shard(shard, 2) for shard in range(2)], [0, 0]
+        )
+
+
+@mock.patch("habits.tasks.deliver_scheduled_messages")
+class HabitReminderLockTestCase(TransactionTestCase):
+    """Класс для тестирования блокировки привычек при рассылке напоминаний."""
+
+    def test_send_habit_reminder_skips_locked_habits(self, deliver_scheduled_messages):
+        """Тестирует, что привычки, заблокированные другим обходом, пропускаются."""
+
+        user = User.objects.create(email="user@email.com", tg_chat_id="123")
+        locked_habit, free_habit = [
+            Habit.objects.create(
+                user=user,
+                place="дома",
+                do_at=timezone.now() + timedelta(minutes=2),
+                action="отжиматься",
+                reward="съесть конфетку",
+                duration=60,
+            )
+            for _ in range(2)
+        ]
+        locked = threading.Event()
+        release = threading.Event()
+
+        def lock_habit():
+            with transaction.atomic():
+                Habit.objects.select_for_update().get(pk=locked_habit.pk)
+                locked.set()
+                release.wait(timeout=10)
+            connection.close()
+
+        thread = threading.Thread(target=lock_habit)
+        thread.start()
+        locked.wait(timeout=10)
+        try:
+            self.assertEqual(send_habit_reminder_shard(0, 1), 1)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(
+            Habit.objects.get(pk=locked_habit.pk).do_at, locked_habit.do_at
+        )
+        self.assertNotEqual(Habit.objects.get(pk=free_habit.pk).do_at, free_habit.do_at)
+
+
+class TelegramStubHandler(BaseHTTPRequestHandler):
+    """Заглушка API телеграма: отвечает 429 для чата "flood", 403 для чата
+    "blocked", 502 для чата "down", иначе 200."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.received.append((self.path, body))
+        self.server.connections.add(self.client_address)
+        if body["chat_id"] == "flood":
+            status_code = 429
+            payload = {"ok": False, "parameters": {"retry_after": 7}}
+        elif body["chat_id"] == "blocked":
+            status_code = 403
+            payload = {
+                "ok": False,
+                "error_code": 403,
+                "description": "Forbidden: bot was blocked by the user",
+            }
+        elif body["chat_id"] == "down":
+            status_code = 502
+            payload = {"ok": False}
+        else:
+            status_code = 200
+            payload = {"ok": True, "result": {}}
+        content = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RateLimiterTestCase(SimpleTestCase):
+    """Класс для тестирования ограничителя частоты отправки сообщений."""
+
+    def setUp(self):
+        self.now = 0.0
+        self.limiter = RateLimiter(global_rate=2, chat_rate=1, clock=lambda: self.now)
+
+    def test_chat_rate(self):
+        """Тестирует ограничение частоты сообщений в один чат."""
+
+        self.assertEqual(self.limiter.reserve("1"), 0)
+        self.assertEqual(self.limiter.reserve("1"), 1)
+
+        self.now = 2.0
+        self.assertEqual(self.limiter.reserve("1"), 0)
+
+    def test_global_rate(self):
+        """Тестирует общее ограничение частоты сообщений."""
+
+        self.assertEqual(self.limiter.reserve("1"), 0)
+        self.assertEqual(self.limiter.reserve("2"), 0)
+        self.assertEqual(self.limiter.reserve("3"), 0.5)
+
+    def test_process_limiter(self):
+        """Тестирует, что клиенты процесса используют один ограничитель."""
+
+        with mock.patch("habits.telegram._limiter", None):
+            self.assertIs(AsyncTelegramClient().limiter, AsyncTelegramClient().limiter)
+            self.assertIsInstance(AsyncTelegramClient().limiter, RateLimiter)
+
+
+class RedisRateLimiterTestCase(SimpleTestCase):
+    """Класс для тестирования ограничителя частоты, общего для всех воркеров."""
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        for patcher in (
+            mock.patch(
+                "habits.telegram.get_redis",
+                return_value=fakeredis.FakeRedis(server=server),
+            ),
+            mock.patch(
+                "habits.telegram.get_async_redis",
+                side_effect=lambda: fakeredis.FakeAsyncRedis(server=server),
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_limits_are_shared(self):
+        """Тестирует, что лимиты общие для ограничителей разных процессов."""
+
+        worker_1 = RedisRateLimiter(global_rate=2, chat_rate=1)
+        worker_2 = RedisRateLimiter(global_rate=2, chat_rate=1)
+
+        self.assertEqual(worker_1.reserve("1"), 0)
+        # Лимит чата: следующее сообщение в тот же чат — через секунду
+        self.assertAlmostEqual(worker_2.reserve("1"), 1, delta=0.05)
+        # Общий лимит: 2 сообщения подряд уже отправлены, третье — через 0.5 с
+        self.assertAlmostEqual(worker_1.reserve("2"), 0.5, delta=0.05)
+        self.assertAlmostEqual(asyncio.run(worker_2.areserve("3")), 1, delta=0.05)
+
+    def test_shared_limiter_setting(self):
+        """Тестирует выбор ограничителя в Redis настройкой."""
+
+        with (
+            mock.patch("habits.telegram._limiter", None),
+            mock.patch(
+                "habits.telegram.settings.TELEGRAM_SHARED_RATE_LIMIT_ENABLED", True
+            ),
+        ):
+            self.assertIsInstance(AsyncTelegramClient().limiter, RedisRateLimiter)
+
+
+class AsyncTelegramClientTestCase(SimpleTestCase):
+    """Класс для тестирования пакетной асинхронной отправки сообщений."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), TelegramStubHandler)
+        cls.server.received = []
+        cls.server.connections = set()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.received.clear()
+        self.server.connections.clear()
+        self.client = AsyncTelegramClient(
+            url=f"http://127.0.0.1:{self.server.server_port}/bot",
+            token="TOKEN",
+            limiter=RateLimiter(global_rate=1000, chat_rate=1000),
+            concurrency=4,
+        )
+        self.loop_thread = EventLoopThread()
+        self.addCleanup(self.loop_thread.stop)
+        self.addCleanup(self.loop_thread.run, self.client.aclose())
+
+    def test_send_messages(self):
+        """Тестирует одновременную отправку пачки сообщений: 429 и 5xx — повтор,
+        403 (бот заблокирован) — отказ без повтора."""
+
+        retries, rejected = self.loop_thread.run(
+            self.client.send_messages(
+                [(str(i), "Время отжиматься!") for i in range(20)]
+                + [("flood", "Пора!"), ("blocked", "Пора!"), ("down", "Пора!")]
+            )
+        )
+
+        self.assertEqual(len(self.server.received), 23)
+        self.assertIn(
+            ("/botTOKEN/sendMessage", {"chat_id": "0", "text": "Время отжиматься!"}),
+            self.server.received,
+        )
+        self.assertEqual(retries, [("flood", "Пора!", 7), ("down", "Пора!", 5)])
+        self.assertEqual(
+            rejected,
+            [("blocked", "Пора!", "403: Forbidden: bot was blocked by the user")],
+        )
+
+    def test_session_reused(self):
+        """Тестирует, что следующие пачки отправляются через ту же сессию и
+        открытые ей соединения."""
+
+        messages = [(str(i), "Пора!") for i in range(8)]
+        self.loop_thread.run(self.client.send_messages(messages))
+        session = self.client._session
+        self.loop_thread.run(self.client.send_messages(messages))
+
+        self.assertIs(self.client._session, session)
+        self.assertEqual(len(self.server.received), 16)
+        self.assertLessEqual(len(self.server.connections), self.client.concurrency)
+
+    def test_close_on_worker_shutdown(self):
+        """Тестирует закрытие сессии клиента процесса при остановке воркера."""
+
+        async def open_session():
+            return get_telegram_client().session()
+
+        with (
+            mock.patch("habits.telegram._loop_thread", None),
+            mock.patch("habits.telegram._client", None),
+        ):
+            self.assertIs(get_telegram_client(), get_telegram_client())
+            loop_thread = get_loop_thread()
+            session = loop_thread.run(open_session())
+
+            close_telegram_client()
+
+            self.assertTrue(session.closed)
+            self.assertTrue(loop_thread.loop.is_closed())
+
+
+class ScheduledMessageTestCase(TestCase):
+    """Класс для тестирования очереди запланированных сообщений."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.now = timezone.now()
+        self.due_messages = ScheduledMessage.objects.bulk_create(
+            ScheduledMessage(
+                chat_id=chat_id, text="Время отжиматься!", send_at=self.now
+            )
+            for chat_id in ("1", "2", "flood", "blocked")
+        )
+        self.future_message = ScheduledMessage.objects.create(
+            chat_id="1", text="Пора лежать!", send_at=self.now + timedelta(minutes=5)
+        )
+
+    @mock.patch("habits.tasks.get_telegram_client")
+    def test_deliver_scheduled_messages(self, get_client):
+        """Тестирует отправку наступивших сообщений, откладывание сообщений,
+        которые нужно повторить, и отметку отклоненных."""
+
+        get_client.return_value.send_messages = mock.AsyncMock(
+            return_value=(
+                [("flood", "Время отжиматься!", 30)],
+                [("blocked", "Время отжиматься!", "403: Forbidden")],
+            )
+        )
+
+        self.assertEqual(deliver_scheduled_messages(), 2)
+
+        sent_messages = get_client.return_value.send_messages.call_args.args[0]
+        self.assertEqual(
+            sorted(sent_messages),
+            [
+                ("1", "Время отжиматься!"),
+                ("2", "Время отжиматься!"),
+                ("blocked", "Время отжиматься!"),
+                ("flood", "Время отжиматься!"),
+            ],
+        )
+        self.assertEqual(
+            ScheduledMessage.objects.filter(sent_at__isnull=False).count(), 2
+        )
+        flood_message = ScheduledMessage.objects.get(chat_id="flood")
+        self.assertIsNone(flood_message.sent_at)
+        self.assertEqual(flood_message.attempts, 1)
+        self.assertGreaterEqual(flood_message.send_at, self.now + timedelta(seconds=30))
+        blocked_message = ScheduledMessage.objects.get(chat_id="blocked")
+        self.assertIsNone(blocked_message.sent_at)
+        self.assertIsNotNone(blocked_message.failed_at)
+        self.assertEqual(blocked_message.error, "403: Forbidden")
+        self.future_message.refresh_from_db()
+        self.assertIsNone(self.future_message.sent_at)
+
+        # Отклоненное сообщение больше не забирается из очереди
+        ScheduledMessage.objects.update(send_at=self.now)
+        claimed = claim_scheduled_messages(timezone.now(), 10)
+        self.assertNotIn("blocked", [chat_id for _, chat_id, _, _ in claimed])
+
+    def test_purge_scheduled_messages(self):
+        """Тестирует удаление старых отправленных сообщений."""
+
+        ScheduledMessage.objects.filter(chat_id="1").update(
+            sent_at=self.now - timedelta(days=10)
+        )
+        ScheduledMessage.objects.filter(chat_id="2").update(sent_at=self.now)
+
+        call_command("purge_scheduled_messages", days=7, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(ScheduledMessage.objects.values_list("chat_id", flat=True)),
+            ["2", "blocked", "flood"],
+        )
+
+        ScheduledMessage.objects.filter(chat_id="blocked").update(
+            failed_at=self.now, error="403: Forbidden"
+        )
+        call_command("purge_scheduled_messages", failed=True, stdout=StringIO())
+        self.assertEqual(
+            sorted(ScheduledMessage.objects.values_list("chat_id", flat=True)),
+            ["2", "flood"],
+        )
+
+
+class ScheduledMessageConcurrencyTestCase(TransactionTestCase):
+    """Класс для тестирования одновременной отправки в потоках воркера."""
+
+    @mock.patch("habits.tasks.settings.TELEGRAM_BATCH_SIZE", 5)
+    @mock.patch("habits.tasks.get_telegram_client")
+    def test_concurrent_deliveries(self, get_client):
+        """Тестирует две одновременные задачи отправки: обе выполняют корутины
+        в общем цикле событий процесса, каждое сообщение отправляется один раз."""
+
+        ScheduledMessage.objects.bulk_create(
+            ScheduledMessage(chat_id=str(i), text="Пора!", send_at=timezone.now())
+            for i in range(20)
+        )
+        loops = []
+        sent = []
+
+        async def send_messages(messages):
+            loops.append(asyncio.get_running_loop())
+            await asyncio.sleep(0.05)
+            sent.extend(messages)
+            return [], []
+
+        get_client.return_value.send_messages = send_messages
+        barrier = threading.Barrier(2)
+        delivered = []
+
+        def deliver():
+            barrier.wait(timeout=10)
+            try:
+                delivered.append(deliver_scheduled_messages())
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=deliver) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(delivered), 2)
+        self.assertEqual(sum(delivered), 20)
+        self.assertEqual(
+            sorted(chat_id for chat_id, _ in sent), sorted(map(str, range(20)))
+        )
+        self.assertEqual(set(loops), {get_loop_thread().loop})
+        self.assertEqual(
+            ScheduledMessage.objects.filter(sent_at__isnull=True).count(), 0
+        )
+
+
+class CatchUpOverdueHabitsTestCase(TestCase):
+    """Класс для тестирования переноса просроченных привычек."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com", tg_chat_id="123")
+        self.now = timezone.now()
+
+    def create_habit(self, do_at, periodicity=1, is_enjoyable=False):
+        return Habit.objects.create(
+            user=self.user,
+            place="дома",
+            do_at=do_at,
+            action="отжиматься",
+            is_enjoyable=is_enjoyable,
+            reward=None if is_enjoyable else "съесть конфетку",
+            periodicity=periodicity,
+            duration=60,
+        )
+
+    def test_catch_up_overdue_habits(self):
+        """Тестирует перенос просроченных привычек на ближайшее будущее выполнение."""
+
+        missed_hour = self.create_habit(self.now - timedelta(hours=1))
+        missed_weeks = self.create_habit(
+            self.now - timedelta(days=20, minutes=1), periodicity=7
+        )
+        future = self.create_habit(self.now + timedelta(hours=1))
+        enjoyable = self.create_habit(self.now - timedelta(hours=1), is_enjoyable=True)
+
+        call_command("catch_up_habits", batch_size=2, stdout=StringIO())
+
+        expected = {
+            missed_hour.pk: missed_hour.do_at + timedelta(days=1),
+            missed_weeks.pk: missed_weeks.do_at + timedelta(days=21),
+            future.pk: future.do_at,
+            enjoyable.pk: enjoyable.do_at,
+        }
+        self.assertEqual(dict(Habit.objects.values_list("pk", "do_at")), expected)
+
+    def test_catch_up_overdue_habits_count(self):
+        """Тестирует, что повторный запуск не переносит уже перенесенные привычки."""
+
+        for days in range(5):
+            self.create_habit(self.now - timedelta(days=days, minutes=1))
+
+        self.assertEqual(catch_up_overdue_habits(batch_size=2), 5)
+        self.assertEqual(catch_up_overdue_habits(batch_size=2), 0)
+
+
+class DueIndexTestCase(TestCase):
+    """Класс для тестирования индекса привычек по времени выполнения в Redis."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.redis = fakeredis.FakeRedis()
+        for patcher in (
+            mock.patch("habits.due_index.get_redis", return_value=self.redis),
+            mock.patch("habits.due_index.settings.HABIT_DUE_INDEX_ENABLED", True),
+            mock.patch("habits.due_index.settings.HABIT_REMINDER_SHARDS", 1),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create(email="user@email.com", tg_chat_id="123")
+        self.now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habit = Habit.objects.create(
+                user=self.user,
+                place="дома",
+                do_at=self.now + timedelta(minutes=2),
+                action="отжиматься",
+                reward="съесть конфетку",
+                duration=60,
+            )
+            self.enjoyable_habit = Habit.objects.create(
+                user=self.user,
+                place="дома",
+                do_at=self.now + timedelta(minutes=2),
+                action="лежать",
+                is_enjoyable=True,
+                duration=60,
+            )
+
+    def score(self, habit):
+        return self.redis.zscore(due_index.shard_key(0), habit.pk)
+
+    def test_signals_update_index(self):
+        """Тестирует обновление индекса при сохранении и удалении привычки."""
+
+        self.assertEqual(self.score(self.habit), self.habit.do_at.timestamp())
+        self.assertIsNone(self.score(self.enjoyable_habit))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habit.do_at += timedelta(hours=1)
+            self.habit.save()
+        self.assertEqual(self.score(self.habit), self.habit.do_at.timestamp())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habit.delete()
+        self.assertEqual(self.redis.zcard(due_index.shard_key(0)), 0)
+
+    @mock.patch("habits.tasks.deliver_scheduled_messages")
+    def test_send_habit_reminder_uses_index(self, deliver_scheduled_messages):
+        """Тестирует, что рассылка берет привычки из индекса и обновляет его."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(send_habit_reminder_shard(0, 1), 1)
+
+        self.assertEqual(
+            self.score(self.habit), (self.habit.do_at + timedelta(days=1)).timestamp()
+        )
+        self.assertEqual(ScheduledMessage.objects.count(), 3)
+
+        # привычки, которых нет в индексе, рассылка не видит
+        self.redis.delete(due_index.shard_key(0))
+        Habit.objects.filter(pk=self.habit.pk).update(do_at=self.habit.do_at)
+        self.assertEqual(send_habit_reminder_shard(0, 1), 0)
+
+    @mock.patch("habits.tasks.deliver_scheduled_messages")
+    def test_failed_claim_keeps_index(self, deliver_scheduled_messages):
+        """Тестирует, что привычки остаются в индексе, если транзакция рассылки
+        не зафиксирована."""
+
+        with mock.patch("habits.tasks.schedule_reminders", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                send_habit_reminder_shard(0, 1)
+
+        self.assertEqual(self.score(self.habit), self.habit.do_at.timestamp())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(send_habit_reminder_shard(0, 1), 1)
+        self.assertEqual(
+            self.score(self.habit), (self.habit.do_at + timedelta(days=1)).timestamp()
+        )
+
+    def test_rebuild_and_check_due_index(self):
+        """Тестирует перестроение индекса и проверку его согласованности."""
+
+        self.redis.zadd(due_index.shard_key(0), {self.enjoyable_habit.pk: 1})
+        self.redis.zadd(due_index.shard_key(0), {self.habit.pk: 1})
+
+        self.assertEqual(
+            due_index.check(),
+            {
+                "missing": [],
+                "stale": [self.habit.pk],
+                "extra": [self.enjoyable_habit.pk],
+            },
+        )
+        with self.assertRaises(CommandError):
+            call_command("check_due_index", stdout=StringIO())
+
+        call_command("rebuild_due_index", stdout=StringIO())
+
+        self.assertEqual(due_index.check(), {"missing": [], "stale": [], "extra": []})
+        self.assertEqual(self.score(self.habit), self.habit.do_at.timestamp())
+
+
+class TimingWheelTestCase(SimpleTestCase):
+    """Класс для тестирования колеса таймеров."""
+
+    def test_fires_at_exact_tick(self):
+        """Тестирует срабатывание элементов ровно в свою секунду на всех уровнях колеса."""
+
+        wheel = TimingWheel(start=1000)
+        delays = [0.5, 1, 59, 60, 61, 3599, 3600, 3601, 7322, 86399]
+        for delay in delays:
+            self.assertTrue(wheel.add(1000 + delay, delay))
+
+        fired = {}
+        for second in range(1001, 1000 + 86400):
+            for delay in wheel.advance(second):
+                fired[delay] = second - 1000
+        self.assertEqual(fired, {delay: math.ceil(delay) for delay in delays})
+
+    def test_beyond_horizon_and_overdue(self):
+        """Тестирует отказ для элементов за горизонтом и срабатывание просроченных."""
+
+        wheel = TimingWheel(start=1000, slots=(10, 10))
+        self.assertFalse(wheel.add(1100, "далеко"))
+        self.assertTrue(wheel.add(900, "просрочен"))
+        self.assertEqual(wheel.advance(1001), ["просрочен"])
+
+    def test_advance_skips_several_ticks(self):
+        """Тестирует срабатывание всех элементов при сдвиге сразу на несколько секунд."""
+
+        wheel = TimingWheel(start=0, slots=(10, 10))
+        for second in (5, 15, 25):
+            wheel.add(second, second)
+        self.assertEqual(wheel.advance(20), [5, 15])
+        self.assertEqual(wheel.advance(30), [25])
+
+
+class ReminderSchedulerTestCase(TestCase):
+    """Класс для тестирования планировщика напоминаний."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com", tg_chat_id="123")
+        self.now = timezone.now().replace(microsecond=0)
+        self.time = self.now.timestamp()
+        self.dispatched = []
+        self.scheduler = ReminderScheduler(
+            clock=lambda: self.time,
+            window=600,
+            refresh=60,
+            dispatch=self.dispatched.append,
+        )
+
+    def create_habit(self, do_at, **kwargs):
+        return Habit.objects.create(
+            user=self.user,
+            place="дома",
+            do_at=do_at,
+            action="отжиматься",
+            reward="съесть конфетку",
+            duration=60,
+            **kwargs,
+        )
+
+    def run_until(self, seconds):
+        for _ in range(seconds):
+            self.time += 1
+            self.scheduler.tick()
+
+    def test_dispatch_at_reminder_time(self):
+        """Тестирует постановку рассылки ровно за 5 минут до выполнения привычки."""
+
+        soon = self.create_habit(self.now + timedelta(minutes=5, seconds=30))
+        later = self.create_habit(self.now + timedelta(minutes=10))
+        overdue = self.create_habit(self.now + timedelta(minutes=2))
+        self.create_habit(self.now + timedelta(hours=2))
+        self.create_habit(self.now + timedelta(minutes=6), is_enjoyable=True)
+
+        self.scheduler.tick()
+        self.assertEqual(self.dispatched, [[overdue.pk]])
+        self.run_until(29)
+        self.assertEqual(self.dispatched[1:], [])
+        self.run_until(1)
+        self.assertEqual(self.dispatched[1:], [[soon.pk]])
+        self.run_until(270)
+        self.assertEqual(self.dispatched[2:], [[later.pk]])
+        self.assertEqual(self.scheduler.scheduled, {})
+
+    def test_refresh_loads_next_window(self):
+        """Тестирует догрузку привычек, попавших в окно планировщика позже."""
+
+        self.scheduler.tick()
+        habit = self.create_habit(self.now + timedelta(minutes=5, seconds=650))
+        self.run_until(60)
+        self.assertIn(habit.pk, self.scheduler.scheduled)
+        self.run_until(590)
+        self.assertEqual(self.dispatched, [[habit.pk]])
+
+    def test_handle_changes(self):
+        """Тестирует перенос и удаление привычек при их изменении."""
+
+        moved = self.create_habit(self.now + timedelta(minutes=6))
+        deleted = self.create_habit(self.now + timedelta(minutes=6))
+        self.scheduler.tick()
+
+        moved.do_at += timedelta(seconds=30)
+        moved.save()
+        deleted_pk = deleted.pk
+        deleted.delete()
+        self.scheduler.handle_changes([moved.pk, deleted_pk])
+
+        self.run_until(60)
+        self.assertEqual(self.dispatched, [])
+        self.run_until(30)
+        self.assertEqual(self.dispatched, [[moved.pk]])
+
+    @mock.patch("habits.signals.publish_change")
+    @mock.patch("habits.signals.settings.HABIT_SCHEDULER_ENABLED", True)
+    def test_signals_publish_changes(self, publish_change):
+        """Тестирует публикацию изменений привычки для планировщика."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            habit = self.create_habit(self.now + timedelta(minutes=6))
+        pk = habit.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            habit.delete()
+        self.assertEqual(publish_change.call_args_list, [mock.call(pk)] * 2)
+
+    @mock.patch("habits.tasks.settings.HABIT_SCHEDULER_ENABLED", True)
+    def test_catch_up_publishes_changes(self):
+        """Тестирует, что перенесенные при догоняющем обходе привычки попадают в
+        колесо планировщика."""
+
+        redis = fakeredis.FakeRedis()
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(CHANGES_CHANNEL)
+        # подтверждение подписки
+        self.assertIsNone(pubsub.get_message())
+        habit = self.create_habit(self.now - timedelta(days=1, minutes=-6))
+        self.scheduler.tick()
+        self.assertNotIn(habit.pk, self.scheduler.scheduled)
+
+        with mock.patch("habits.scheduler.get_redis", return_value=redis):
+            self.assertEqual(catch_up_overdue_habits(), 1)
+
+        changed = []
+        while message := pubsub.get_message():
+            changed.append(int(message["data"]))
+        self.assertEqual(changed, [habit.pk])
+        self.scheduler.handle_changes(changed)
+        habit.refresh_from_db()
+        self.assertEqual(self.scheduler.scheduled, {habit.pk: habit.do_at})
+
+    @mock.patch("habits.tasks.deliver_scheduled_messages")
+    def test_send_habit_reminders(self, deliver_scheduled_messages):
+        """Тестирует рассылку по привычкам, поставленным планировщиком."""
+
+        habit = self.create_habit(self.now + timedelta(minutes=4))
+        other = self.create_habit(self.now + timedelta(minutes=4))
+        self.assertEqual(send_habit_reminders([habit.pk]), 1)
+        self.assertEqual(send_habit_reminders([habit.pk]), 0)
+        self.assertEqual(ScheduledMessage.objects.filter(habit=habit).count(), 3)
+        self.assertFalse(ScheduledMessage.objects.filter(habit=other).exists())
+        deliver_scheduled_messages.delay.assert_called_once()
+
+    @mock.patch("habits.tasks.deliver_scheduled_messages")
+    @mock.patch("habits.tasks.settings.HABIT_SCHEDULER_ENABLED", True)
+    def test_sweep_leaves_habits_to_scheduler(self, deliver_scheduled_messages):
+        """Тестирует, что обход по beat забирает только опоздавшие привычки,
+        если включен планировщик."""
+
+        self.create_habit(self.now + timedelta(minutes=4, seconds=30))
+        late = self.create_habit(self.now + timedelta(minutes=3))
+        self.assertEqual(send_habit_reminder_shard(0, 1), 1)
+        self.assertEqual(
+            set(ScheduledMessage.objects.values_list("habit", flat=True)), {late.pk}
+        )
+
+
+@mock.patch("habits.tasks.deliver_scheduled_messages")
+class ReminderMetricsTestCase(TestCase):
+    """Класс для тестирования метрик рассылки напоминаний."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com", tg_chat_id="123")
+        self.user_without_chat = User.objects.create(email="no_chat@email.com")
+        for user in (self.user, self.user_without_chat):
+            Habit.objects.create(
+                user=user,
+                place="дома",
+                do_at=timezone.now() + timedelta(minutes=2),
+                action="отжиматься",
+                reward="съесть конфетку",
+                duration=60,
+            )
+
+    @staticmethod
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_sweep_metrics(self, deliver_scheduled_messages):
+        """Тестирует учет выбранных привычек, поставленных сообщений и задержки."""
+
+        before = {
+            "scanned": self.sample(
+                "habit_reminder_habits_scanned_total", source="sweep"
+            ),
+            "claimed": self.sample(
+                "habit_reminder_habits_claimed_total", source="sweep"
+            ),
+            "queued": self.sample("habit_reminder_messages_queued_total"),
+            "sweeps": self.sample(
+                "habit_reminder_sweep_duration_seconds_count", source="sweep"
+            ),
+            "lag": self.sample("habit_reminder_schedule_lag_seconds_count"),
+        }
+
+        send_habit_reminder_shard(0, 1)
+
+        self.assertEqual(
+            self.sample("habit_reminder_habits_scanned_total", source="sweep"),
+            before["scanned"] + 2,
+        )
+        self.assertEqual(
+            self.sample("habit_reminder_habits_claimed_total", source="sweep"),
+            before["claimed"] + 1,
+        )
+        self.assertEqual(
+            self.sample("habit_reminder_messages_queued_total"), before["queued"] + 3
+        )
+        self.assertEqual(
+            self.sample("habit_reminder_sweep_duration_seconds_count", source="sweep"),
+            before["sweeps"] + 1,
+        )
+        self.assertEqual(
+            self.sample("habit_reminder_schedule_lag_seconds_count"), before["lag"] + 1
+        )
+
+    @mock.patch("habits.tasks.get_telegram_client")
+    def test_delivery_metrics(self, get_client, deliver_scheduled_messages_mock):
+        """Тестирует учет отправленных и отложенных сообщений."""
+
+        get_client.return_value.send_messages = mock.AsyncMock(return_value=([], []))
+        send_habit_reminder_shard(0, 1)
+        ScheduledMessage.objects.update(send_at=timezone.now())
+        sent = self.sample("telegram_messages_sent_total")
+        lag = self.sample("telegram_delivery_lag_seconds_count")
+
+        deliver_scheduled_messages()
+
+        self.assertEqual(self.sample("telegram_messages_sent_total"), sent + 3)
+        self.assertEqual(self.sample("telegram_delivery_lag_seconds_count"), lag + 3)
+
+    @mock.patch("habits.views.settings.METRICS_TOKEN", "secret")
+    def test_metrics_endpoint(self, deliver_scheduled_messages):
+        """Тестирует выдачу метрик в формате Prometheus."""
+
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(b"habit_reminder_sweep_duration_seconds", response.content)
+        self.assertIn(b"telegram_request_duration_seconds", response.content)
+
+    def test_metrics_endpoint_token(self, deliver_scheduled_messages):
+        """Тестирует, что метрики без токена не отдаются."""
+
+        self.assertEqual(
+            self.client.get(reverse("metrics")).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+        with mock.patch("habits.views.settings.METRICS_TOKEN", "secret"):
+            for headers in ({}, {"HTTP_AUTHORIZATION": "Bearer wrong"}):
+                response = self.client.get(reverse("metrics"), **headers)
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+                self.assertEqual(response["WWW-Authenticate"], "Bearer")
+
+
+class HabitPaginationTestCase(APITestCase):
+    """Класс для тестирования пагинации привычек по курсору."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com")
+        self.client.force_authenticate(user=self.user)
+        do_at = timezone.now()
+        # по две привычки на одно время, чтобы проверить порядок по id
+        self.habits = [
+            Habit.objects.create(
+                user=self.user,
+                place="дома",
+                do_at=do_at - timedelta(hours=i // 2),
+                action=f"отжиматься {i}",
+                reward="съесть конфетку",
+                duration=60,
+                is_public=bool(i % 3),
+            )
+            for i in range(12)
+        ]
+        self.ordered_ids = [
+            habit.pk
+            for habit in sorted(
+                self.habits, key=lambda habit: (habit.do_at, habit.pk), reverse=True
+            )
+        ]
+
+    def collect_pages(self, url):
+        ids = []
+        pages = 0
+        while url:
+            data = self.client.get(url).json()
+            ids += [habit["id"] for habit in data["results"]]
+            url = data["next"]
+            pages += 1
+        return ids, pages
+
+    def test_next_pages(self):
+        """Тестирует обход всех страниц по курсору next без пропусков и повторов."""
+
+        ids, pages = self.collect_pages(reverse("habits:habit-list"))
+
+        self.assertEqual(ids, self.ordered_ids)
+        self.assertEqual(pages, 3)
+
+    def test_previous_page(self):
+        """Тестирует возврат на предыдущую страницу по курсору previous."""
+
+        first = self.client.get(reverse("habits:habit-list")).json()
+        second = self.client.get(first["next"]).json()
+        back = self.client.get(second["previous"]).json()
+
+        self.assertIsNone(first["previous"])
+        self.assertEqual(back["results"], first["results"])
+        self.assertIsNone(back["previous"])
+        self.assertEqual(back["next"], first["next"])
+
+    def test_count_on_request(self):
+        """Тестирует подсчет количества привычек только по запросу."""
+
+        url = reverse("habits:habit-list")
+        self.assertNotIn("count", self.client.get(url).json())
+        with self.assertNumQueries(3):
+            data = self.client.get(url, {"count": "true"}).json()
+        self.assertEqual(data["count"], 12)
+
+    def test_public_list_pages(self):
+        """Тестирует пагинацию списка публичных привычек."""
+
+        ids, pages = self.collect_pages(reverse("habits:public-list"))
+
+        public_ids = set(
+            Habit.objects.filter(is_public=True).values_list("pk", flat=True)
+        )
+        self.assertEqual(ids, [pk for pk in self.ordered_ids if pk in public_ids])
+        self.assertEqual(pages, 2)
+
+    def test_invalid_cursor(self):
+        """Тестирует ответ на поврежденный курсор."""
+
+        response = self.client.get(reverse("habits:habit-list"), {"cursor": "мусор"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PublicHabitCacheTestCase(APITestCase):
+    """Класс для тестирования кэша ленты публичных привычек."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeRedis(server=server)
+        for patcher in (
+            mock.patch("habits.cache.get_redis", return_value=self.redis),
+            # Асинхронный клиент создается заново в цикле событий каждого запроса
+            mock.patch(
+                "habits.cache.get_async_redis",
+                side_effect=lambda: fakeredis.FakeAsyncRedis(server=server),
+            ),
+            mock.patch("habits.cache.settings.HABIT_PUBLIC_CACHE_ENABLED", True),
+            mock.patch("habits.cache.settings.HABIT_PUBLIC_CACHE_VERSION_TTL", 60),
+            mock.patch.object(cache, "_local", cache.LRUCache(100)),
+            mock.patch.object(cache, "_version", None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create(email="user@email.com")
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.public_habit = Habit.objects.create(
+                user=self.user,
+                place="дома",
+                do_at=timezone.now(),
+                action="делать зарядку",
+                reward="съесть конфетку",
+                duration=60,
+                is_public=True,
+            )
+            self.private_habit = Habit.objects.create(
+                user=self.user,
+                place="дома",
+                do_at=timezone.now(),
+                action="отжиматься",
+                reward="съесть конфетку",
+                duration=60,
+            )
+        self.list_url = reverse("habits:public-list")
+
+    @staticmethod
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def actions(self):
+        return [
+            habit["action"]
+            for habit in self.client.get(self.list_url).json()["results"]
+        ]
+
+    def test_cached_list(self):
+        """Тестирует ответ из кэша без запросов к БД и учет попаданий."""
+
+        misses = self.sample("habit_public_cache_misses_total")
+        local_hits = self.sample("habit_public_cache_hits_total", tier="local")
+        redis_hits = self.sample("habit_public_cache_hits_total", tier="redis")
+
+        first = self.client.get(self.list_url).json()
+        with self.assertNumQueries(0):
+            second = self.client.get(self.list_url).json()
+        cache._local.clear()
+        with self.assertNumQueries(0):
+            third = self.client.get(self.list_url).json()
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, third)
+        self.assertEqual(self.sample("habit_public_cache_misses_total"), misses + 1)
+        self.assertEqual(
+            self.sample("habit_public_cache_hits_total", tier="local"), local_hits + 1
+        )
+        self.assertEqual(
+            self.sample("habit_public_cache_hits_total", tier="redis"), redis_hits + 1
+        )
+
+    def test_public_habit_change_invalidates(self):
+        """Тестирует сброс кэша при изменении публичной привычки."""
+
+        self.assertEqual(self.actions(), ["делать зарядку"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.public_habit.action = "бегать"
+            self.public_habit.save()
+        self.assertEqual(self.actions(), ["бегать"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.private_habit.is_public = True
+            self.private_habit.save()
+        self.assertEqual(len(self.actions()), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.private_habit.is_public = False
+            self.private_habit.save()
+        self.assertEqual(self.actions(), ["бегать"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.public_habit.delete()
+        self.assertEqual(self.actions(), [])
+
+    def test_private_habit_change_keeps_cache(self):
+        """Тестирует, что изменение непубличной привычки не сбрасывает кэш."""
+
+        self.actions()
+        version = cache.current_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.private_habit.action = "приседать"
+            self.private_habit.save()
+            Habit.objects.get(pk=self.private_habit.pk).save()
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(cache.current_version(), version)
+
+    def test_not_found_is_not_cached(self):
+        """Тестирует, что ответ 404 не кэшируется."""
+
+        url = reverse("habits:public-retrieve", args=(self.private_habit.pk,))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.private_habit.is_public = True
+            self.private_habit.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_lru_eviction(self):
+        """Тестирует вытеснение давно не используемых записей."""
+
+        lru = cache.LRUCache(2)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+
+        self.assertEqual(lru.get("a"), 1)
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("c"), 3)
+
+
+class HabitConditionalGetTestCase(APITestCase):
+    """Класс для тестирования условных запросов (ETag, Last-Modified) к привычкам."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com", tg_chat_id="123")
+        self.other_user = User.objects.create(email="other@email.com")
+        self.client.force_authenticate(user=self.user)
+        self.habit = self.create_habit(self.user)
+        self.other_habit = self.create_habit(self.other_user)
+        self.list_url = reverse("habits:habit-list")
+
+    @staticmethod
+    def create_habit(user):
+        return Habit.objects.create(
+            user=user,
+            place="дома",
+            do_at=timezone.now() + timedelta(minutes=2),
+            action="отжиматься",
+            reward="съесть конфетку",
+            duration=60,
+        )
+
+    def test_list_not_modified(self):
+        """Тестирует ответ 304 без запроса списка привычек."""
+
+        response = self.client.get(self.list_url)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(
+            self.list_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_on_write(self):
+        """Тестирует смену ETag при изменении своих привычек и только их."""
+
+        etag = self.client.get(self.list_url)["ETag"]
+
+        self.other_habit.action = "приседать"
+        self.other_habit.save()
+        self.assertEqual(self.client.get(self.list_url)["ETag"], etag)
+
+        self.habit.action = "приседать"
+        self.habit.save()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+        etag = response["ETag"]
+        self.habit.delete()
+        self.assertNotEqual(self.client.get(self.list_url)["ETag"], etag)
+
+    @mock.patch("habits.tasks.deliver_scheduled_messages")
+    def test_etag_changes_on_reminder_sweep(self, deliver_scheduled_messages):
+        """Тестирует смену ETag при переносе даты выполнения рассылкой."""
+
+        etag = self.client.get(self.list_url)["ETag"]
+        send_habit_reminder_shard(0, 1)
+
+        self.assertNotEqual(self.client.get(self.list_url)["ETag"], etag)
+        self.habit.refresh_from_db()
+        self.assertEqual(
+            self.client.get(self.list_url).json()["results"][0]["do_at"],
+            timezone.localtime(self.habit.do_at).isoformat(),
+        )
+
+    def test_staff_etag(self):
+        """Тестирует смену ETag администратора при изменении привычки без
+        владельца и при удалении пользователя вместе с созданием привычки
+        другим пользователем."""
+
+        self.client.force_authenticate(
+            user=User.objects.create(email="admin@email.com", is_staff=True)
+        )
+        etag = self.client.get(self.list_url)["ETag"]
+
+        ownerless_habit = self.create_habit(None)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        ownerless_habit.action = "приседать"
+        ownerless_habit.save()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response["ETag"]
+        self.other_user.delete()
+        self.create_habit(User.objects.create(email="new@email.com"))
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_query(self):
+        """Тестирует разные ETag для разных страниц списка."""
+
+        self.assertNotEqual(
+            self.client.get(self.list_url)["ETag"],
+            self.client.get(self.list_url, {"page_size": 1})["ETag"],
+        )
+
+    def test_retrieve_not_modified(self):
+        """Тестирует ответ 304 для привычки и проверку доступа до него."""
+
+        url = reverse("habits:habit-detail", args=(self.habit.pk,))
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        other_url = reverse("habits:habit-detail", args=(self.other_habit.pk,))
+        response = self.client.get(other_url, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class HabitFastReadTestCase(APITestCase):
+    """Класс для тестирования быстрого чтения привычек и рендерера на orjson."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com", is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.enjoyable_habit = Habit.objects.create(
+            user=self.user,
+            place="на диване",
+            do_at="2024-10-05T07:00:00.123456+00:00",
+            action='лежать\u2028и смотреть в\u2029потолок "😀"',
+            is_enjoyable=True,
+            duration=60,
+            is_public=True,
+        )
+        self.habit = Habit.objects.create(
+            user=self.user,
+            place="дома",
+            do_at="2024-10-05T07:00:00+03:00",
+            action="отжиматься\n\t",
+            related_habit=self.enjoyable_habit,
+            duration=120,
+            periodicity=7,
+            is_public=True,
+        )
+
+    def expected_content(self, data):
+        return JSONRenderer().render(data)
+
+    def test_list_matches_model_serializer(self):
+        """Тестирует побайтовое совпадение списка с ModelSerializer и JSONRenderer."""
+
+        habits = Habit.objects.order_by("-do_at", "-id")
+        expected = self.expected_content(
+            {
+                "next": None,
+                "previous": None,
+                "results": HabitSerializer(habits, many=True).data,
+            }
+        )
+
+        for url in (reverse("habits:habit-list"), reverse("habits:public-list")):
+            response = self.client.get(url)
+            self.assertEqual(response.content, expected)
+
+    def test_retrieve_matches_model_serializer(self):
+        """Тестирует побайтовое совпадение привычки с ModelSerializer и JSONRenderer."""
+
+        for habit in (self.habit, self.enjoyable_habit):
+            habit.refresh_from_db()
+            expected = self.expected_content(HabitSerializer(habit).data)
+            for url in (
+                reverse("habits:habit-detail", args=(habit.pk,)),
+                reverse("habits:public-retrieve", args=(habit.pk,)),
+            ):
+                self.assertEqual(self.client.get(url).content, expected)
+
+    def test_renderer_fallback(self):
+        """Тестирует стандартный рендерер для отступов и типов, которые orjson
+        выводит иначе."""
+
+        renderer = ORJSONRenderer()
+        data = {"amount": Decimal("1.10"), "at": timezone.now()}
+        self.assertEqual(renderer.render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            renderer.render({"a": 1}, "application/json; indent=2"),
+            JSONRenderer().render({"a": 1}, "application/json; indent=2"),
+        )
+
+    def test_parser(self):
+        """Тестирует разбор тела запроса парсером на orjson."""
+
+        response = self.client.patch(
+            reverse("habits:habit-detail", args=(self.habit.pk,)),
+            data=json.dumps({"place": "в парке\u2028дома"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.place, "в парке\u2028дома")
+
+        response = self.client.patch(
+            reverse("habits:habit-detail", args=(self.habit.pk,)),
+            data="{не json",
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class HabitBulkTestCase(APITestCase):
+    """Класс для тестирования массового создания и изменения привычек."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com")
+        self.other_user = User.objects.create(email="other@email.com")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("habits:habit-bulk")
+        self.enjoyable_habit = Habit.objects.create(
+            user=self.user,
+            place="дома",
+            do_at="2024-10-05T07:00:00+03:00",
+            action="лежать",
+            is_enjoyable=True,
+            duration=60,
+        )
+        self.habit = Habit.objects.create(
+            user=self.user,
+            place="дома",
+            do_at="2024-10-05T08:00:00+03:00",
+            action="отжиматься",
+            related_habit=self.enjoyable_habit,
+            duration=60,
+        )
+        self.other_habit = Habit.objects.create(
+            user=self.other_user,
+            place="дома",
+            do_at="2024-10-05T08:00:00+03:00",
+            action="бегать",
+            reward="съесть конфетку",
+            duration=60,
+        )
+
+    def new_habit(self, **kwargs):
+        return {
+            "place": "в парке",
+            "do_at": "2024-10-05T07:00:00+03:00",
+            "action": "гулять",
+            "reward": "съесть конфетку",
+            "duration": 60,
+            **kwargs,
+        }
+
+    def test_bulk_create_and_update(self):
+        """Тестирует создание и изменение привычек одним запросом."""
+
+        data = [
+            self.new_habit(),
+            {"id": self.habit.pk, "place": "в парке", "periodicity": 2},
+            self.new_habit(reward=None, related_habit=self.enjoyable_habit.pk),
+        ]
+        version = HabitVersion.objects.aggregate(Max("version"))["version__max"]
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.json()
+        self.assertEqual(results[1]["id"], self.habit.pk)
+        self.assertEqual(results[1]["place"], "в парке")
+        self.assertEqual(results[1]["related_habit"], self.enjoyable_habit.pk)
+        self.assertEqual(results[2]["related_habit"], self.enjoyable_habit.pk)
+        self.assertEqual(
+            Habit.objects.filter(user=self.user, action="гулять").count(), 2
+        )
+        self.habit.refresh_from_db()
+        self.assertEqual((self.habit.place, self.habit.periodicity), ("в парке", 2))
+        # одна новая версия на всю пачку
+        self.assertEqual(HabitVersion.objects.get(user=self.user).version, version + 1)
+
+    def test_bulk_query_count(self):
+        """Тестирует, что число запросов не зависит от количества привычек."""
+
+        def post(count):
+            data = [
+                self.new_habit(reward=None, related_habit=self.enjoyable_habit.pk)
+                for _ in range(count)
+            ]
+            data.append({"id": self.habit.pk, "duration": 30})
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        self.assertEqual(post(2), post(50))
+
+    def test_bulk_errors_per_item(self):
+        """Тестирует ошибки по каждой привычке и отказ от сохранения всей пачки."""
+
+        data = [
+            self.new_habit(),
+            self.new_habit(duration=500),
+            self.new_habit(related_habit=self.enjoyable_habit.pk),
+            self.new_habit(reward=None, related_habit=self.habit.pk),
+            self.new_habit(related_habit=999999),
+            {"id": self.other_habit.pk, "place": "в парке"},
+            {"id": self.habit.pk, "reward": "съесть конфетку"},
+            {"place": "в парке"},
+        ]
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertEqual(len(errors), len(data))
+        self.assertEqual(errors[0], {})
+        self.assertEqual(list(errors[1]), ["duration"])
+        self.assertEqual(
+            errors[2]["non_field_errors"],
+            ["Нельзя одновременно указывать и вознаграждение и связанную привычку."],
+        )
+        self.assertEqual(
+            errors[3]["non_field_errors"], ["Связанная привычка должна быть приятной."]
+        )
+        self.assertEqual(list(errors[4]), ["related_habit"])
+        self.assertEqual(errors[5], {"id": ["Привычка не найдена."]})
+        self.assertEqual(
+            errors[6]["non_field_errors"],
+            ["Нельзя одновременно указывать и вознаграждение и связанную привычку."],
+        )
+        self.assertEqual(set(errors[7]), {"do_at", "action", "duration"})
+        self.assertFalse(Habit.objects.filter(action="гулять").exists())
+
+    def test_bulk_requires_list(self):
+        """Тестирует ответ на запрос без списка привычек."""
+
+        response = self.client.post(self.url, self.new_habit(), format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("non_field_errors", response.json())
+
+
+class HabitAsyncViewTestCase(TestCase):
+    """Класс для тестирования асинхронных обработчиков привычек."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com")
+        self.other_user = User.objects.create(email="other@email.com")
+        self.habit = self.create_habit(self.user, is_public=False)
+        self.other_habit = self.create_habit(self.other_user, is_public=True)
+        self.headers = {
+            "Authorization": f"Bearer {AccessToken.for_user(self.user)}",
+        }
+
+    @staticmethod
+    def create_habit(user, is_public):
+        return Habit.objects.create(
+            user=user,
+            place="дома",
+            do_at=timezone.now() + timedelta(minutes=2),
+            action="отжиматься",
+            reward="съесть конфетку",
+            duration=60,
+            is_public=is_public,
+        )
+
+    def test_views_are_async(self):
+        """Тестирует, что вьюхи привычек вызываются как корутины."""
+
+        for url in (
+            reverse("habits:habit-list"),
+            reverse("habits:habit-detail", args=(self.habit.pk,)),
+            reverse("habits:public-list"),
+            reverse("habits:public-retrieve", args=(self.other_habit.pk,)),
+        ):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(url).func), url)
+
+    async def test_list_and_retrieve(self):
+        """Тестирует список и просмотр привычек через ASGI."""
+
+        response = await self.async_client.get(
+            reverse("habits:habit-list"), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [habit["id"] for habit in response.json()["results"]], [self.habit.pk]
+        )
+        self.assertIn("ETag", response)
+
+        response = await self.async_client.get(
+            reverse("habits:habit-detail", args=(self.habit.pk,)), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["id"], self.habit.pk)
+
+        response = await self.async_client.get(
+            reverse("habits:habit-detail", args=(self.other_habit.pk,)),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await self.async_client.get(
+            reverse("habits:public-retrieve", args=(self.other_habit.pk,)),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["id"], self.other_habit.pk)
+
+    async def test_create_and_update(self):
+        """Тестирует асинхронное создание и синхронное изменение привычки."""
+
+        response = await self.async_client.post(
+            reverse("habits:habit-list"),
+            {
+                "place": "дома",
+                "do_at": "2024-10-05T07:00:00+03:00",
+                "action": "гулять",
+                "reward": "съесть конфетку",
+                "duration": 60,
+            },
+            content_type="application/json",
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        habit = await Habit.objects.aget(pk=response.json()["id"])
+        self.assertEqual(habit.user_id, self.user.pk)
+        self.assertEqual(response.json()["user"], self.user.pk)
+
+        response = await self.async_client.patch(
+            reverse("habits:habit-detail", args=(habit.pk,)),
+            {"action": "бегать"},
+            content_type="application/json",
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["action"], "бегать")
+
+    async def test_anonymous_user(self):
+        """Тестирует отказ анонимному пользователю."""
+
+        response = await self.async_client.get(reverse("habits:habit-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PublicHabitSearchTestCase(APITestCase):
+    """Класс для тестирования поиска публичных привычек."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("habits:public-search")
+        self.by_action = self.create_habit("отжиматься в парке", "на улице")
+        self.by_place = self.create_habit("читать", "парк у дома")
+        self.same = [self.create_habit("приседать", "дома") for _ in range(5)]
+        self.private = self.create_habit("отжиматься", "в парке", is_public=False)
+
+    def create_habit(self, action, place, is_public=True):
+        return Habit.objects.create(
+            user=self.user,
+            place=place,
+            do_at=timezone.now() + timedelta(minutes=2),
+            action=action,
+            reward="съесть конфетку",
+            duration=60,
+            is_public=is_public,
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {"q": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return response.json()
+
+    def test_search_ranks_action_above_place(self):
+        """Тестирует поиск по началу слова с учетом морфологии и ранжирование."""
+
+        results = self.search("парк")["results"]
+        self.assertEqual(
+            [habit["id"] for habit in results], [self.by_action.pk, self.by_place.pk]
+        )
+        results = self.search("в парках")["results"]
+        self.assertEqual(
+            [habit["id"] for habit in results], [self.by_action.pk, self.by_place.pk]
+        )
+        results = self.search("отжим")["results"]
+        self.assertEqual([habit["id"] for habit in results], [self.by_action.pk])
+        self.assertEqual(self.search("плавать")["results"], [])
+
+    def test_search_cursor_pagination(self):
+        """Тестирует обход результатов с одинаковой релевантностью по курсору."""
+
+        data = self.search("приседать", page_size=2)
+        seen = [habit["id"] for habit in data["results"]]
+        while data["next"]:
+            data = self.client.get(data["next"]).json()
+            seen += [habit["id"] for habit in data["results"]]
+        self.assertEqual(seen, sorted((habit.pk for habit in self.same), reverse=True))
+
+        previous = self.client.get(data["previous"]).json()
+        self.assertEqual([habit["id"] for habit in previous["results"]], seen[2:4])
+
+    def test_search_query_validation(self):
+        """Тестирует ответ на пустой и слишком короткий запрос."""
+
+        for params in ({}, {"q": "  "}, {"q": "а"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("q", response.json())
+
+    def test_search_uses_index(self):
+        """Тестирует, что поиск среди множества публичных привычек выбирает их
+        по индексу habit_public_search_idx, а не просмотром всех публичных."""
+
+        table = Habit._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table}
+                    (user_id, place, do_at, action, is_enjoyable, periodicity,
+                     reward, duration, is_public, updated_at)
+                SELECT %s, 'дома', NOW(), 'читать ' || i, false, 1,
+                    'съесть конфетку', 60, true, NOW()
+                FROM generate_series(1, 5000) AS i
+                """,
+                [self.user.pk],
+            )
+            cursor.execute(f"ANALYZE {table}")
+
+        queryset = search.search(Habit.objects.filter(is_public=True), "отжим парк")
+        with transaction.atomic(), connection.cursor() as cursor:
+            # На тысячах строк планировщик еще может счесть полный просмотр
+            # дешевле; проверяется, что индекс применим к условию поиска
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = queryset.order_by("-rank", "-id").explain()
+        self.assertIn("Bitmap Index Scan on habit_public_search_idx", plan)
+
+
+class SqliteHabitSearchTestCase(TestCase):
+    """Класс для тестирования миграций и поиска привычек на СУБД, отличной от
+    Postgres (тестовая БД SQLite создается миграциями, алиас sqlite есть в
+    настройках только при запуске manage.py test)."""
+
+    databases = {"sqlite"}
+
+    def test_migrations_without_search_index(self):
+        """Тестирует, что миграции проходят, а поискового индекса нет."""
+
+        sqlite = connections["sqlite"]
+        with sqlite.cursor() as cursor:
+            columns = sqlite.introspection.get_table_description(
+                cursor, Habit._meta.db_table
+            )
+            constraints = sqlite.introspection.get_constraints(
+                cursor, Habit._meta.db_table
+            )
+        self.assertNotIn("search_vector", {column.name for column in columns})
+        self.assertIn("habit_public_do_at_id_idx", constraints)
+        self.assertNotIn("habit_public_search_idx", constraints)
+
+    def test_search_fallback(self):
+        """Тестирует поиск через icontains по каждому слову запроса."""
+
+        # bulk_create: обработчики сигналов привычек пишут в основную БД
+        user = User.objects.using("sqlite").bulk_create([User(email="user@email.com")])[
+            0
+        ]
+        habits = Habit.objects.using("sqlite").bulk_create(
+            Habit(
+                user=user,
+                place=place,
+                do_at=timezone.now(),
+                action=action,
+                reward="съесть конфетку",
+                duration=60,
+                is_public=is_public,
+            )
+            for action, place, is_public in (
+                ("отжиматься в парке", "на улице", True),
+                ("читать", "парк у дома", True),
+                ("приседать", "дома", True),
+                ("отжиматься", "в парке", False),
+            )
+        )
+
+        queryset = Habit.objects.using("sqlite").filter(is_public=True)
+        results = search.search(queryset, "парк").values_list("pk", "rank")
+        self.assertEqual(sorted(results), [(habits[0].pk, 1.0), (habits[1].pk, 1.0)])
+        results = search.search(queryset, "отжим парк").values_list("pk", flat=True)
+        self.assertEqual(list(results), [habits[0].pk])
+        self.assertFalse(search.search(queryset, "плавать").exists())
+
+
+class HabitFilterTestCase(APITestCase):
+    """Класс для тестирования фильтров списка привычек."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("habits:habit-list")
+        self.now = timezone.now()
+        self.enjoyable = self.create_habit(
+            is_enjoyable=True, reward=None, is_public=True, hours=1
+        )
+        self.useful = self.create_habit(
+            related_habit=self.enjoyable, reward=None, periodicity=2, hours=2
+        )
+        self.rewarded = self.create_habit(reward="съесть конфетку", hours=3)
+
+    def create_habit(self, hours, **fields):
+        return Habit.objects.create(
+            **{
+                "user": self.user,
+                "place": "дома",
+                "do_at": self.now + timedelta(hours=hours),
+                "action": "отжиматься",
+                "duration": 60,
+                **fields,
+            }
+        )
+
+    def ids(self, url=None, **params):
+        response = self.client.get(url or self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return {habit["id"] for habit in response.json()["results"]}
+
+    def test_filters(self):
+        """Тестирует каждый фильтр списка привычек."""
+
+        self.assertEqual(self.ids(is_enjoyable="true"), {self.enjoyable.pk})
+        self.assertEqual(
+            self.ids(is_enjoyable="false"), {self.useful.pk, self.rewarded.pk}
+        )
+        self.assertEqual(self.ids(is_public="true"), {self.enjoyable.pk})
+        self.assertEqual(self.ids(periodicity=2), {self.useful.pk})
+        self.assertEqual(self.ids(has_reward="true"), {self.rewarded.pk})
+        self.assertEqual(
+            self.ids(has_reward="false"), {self.enjoyable.pk, self.useful.pk}
+        )
+        self.assertEqual(self.ids(has_related_habit="true"), {self.useful.pk})
+        self.assertEqual(
+            self.ids(
+                do_at_after=(self.now + timedelta(hours=2)).isoformat(),
+                do_at_before=(self.now + timedelta(hours=3)).isoformat(),
+            ),
+            {self.useful.pk},
+        )
+        self.assertEqual(
+            self.ids(is_enjoyable="false", has_reward="false"), {self.useful.pk}
+        )
+        self.assertEqual(
+            self.ids(reverse("habits:public-list"), is_enjoyable="false"), set()
+        )
+
+    def test_filter_validation(self):
+        """Тестирует ответ на неверные значения фильтров."""
+
+        for params, field in (
+            ({"is_enjoyable": "может быть"}, "is_enjoyable"),
+            ({"periodicity": 8}, "periodicity"),
+            ({"do_at_after": "вчера"}, "do_at_after"),
+            (
+                {
+                    "do_at_after": self.now.isoformat(),
+                    "do_at_before": (self.now - timedelta(days=1)).isoformat(),
+                },
+                "do_at_before",
+            ),
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(list(response.json()), [field])
+
+
+class HabitFilterPlanTestCase(TestCase):
+    """Класс для проверки планов запросов с фильтрами привычек (EXPLAIN)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Метод для заполнения первичных данных: 20 000 привычек 100 пользователей."""
+
+        cls.users = User.objects.bulk_create(
+            User(email=f"user{i}@email.com") for i in range(100)
+        )
+        table = Habit._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table}
+                    (user_id, place, do_at, action, is_enjoyable, periodicity,
+                     reward, duration, is_public, updated_at)
+                SELECT (%s::bigint[])[1 + i %% 100], 'дома',
+                    NOW() + (i %% 10000) * interval '1 minute', 'отжиматься',
+                    i %% 5 = 0, 1 + i %% 7,
+                    CASE WHEN i %% 5 = 0 THEN NULL ELSE 'съесть конфетку' END,
+                    60, i %% 10 < 3, NOW()
+                FROM generate_series(1, 20000) AS i
+                """,
+                [[user.pk for user in cls.users]],
+            )
+            cursor.execute(f"ANALYZE {table}")
+
+    def plan(self, queryset, **params):
+        request = Request(APIRequestFactory().get("/", params))
+        queryset = HabitFilterBackend().filter_queryset(request, queryset, None)
+        return queryset.order_by("-do_at", "-id")[:6].explain()
+
+    def test_user_list_plan(self):
+        """Тестирует, что фильтры своих привычек проверяются на диапазоне индекса
+        (user, do_at, id)."""
+
+        now = timezone.now()
+        plan = self.plan(
+            Habit.objects.filter(user=self.users[0]),
+            is_enjoyable="false",
+            periodicity=3,
+            has_reward="true",
+            do_at_after=now.isoformat(),
+            do_at_before=(now + timedelta(days=1)).isoformat(),
+        )
+        self.assertIn("habit_user_do_at_id_idx", plan)
+        self.assertRegex(plan, r"Index Cond: .*user_id = .*do_at >= .*do_at < ")
+
+    def test_public_enjoyable_plan(self):
+        """Тестирует ленту публичных приятных привычек по частичному индексу."""
+
+        plan = self.plan(Habit.objects.filter(is_public=True), is_enjoyable="true")
+        self.assertIn("habit_public_enjoyable_idx", plan)
+        self.assertNotIn("Sort", plan)
+
+    def test_useful_habits_plan(self):
+        """Тестирует, что рассылка напоминаний и фильтр полезных привычек
+        используют частичный индекс habit_useful_do_at_idx."""
+
+        plan = due_habits(timezone.now() + timedelta(days=3)).explain()
+        self.assertIn("habit_useful_do_at_idx", plan)
+
+        now = timezone.now()
+        plan = self.plan(
+            Habit.objects.all(),
+            is_enjoyable="false",
+            do_at_after=now.isoformat(),
+            do_at_before=(now + timedelta(hours=1)).isoformat(),
+        )
+        self.assertIn("habit_useful_do_at_idx", plan)
+
+
+class StreamLoaddataTestCase(TestCase):
+    """Класс для тестирования потоковой загрузки фикстур."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, objects):
+        path = os.path.join(self.directory.name, f"fixture_{len(objects)}.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(objects, file, ensure_ascii=False, indent=2)
+        return path
+
+    def habit(self, pk, user, related_habit=None, **fields):
+        return {
+            "model": "habits.habit",
+            "pk": pk,
+            "fields": {
+                "user": user,
+                "place": "дома",
+                "do_at": "2024-10-05T07:00:00Z",
+                "action": f"отжиматься {pk}",
+                "is_enjoyable": related_habit is None,
+                "related_habit": related_habit,
+                "duration": 60,
+                **fields,
+            },
+        }
+
+    def test_load_repository_fixtures(self):
+        """Тестирование загрузки фикстур из репозитория."""
+
+        stdout = StringIO()
+        call_command("stream_loaddata", "users.json", "habits.json", stdout=stdout)
+
+        self.assertIn("habits.Habit: 6", stdout.getvalue())
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Habit.objects.get(pk=3).related_habit_id, 2)
+
+    def test_loaddata_repository_fixtures(self):
+        """Тестирование загрузки фикстур из репозитория командой loaddata."""
+
+        call_command("loaddata", "users.json", "habits.json", verbosity=0)
+
+        self.assertEqual(Habit.objects.count(), 6)
+
+    def test_forward_reference_and_sequences(self):
+        """Тестирование ссылки на привычку, которая идет в файле позже."""
+
+        path = self.write(
+            [
+                {"model": "users.user", "pk": 10, "fields": {"email": "u@email.com"}},
+                self.habit(20, 10, related_habit=30),
+                self.habit(25, 10, updated_at="2024-10-06T07:00:00Z"),
+                self.habit(30, 10),
+            ]
+        )
+
+        call_command("stream_loaddata", path, "--batch-size", "1", stdout=StringIO())
+
+        self.assertEqual(Habit.objects.get(pk=20).related_habit_id, 30)
+        # Значение из фикстуры сохраняется как есть, отсутствующее заполняется
+        self.assertEqual(
+            Habit.objects.get(pk=25).updated_at.isoformat(), "2024-10-06T07:00:00+00:00"
+        )
+        self.assertIsNotNone(Habit.objects.get(pk=30).updated_at)
+        self.assertEqual(User.objects.create(email="new@email.com").pk, 11)
+        habit = Habit.objects.create(
+            user_id=10, place="дома", do_at=timezone.now(), action="a", duration=60
+        )
+        self.assertEqual(habit.pk, 31)
+
+    def test_overwrite_existing(self):
+        """Тестирование перезаписи существующих объектов, как в loaddata."""
+
+        user = User.objects.create(email="u@email.com")
+        path = self.write([self.habit(1, user.pk, place="в парке")])
+        call_command("stream_loaddata", path, stdout=StringIO())
+        path = self.write([self.habit(1, user.pk), self.habit(2, user.pk)])
+        call_command("stream_loaddata", path, stdout=StringIO())
+
+        self.assertEqual(Habit.objects.get(pk=1).place, "дома")
+        self.assertEqual(Habit.objects.count(), 2)
+
+    def test_invalid_json(self):
+        """Тестирование некорректного файла фикстуры."""
+
+        path = os.path.join(self.directory.name, "broken.json")
+        with open(path, "w") as file:
+            file.write('[{"model": "users.user", "pk": 1, "fields": {')
+        with self.assertRaises(CommandError):
+            call_command("stream_loaddata", path, stdout=StringIO())
+
+    def test_iter_json_array(self):
+        """Тестирование разбора массива, объекты которого не помещаются в буфер."""
+
+        objects = [{"a": [1, 2], "b": "]}, ["}, {}]
+        items = iter_json_array(StringIO(json.dumps(objects, indent=1)), read_size=3)
+        self.assertEqual(list(items), objects)
+
+
+class HabitExportTestCase(APITestCase):
+    """Класс для тестирования потоковой выгрузки привычек."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com")
+        self.other_user = User.objects.create(email="other@email.com")
+        start = timezone.now()
+        self.habits = [
+            Habit.objects.create(
+                user=self.user,
+                place="дома",
+                do_at=start + timedelta(minutes=i % 3),
+                action=f"отжиматься {i}",
+                reward="съесть конфетку" if i % 2 else None,
+                duration=60,
+            )
+            for i in range(7)
+        ]
+        self.other_habit = Habit.objects.create(
+            user=self.other_user,
+            place="дома",
+            do_at=start,
+            action="бегать",
+            duration=60,
+            is_enjoyable=True,
+        )
+        # Порядок выгрузки — (do_at, id)
+        self.habits.sort(key=lambda habit: (habit.do_at, habit.pk))
+        self.url = reverse("habits:habit-export")
+        self.client.force_authenticate(user=self.user)
+
+    def export(self, headers=None, **params):
+        with mock.patch("habits.export.settings.HABIT_EXPORT_CHUNK_SIZE", 3):
+            response = self.client.get(self.url, params, **(headers or {}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_export_ndjson(self):
+        """Тестирование выгрузки в NDJSON (формат по умолчанию)."""
+
+        response, content = self.export()
+
+        self.assertEqual(
+            response["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual([row["id"] for row in rows], [h.pk for h in self.habits])
+        self.assertEqual(
+            rows[0],
+            HabitSerializer(self.habits[0]).data | {"do_at": rows[0]["do_at"]},
+        )
+
+    def test_export_csv(self):
+        """Тестирование выгрузки в CSV."""
+
+        response, content = self.export(format="csv")
+
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.DictReader(StringIO(content.decode())))
+        self.assertEqual([int(row["id"]) for row in rows], [h.pk for h in self.habits])
+        self.assertEqual(rows[0]["is_enjoyable"], "false")
+        self.assertEqual(rows[0]["related_habit"], "")
+
+    def test_export_large(self):
+        """Тестирование выгрузки больше WRITE_SIZE, когда последняя пачка неполная."""
+
+        start = timezone.now()
+        Habit.objects.bulk_create(
+            Habit(
+                user=self.user,
+                place="дома",
+                do_at=start + timedelta(minutes=i),
+                action=f"отжиматься {i}",
+                duration=60,
+            )
+            for i in range(493)
+        )
+
+        response = self.client.get(self.url)
+        content = b"".join(response.streaming_content)
+
+        self.assertGreater(len(content), export.WRITE_SIZE)
+        self.assertNotEqual(500 % settings.HABIT_EXPORT_CHUNK_SIZE, 0)
+        self.assertEqual(len(content.splitlines()), 500)
+
+    def test_export_gzip(self):
+        """Тестирование сжатия выгрузки."""
+
+        response, content = self.export(headers={"HTTP_ACCEPT_ENCODING": "gzip, br"})
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(len(gzip.decompress(content).splitlines()), len(self.habits))
+
+    def test_export_resume(self):
+        """Тестирование продолжения выгрузки с последней полученной привычки."""
+
+        last = self.habits[2]
+        _, content = self.export(
+            after_do_at=last.do_at.isoformat(), after_id=last.pk, is_enjoyable="false"
+        )
+
+        ids = [json.loads(line)["id"] for line in content.decode().splitlines()]
+        self.assertEqual(ids, [habit.pk for habit in self.habits[3:]])
+
+    def test_export_invalid_position(self):
+        """Тестирование ошибки при неполной позиции."""
+
+        response = self.client.get(self.url, {"after_id": 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # Ошибка отдается одним объектом JSON
+        self.assertIn("non_field_errors", json.loads(response.content))
+
+    def test_export_staff(self):
+        """Тестирование выгрузки всех привычек администратором."""
+
+        self.client.force_authenticate(
+            user=User.objects.create(email="a@email.com", is_staff=True)
+        )
+        _, content = self.export(format="ndjson")
+
+        self.assertEqual(len(content.splitlines()), len(self.habits) + 1)
+
+    def test_export_anonymous(self):
+        """Тестирование выгрузки без авторизации."""
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_export_asgi(self):
+        """Тестирование асинхронного потока под ASGI."""
+
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        with warnings.catch_warnings():
+            # Поток неподходящего типа Django собрал бы в память с предупреждением
+            warnings.filterwarnings("error", message="StreamingHttpResponse")
+            response = await self.async_client.get(
+                self.url, {"format": "csv"}, headers=headers
+            )
+            self.assertTrue(response.is_async)
+            content = b"".join([part async for part in response.streaming_content])
+
+        self.assertEqual(len(content.splitlines()), len(self.habits) + 1)
+
+
+class HabitCompletionTestCase(APITestCase):
+    """Класс для тестирования отметок о выполнении и статистики привычек."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com")
+        self.other_user = User.objects.create(email="other@email.com")
+        self.today = timezone.localdate()
+        # Рассылка уже перенесла время выполнения на завтра
+        self.habit = self.create_habit(do_at=self.occurrence(-1))
+        self.client.force_authenticate(user=self.user)
+
+    def create_habit(self, user=None, periodicity=1, do_at=None):
+        return Habit.objects.create(
+            user=user or self.user,
+            place="дома",
+            do_at=do_at or self.occurrence(0),
+            action="отжиматься",
+            periodicity=periodicity,
+            duration=60,
+        )
+
+    def occurrence(self, days_ago, day=None):
+        """Время выполнения в 07:00 по местному времени days_ago дней назад."""
+
+        day = (day or self.today) - timedelta(days=days_ago)
+        return timezone.make_aware(datetime.combine(day, time(7)))
+
+    def complete(self, habit, *days_ago):
+        for days in days_ago:
+            completions.complete(habit, self.occurrence(days))
+
+    def test_complete_default_occurrence(self):
+        """Тестирование отметки ближайшего по расписанию времени выполнения."""
+
+        url = reverse("habits:habit-complete", args=(self.habit.pk,))
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            datetime.fromisoformat(response.json()["occurrence"]), self.occurrence(0)
+        )
+
+        # Повторная отметка возвращает существующую
+        repeated = self.client.post(url)
+        self.assertEqual(repeated.status_code, status.HTTP_200_OK)
+        self.assertEqual(repeated.json()["id"], response.json()["id"])
+        self.assertEqual(HabitCompletion.objects.count(), 1)
+        self.assertEqual(HabitDailyStat.objects.get(habit=self.habit).completions, 1)
+
+    def test_complete_future_day(self):
+        """Тестирование отметки выполнения в будущий день."""
+
+        response = self.client.post(
+            reverse("habits:habit-complete", args=(self.habit.pk,)),
+            {"occurrence": self.occurrence(-1).isoformat()},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("occurrence", response.json())
+
+    def test_streaks(self):
+        """Тестирование серий, в том числе отметки задним числом."""
+
+        self.complete(self.habit, 5, 4, 3, 1, 0)
+        streak = HabitStreak.objects.get(habit=self.habit)
+        self.assertEqual((streak.current, streak.longest), (2, 3))
+
+        # Пропущенный день заполнен: серия пересчитывается по дням
+        self.complete(self.habit, 2)
+        response = self.client.get(reverse("habits:habit-stats", args=(self.habit.pk,)))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["current_streak"], 6)
+        self.assertEqual(response.json()["longest_streak"], 6)
+        self.assertEqual(response.json()["last_completed_on"], self.today.isoformat())
+
+    def test_streak_periodicity(self):
+        """Тестирование серии привычки, которая выполняется раз в несколько дней."""
+
+        habit = self.create_habit(periodicity=2)
+        self.complete(habit, 8, 4, 2)
+
+        stats = completions.habit_stats(habit, weeks=1)
+        self.assertEqual((stats["current_streak"], stats["longest_streak"]), (2, 2))
+        # Срок следующего выполнения пропущен — серия прервана
+        stats = completions.habit_stats(
+            habit, weeks=1, today=self.today + timedelta(days=1)
+        )
+        self.assertEqual((stats["current_streak"], stats["longest_streak"]), (0, 2))
+
+    def test_weekly_adherence(self):
+        """Тестирование доли выполненных по расписанию дней по неделям."""
+
+        wednesday = date(2024, 10, 9)
+        habit = self.create_habit(do_at=self.occurrence(8, day=wednesday))
+        for day in (8, 7, 5, 1):
+            completions.complete(habit, self.occurrence(day, day=wednesday))
+
+        stats = completions.habit_stats(habit, weeks=3, today=wednesday)
+
+        self.assertEqual(
+            stats["weeks"],
+            [
+                # Недели до первой отметки не учитываются
+                {
+                    "week": date(2024, 9, 23),
+                    "completed": 0,
+                    "expected": 0,
+                    "adherence": None,
+                },
+                # С первой отметки во вторник до воскресенья
+                {
+                    "week": date(2024, 9, 30),
+                    "completed": 3,
+                    "expected": 6,
+                    "adherence": 0.5,
+                },
+                # Текущая неделя — до сегодняшнего дня
+                {
+                    "week": date(2024, 10, 7),
+                    "completed": 1,
+                    "expected": 3,
+                    "adherence": 0.33,
+                },
+            ],
+        )
+        self.assertEqual((stats["current_streak"], stats["longest_streak"]), (1, 2))
+
+    def test_user_stats(self):
+        """Тестирование статистики по всем привычкам пользователя."""
+
+        habit = self.create_habit(periodicity=2)
+        self.complete(self.habit, 2, 0)
+        self.complete(habit, 1, 0)
+        self.complete(self.create_habit(user=self.other_user), 3)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("habits:habit-user-stats"), {"weeks": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual((data["current_streak"], data["longest_streak"]), (3, 3))
+        # Отметки последних трех дней попадают в текущую или прошлую неделю
+        self.assertEqual(sum(week["completed"] for week in data["weeks"]), 4)
+        self.assertGreaterEqual(sum(week["expected"] for week in data["weeks"]), 4)
+
+    def test_invalid_weeks(self):
+        """Тестирование некорректного количества недель."""
+
+        response = self.client.get(reverse("habits:habit-user-stats"), {"weeks": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_user_habit(self):
+        """Тестирование отметки и статистики чужой привычки."""
+
+        self.client.force_authenticate(user=self.other_user)
+        for url in (
+            reverse("habits:habit-complete", args=(self.habit.pk,)),
+            reverse("habits:habit-stats", args=(self.habit.pk,)),
+        ):
+            response = self.client.generic(
+                "POST" if url.endswith("complete/") else "GET", url
+            )
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(HabitCompletion.objects.exists())
+
+
+class HabitCalendarTestCase(APITestCase):
+    """Класс для тестирования календаря привычек."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.user = User.objects.create(email="user@email.com")
+        self.other_user = User.objects.create(email="other@email.com")
+        self.habits = [
+            self.create_habit("2024-10-05T07:00:00+03:00", 1),
+            self.create_habit("2024-10-05T07:00:00.250000+03:00", 3),
+            self.create_habit("2024-10-20T21:30:00+03:00", 7),
+        ]
+        self.other_habit = self.create_habit(
+            "2024-10-05T07:00:00+03:00", 2, user=self.other_user
+        )
+        self.url = reverse("habits:habit-calendar")
+        self.client.force_authenticate(user=self.user)
+
+    def create_habit(self, do_at, periodicity, user=None):
+        return Habit.objects.create(
+            user=user or self.user,
+            place="дома",
+            do_at=do_at,
+            action="отжиматься",
+            periodicity=periodicity,
+            duration=60,
+        )
+
+    def expected(self, habits, start, end):
+        """Времена выполнения, посчитанные циклом по дням."""
+
+        zone = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime.combine(start, time.min), zone)
+        end = timezone.make_aware(datetime.combine(end, time.min), zone)
+        lines = []
+        for habit in sorted(habits, key=lambda habit: habit.pk):
+            do_at = Habit.objects.get(pk=habit.pk).do_at
+            period = timedelta(days=habit.periodicity)
+            moment = do_at - period * math.ceil((do_at - start) / period)
+            times = []
+            while moment < end + timedelta(days=1):
+                if moment >= start:
+                    times.append(datetime_to_representation(moment, zone))
+                moment += period
+            if times:
+                lines.append({"habit": habit.pk, "occurrences": times})
+        return lines
+
+    def calendar(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        content = b"".join(response.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_calendar(self):
+        """Тестирование времен выполнения привычек пользователя в диапазоне."""
+
+        with mock.patch("habits.export.settings.HABIT_EXPORT_CHUNK_SIZE", 2):
+            lines = self.calendar(**{"from": "2024-10-01", "to": "2024-10-14"})
+
+        self.assertEqual(
+            lines, self.expected(self.habits, date(2024, 10, 1), date(2024, 10, 14))
+        )
+        self.assertEqual(lines[0]["occurrences"][0], "2024-10-01T07:00:00+03:00")
+        self.assertEqual(lines[1]["occurrences"][0], "2024-10-02T07:00:00.250000+03:00")
+        # Времена до do_at тоже входят в расписание
+        self.assertEqual(
+            lines[2]["occurrences"],
+            ["2024-10-06T21:30:00+03:00", "2024-10-13T21:30:00+03:00"],
+        )
+
+        # Привычки без времен выполнения в диапазоне пропускаются
+        lines = self.calendar(**{"from": "2024-10-01", "to": "2024-10-01"})
+        self.assertEqual([line["habit"] for line in lines], [self.habits[0].pk])
+
+    @override_settings(TIME_ZONE="Europe/Berlin")
+    def test_calendar_utc_offset_change(self):
+        """Тестирование перехода на зимнее время внутри диапазона."""
+
+        lines = self.calendar(**{"from": "2024-10-20", "to": "2024-11-03"})
+
+        self.assertEqual(
+            lines, self.expected(self.habits, date(2024, 10, 20), date(2024, 11, 3))
+        )
+        self.assertIn("2024-10-26T06:00:00+02:00", lines[0]["occurrences"])
+        self.assertIn("2024-10-27T05:00:00+01:00", lines[0]["occurrences"])
+
+    def test_calendar_staff(self):
+        """Тестирование календаря всех привычек для администратора."""
+
+        self.client.force_authenticate(
+            user=User.objects.create(email="admin@email.com", is_staff=True)
+        )
+        lines = self.calendar(**{"from": "2024-10-01", "to": "2024-10-31"})
+
+        self.assertEqual(
+            lines,
+            self.expected(
+                [*self.habits, self.other_habit], date(2024, 10, 1), date(2024, 10, 31)
+            ),
+        )
+
+    async def test_calendar_asgi(self):
+        """Тестирование асинхронного потока под ASGI."""
+
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        response = await self.async_client.get(
+            self.url, {"from": "2024-10-01", "to": "2024-10-14"}, headers=headers
+        )
+        self.assertTrue(response.is_async)
+        content = b"".join([part async for part in response.streaming_content])
+
+        self.assertEqual(len(content.splitlines()), len(self.habits))
+
+    async def test_calendar_large(self):
+        """Тестирование календаря больше WRITE_SIZE, когда последняя пачка неполная."""
+
+        await Habit.objects.abulk_create(
+            Habit(
+                user=self.user,
+                place="дома",
+                do_at="2024-10-05T07:00:00+03:00",
+                action="отжиматься",
+                duration=60,
+            )
+            for _ in range(147)
+        )
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        response = await self.async_client.get(
+            self.url, {"from": "2024-10-01", "to": "2024-10-31"}, headers=headers
+        )
+        content = b"".join([part async for part in response.streaming_content])
+
+        self.assertGreater(len(content), export.WRITE_SIZE)
+        self.assertEqual(len(content.splitlines()), 150)
+
+    def test_calendar_invalid_range(self):
+        """Тестирование некорректного диапазона дат."""
+
+        for params in (
+            {"from": "2024-10-01"},
+            {"from": "2024-10-10", "to": "2024-10-01"},
+            {"from": "2024-01-01", "to": "2025-12-31"},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("to", json.loads(response.content))
+
+    def test_expand(self):
+        """Тестирование векторного вычисления времен выполнения."""
+
+        day = occurrences.DAY
+        times, counts = occurrences.expand(
+            np.array([5 * day, 5 * day + 1, 30 * day, 10 * day]),
+            np.array([1, 3, 7, 0]),
+            start=2 * day,
+            end=5 * day,
+        )
+
+        # Нулевая периодичность считается ежедневной
+        self.assertEqual(counts.tolist(), [3, 1, 1, 3])
+        self.assertEqual(
+            times.tolist(),
+            [
+                2 * day,
+                3 * day,
+                4 * day,
+                2 * day + 1,
+                2 * day,
+                2 * day,
+                3 * day,
+                4 * day,
+            ],
+        )
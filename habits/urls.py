@@ -3,7 +3,7 @@ from rest_framework.routers import SimpleRouter
 
 from habits.apps import HabitsConfig
 from habits.views import (HabitViewSet, PublicHabitListAPIView,
-                          PublicHabitRetrieveAPIView)
+                          PublicHabitRetrieveAPIView, PublicHabitSearchAPIView)
 
 app_name = HabitsConfig.name
 
@@ -12,6 +12,7 @@ router.register("", HabitViewSet)
 
 urlpatterns = [
     path("public/", PublicHabitListAPIView.as_view(), name="public-list"),
+    path("public/search/", PublicHabitSearchAPIView.as_view(), name="public-search"),
     path(
         "public/<int:pk>/", PublicHabitRetrieveAPIView.as_view(), name="public-retrieve"
     ),
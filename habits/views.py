@@ -1,15 +1,100 @@
+import hashlib
+import hmac
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
 from rest_framework.viewsets import ModelViewSet
 
-from habits.models import Habit
-from habits.paginators import HabitPaginator
-from habits.serializers import HabitSerializer
+from config import settings
+from config.async_views import AsyncGenericAPIViewMixin
+from habits import (bulk, cache, completions, export, metrics, occurrences,
+                    search)
+from habits.filters import HabitFilterBackend
+from habits.models import Habit, HabitVersion, ReminderDelivery
+from habits.paginators import HabitPaginator, HabitSearchPaginator
+from habits.serializers import (HabitCompletionSerializer, HabitSerializer,
+                                HabitStatsQuerySerializer,
+                                HabitStatsSerializer, HabitValuesSerializer,
+                                ReminderDeliverySerializer)
 from users.permissions import IsCreator
 
 
+class ConditionalHabitMixin:
+    """Условные GET-запросы (If-None-Match, If-Modified-Since) к привычкам.
+
+    ETag и Last-Modified вычисляются по счетчику изменений привычек пользователя
+    HabitVersion, а не по телу ответа, поэтому ответ 304 отдается без запроса
+    списка привычек и без сериализатора."""
+
+    async def aconditional_response(self, request, view_method, *args, **kwargs):
+        version, updated_at = await HabitVersion.objects.afor_user(request.user)
+        etag, last_modified = self.validators(request, version, updated_at)
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = await view_method(request, *args, **kwargs)
+        return self.patch_validators(response, etag, last_modified)
+
+    @staticmethod
+    def validators(request, version, updated_at):
+        """ETag и Last-Modified (в секундах) по версии привычек пользователя."""
+
+        digest = hashlib.sha1(
+            "|".join(
+                (request.accepted_renderer.format, request.get_full_path())
+            ).encode()
+        ).hexdigest()[:16]
+        etag = quote_etag(f"{request.user.pk}-{version}-{digest}")
+        last_modified = int(updated_at.timestamp()) if updated_at else None
+        return etag, last_modified
+
+    @staticmethod
+    def patch_validators(response, etag, last_modified):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class HabitReadMixin:
+    """Быстрое чтение привычек без ModelSerializer (HabitValuesSerializer)."""
+
+    values_serializer = HabitValuesSerializer()
+    # Дополнительные колонки строк, не входящие в ответ
+    extra_values = ()
+
+    async def avalues_list_response(self, request, *args, **kwargs):
+        rows = self.values_serializer.values(
+            self.filter_queryset(self.get_queryset()), *self.extra_values
+        )
+        page = await self.apaginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                self.values_serializer.to_representation(page)
+            )
+        return Response(
+            self.values_serializer.to_representation([row async for row in rows])
+        )
+
+    async def avalues_retrieve_response(self, request, *args, **kwargs):
+        return Response(
+            self.values_serializer.instance_to_representation(await self.aget_object())
+        )
+
+
 @method_decorator(
     name="update",
     decorator=swagger_auto_schema(operation_description="Изменение привычки."),
@@ -18,28 +103,18 @@ from users.permissions import IsCreator
     name="destroy",
     decorator=swagger_auto_schema(operation_description="Удаление привычки."),
 )
-@method_decorator(
-    name="create",
-    decorator=swagger_auto_schema(operation_description="Создание привычки."),
-)
-@method_decorator(
-    name="retrieve",
-    decorator=swagger_auto_schema(operation_description="Информация о привычке."),
-)
-@method_decorator(
-    name="list", decorator=swagger_auto_schema(operation_description="Список привычек.")
-)
-class HabitViewSet(ModelViewSet):
-    """Вьюсет для привычек."""
+class HabitViewSet(
+    AsyncGenericAPIViewMixin, ConditionalHabitMixin, HabitReadMixin, ModelViewSet
+):
+    """Вьюсет для привычек.
+
+    Список, просмотр и создание привычки — асинхронные обработчики, остальные
+    действия выполняются в потоке (config.async_views)."""
 
     queryset = Habit.objects.all()
     serializer_class = HabitSerializer
     pagination_class = HabitPaginator
-
-    def perform_create(self, serializer):
-        habit = serializer.save()
-        habit.user = self.request.user
-        habit.save()
+    filter_backends = (HabitFilterBackend,)
 
     def get_queryset(self, *args, **kwargs):
         queryset = super().get_queryset(*args, **kwargs)
@@ -58,21 +133,297 @@ class HabitViewSet(ModelViewSet):
             )
         return super().get_permissions()
 
+    @swagger_auto_schema(operation_description="Список привычек.")
+    async def list(self, request, *args, **kwargs):
+        return await self.aconditional_response(
+            request, self.avalues_list_response, *args, **kwargs
+        )
+
+    @swagger_auto_schema(operation_description="Информация о привычке.")
+    async def retrieve(self, request, *args, **kwargs):
+        # Доступ к привычке проверяется до ответа 304
+        habit = await self.aget_object()
+
+        async def response(request):
+            return Response(self.values_serializer.instance_to_representation(habit))
+
+        return await self.aconditional_response(request, response)
+
+    @swagger_auto_schema(operation_description="Создание привычки.")
+    async def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        # Проверка связанной привычки обращается к БД
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        habit = await Habit.objects.acreate(
+            **{**serializer.validated_data, "user": request.user}
+        )
+        data = self.values_serializer.instance_to_representation(habit)
+        return Response(
+            data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(data)
+        )
+
     def partial_update(self, request, *args, **kwargs):
         """Частичное изменение привычки."""
 
         return super().partial_update(request, *args, **kwargs)
 
+    @swagger_auto_schema(
+        operation_description="Напоминания, отправленные по привычке за последние N дней.",
+        manual_parameters=[
+            openapi.Parameter(
+                "days",
+                openapi.IN_QUERY,
+                description="Количество дней (по умолчанию 7)",
+                type=openapi.TYPE_INTEGER,
+            )
+        ],
+        responses={200: ReminderDeliverySerializer(many=True)},
+    )
+    @action(detail=True, methods=["get"])
+    def reminders(self, request, pk=None):
+        """Напоминания, отправленные по привычке за последние N дней."""
+
+        try:
+            days = int(request.query_params.get("days", 7))
+        except ValueError:
+            raise ValidationError({"days": "Укажите целое количество дней."})
+        habit = self.get_object()
+        deliveries = ReminderDelivery.objects.for_habit(habit, days)
+        return Response(ReminderDeliverySerializer(deliveries, many=True).data)
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Отметка о выполнении привычки. Без occurrence отмечается ближайшее "
+            "время выполнения по расписанию, но не позже сегодняшнего дня. "
+            "Повторная отметка возвращает существующую со статусом 200."
+        ),
+        request_body=HabitCompletionSerializer,
+        responses={201: HabitCompletionSerializer, 200: HabitCompletionSerializer},
+    )
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        """Отметка о выполнении привычки."""
+
+        habit = self.get_object()
+        serializer = HabitCompletionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        occurrence = serializer.validated_data.get(
+            "occurrence"
+        ) or completions.default_occurrence(habit)
+        completion, created = completions.complete(habit, occurrence)
+        return Response(
+            HabitCompletionSerializer(completion).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Текущая и самая длинная серия выполнений привычки и доля выполненных "
+            "по расписанию дней за последние недели."
+        ),
+        query_serializer=HabitStatsQuerySerializer,
+        responses={200: HabitStatsSerializer},
+    )
+    @action(detail=True, methods=["get"])
+    def stats(self, request, pk=None):
+        """Статистика выполнения привычки."""
 
-class PublicHabitListAPIView(ListAPIView):
+        habit = self.get_object()
+        query = HabitStatsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = completions.habit_stats(habit, query.validated_data["weeks"])
+        return Response(HabitStatsSerializer(data).data)
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Серия дней, в которые выполнена хотя бы одна привычка пользователя, "
+            "и доля выполненных по расписанию дней по всем его привычкам за "
+            "последние недели."
+        ),
+        query_serializer=HabitStatsQuerySerializer,
+        responses={200: HabitStatsSerializer},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="stats",
+        url_name="user-stats",
+        pagination_class=None,
+        filter_backends=(),
+    )
+    def user_stats(self, request):
+        """Статистика выполнения всех привычек пользователя."""
+
+        query = HabitStatsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = completions.user_stats(request.user, query.validated_data["weeks"])
+        return Response(HabitStatsSerializer(data).data)
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Все времена выполнения привычек (для администратора — всех "
+            "пользователей) в диапазоне дат по местному времени, потоком NDJSON: "
+            "строка на привычку. Поддерживает те же фильтры, что и список."
+        ),
+        query_serializer=occurrences.HabitCalendarQuerySerializer,
+        responses={200: "Поток привычек с временами выполнения"},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        renderer_classes=(export.NDJSONRenderer,),
+        pagination_class=None,
+    )
+    async def calendar(self, request):
+        """Календарь привычек потоком NDJSON."""
+
+        return occurrences.calendar_response(
+            request, self.filter_queryset(self.get_queryset())
+        )
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Выгрузка всех привычек (для администратора — всех пользователей) "
+            "потоком NDJSON или CSV (Accept или ?format=ndjson|csv) в порядке "
+            "(do_at, id). Прерванную выгрузку можно продолжить с последней "
+            "полученной привычки. Поддерживает те же фильтры, что и список, и "
+            "сжатие gzip (Accept-Encoding)."
+        ),
+        query_serializer=export.HabitExportQuerySerializer,
+        responses={200: "Поток привычек"},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        renderer_classes=(export.NDJSONRenderer, export.CSVRenderer),
+        pagination_class=None,
+    )
+    async def export(self, request):
+        """Выгрузка привычек потоком NDJSON или CSV."""
+
+        # Запрос выполняется уже при чтении ответа
+        return export.export_response(
+            request, self.filter_queryset(self.get_queryset())
+        )
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Массовое создание и изменение привычек. Привычки с id изменяются, "
+            "без id — создаются. Если хотя бы одна привычка не прошла проверку, "
+            "ничего не сохраняется, ошибки возвращаются списком по порядку привычек."
+        ),
+        request_body=bulk.HabitBulkItemSerializer(many=True),
+        responses={201: HabitSerializer(many=True)},
+    )
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Массовое создание и изменение привычек."""
+
+        prepared = bulk.prepare(request.data, request.user)
+        habits = bulk.save(prepared)
+        created = any(is_created for habit, is_created in prepared)
+        return Response(
+            [self.values_serializer.instance_to_representation(h) for h in habits],
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+class PublicHabitCacheMixin:
+    """Отдает ответы ленты публичных привычек из кэша (habits.cache).
+
+    Ключ — полный адрес запроса, так как от него зависят страница и ссылки
+    next/previous. Ошибки (например, 404) не кэшируются."""
+
+    async def acached_response(self, request, view_method, *args, **kwargs):
+        if not cache.is_enabled():
+            return await view_method(request, *args, **kwargs)
+
+        async def compute():
+            return (await view_method(request, *args, **kwargs)).data
+
+        data = await cache.aget_or_set(request.build_absolute_uri(), compute)
+        return Response(data)
+
+
+class PublicHabitListAPIView(
+    AsyncGenericAPIViewMixin, PublicHabitCacheMixin, HabitReadMixin, ListAPIView
+):
     """Список публичных привычек."""
 
     queryset = Habit.objects.filter(is_public=True)
     serializer_class = HabitSerializer
+    pagination_class = HabitPaginator
+    filter_backends = (HabitFilterBackend,)
+
+    async def get(self, request, *args, **kwargs):
+        return await self.acached_response(
+            request, self.avalues_list_response, *args, **kwargs
+        )
 
 
-class PublicHabitRetrieveAPIView(RetrieveAPIView):
+class PublicHabitRetrieveAPIView(
+    AsyncGenericAPIViewMixin, PublicHabitCacheMixin, HabitReadMixin, RetrieveAPIView
+):
     """Информация о публичной привычке."""
 
     queryset = Habit.objects.filter(is_public=True)
     serializer_class = HabitSerializer
+
+    async def get(self, request, *args, **kwargs):
+        return await self.acached_response(
+            request, self.avalues_retrieve_response, *args, **kwargs
+        )
+
+
+class PublicHabitSearchAPIView(
+    AsyncGenericAPIViewMixin, PublicHabitCacheMixin, HabitReadMixin, ListAPIView
+):
+    """Поиск публичных привычек по действию и месту (habits.search)."""
+
+    queryset = Habit.objects.filter(is_public=True)
+    serializer_class = HabitSerializer
+    pagination_class = HabitSearchPaginator
+    extra_values = ("rank",)
+
+    def get_queryset(self):
+        return search.search(super().get_queryset(), self.request.query_params.get("q"))
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Поиск публичных привычек по действию и месту. Привычки упорядочены "
+            "по релевантности, слова запроса ищутся и как начала слов."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                "q",
+                openapi.IN_QUERY,
+                description="Поисковый запрос",
+                type=openapi.TYPE_STRING,
+                required=True,
+            )
+        ],
+    )
+    async def get(self, request, *args, **kwargs):
+        return await self.acached_response(
+            request, self.avalues_list_response, *args, **kwargs
+        )
+
+
+def metrics_view(request):
+    """Метрики рассылки напоминаний в формате Prometheus.
+
+    Доступны с заголовком Authorization: Bearer <METRICS_TOKEN>; если токен не
+    задан, метрики не отдаются."""
+
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), expected.encode()
+    ):
+        response = HttpResponse(status=401)
+        response["WWW-Authenticate"] = "Bearer"
+        return response
+
+    data, content_type = metrics.render()
+    return HttpResponse(data, content_type=content_type)
@@ -0,0 +1,31 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from users import cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """Аутентификация по JWT с пользователем из кэша users.cache.
+
+    Версия токена — хэш пароля из claim hash_password: после смены пароля
+    старые токены не находят пользователя в кэше и отклоняются проверкой
+    JWTAuthentication. Пользователь попадает в кэш только после этой проверки,
+    поэтому для пользователя из кэша версия уже сверена с паролем."""
+
+    def get_user(self, validated_token):
+        version = validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if not cache.is_enabled() or version is None or user_id is None:
+            return super().get_user(validated_token)
+
+        user = cache.get(user_id, version)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(user, version)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,109 @@
+"""Кэш пользователей для аутентификации по JWT (users.authentication).
+
+Два уровня: LRU в памяти процесса с коротким сроком хранения
+USER_CACHE_LOCAL_TTL и Redis (users:auth:<id>), общий для всех процессов.
+Запись содержит версию токена — хэш пароля, который токен несет в claim
+hash_password, — и читается только токеном той же версии. Сам хэш пароля в
+кэше не хранится: у пользователя из Redis поле password отложено и читается из
+БД при обращении. Сигналы модели User
+удаляют запись из Redis и из памяти своего процесса; другие процессы могут
+отдавать прежнего пользователя до истечения USER_CACHE_LOCAL_TTL.
+Кэш включается настройкой USER_CACHE_ENABLED.
+"""
+
+import json
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS
+
+from config import settings
+from config.lru import LRUCache
+from config.redis_client import get_redis
+from users.models import User
+
+KEY_PREFIX = "users:auth"
+
+# Поля, которые не записываются в Redis
+EXCLUDED_FIELDS = ("password",)
+
+_local = LRUCache(settings.USER_CACHE_LOCAL_SIZE)
+
+
+def is_enabled():
+    return settings.USER_CACHE_ENABLED
+
+
+def redis_key(user_id):
+    return f"{KEY_PREFIX}:{user_id}"
+
+
+def dump(user):
+    """Значения полей пользователя, сериализуемые в JSON (без pickle)."""
+
+    return {
+        field.attname: field.get_prep_value(field.value_from_object(user))
+        for field in _fields()
+    }
+
+
+def load(data):
+    """Пользователь из значений полей, как если бы он был загружен из БД без
+    полей EXCLUDED_FIELDS (они отложены)."""
+
+    fields = _fields()
+    return User.from_db(
+        DEFAULT_DB_ALIAS,
+        [field.attname for field in fields],
+        [field.to_python(data[field.attname]) for field in fields],
+    )
+
+
+def _fields():
+    return [
+        field
+        for field in User._meta.concrete_fields
+        if field.name not in EXCLUDED_FIELDS
+    ]
+
+
+def _set_local(user_id, version, user):
+    expires_at = time.monotonic() + settings.USER_CACHE_LOCAL_TTL
+    _local.set(user_id, (expires_at, version, user))
+
+
+def get(user_id, version):
+    """Пользователь из кэша, если он сохранен для токена версии version."""
+
+    entry = _local.get(user_id)
+    if entry is not None:
+        expires_at, cached_version, user = entry
+        if expires_at > time.monotonic() and cached_version == version:
+            return user
+
+    raw = get_redis().get(redis_key(user_id))
+    if raw is None:
+        return None
+    data = json.loads(raw)
+    if data["version"] != version:
+        return None
+    user = load(data["user"])
+    _set_local(user_id, version, user)
+    return user
+
+
+def set(user, version):
+    data = {"version": version, "user": dump(user)}
+    get_redis().set(
+        redis_key(user.pk),
+        json.dumps(data, cls=DjangoJSONEncoder),
+        ex=settings.USER_CACHE_TTL,
+    )
+    _set_local(user.pk, version, user)
+
+
+def invalidate(user_id):
+    """Удаляет пользователя из Redis и из памяти текущего процесса."""
+
+    get_redis().delete(redis_key(user_id))
+    _local.pop(user_id)
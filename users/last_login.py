@@ -0,0 +1,98 @@
+"""Отложенная запись времени последнего входа (User.last_login).
+
+Вход через users/login/ не обновляет таблицу пользователей: время входа
+записывается в hash Redis users:last_login (id пользователя -> секунды Unix),
+а задача users.tasks.flush_last_login раз в LAST_LOGIN_FLUSH_INTERVAL секунд
+переносит накопленное в БД одним UPDATE ... FROM unnest(...). На это время
+last_login в БД может отставать. Буфер включается настройкой
+LAST_LOGIN_BUFFER_ENABLED, без нее last_login обновляется сразу при входе.
+"""
+
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth.models import update_last_login
+from django.db import connection
+from django.utils import timezone
+
+from config import settings
+from config.redis_client import get_redis
+from users.models import User
+
+KEY = "users:last_login"
+
+
+def is_enabled():
+    return settings.LAST_LOGIN_BUFFER_ENABLED
+
+
+def record(user):
+    """Запоминает время входа пользователя."""
+
+    if not is_enabled():
+        update_last_login(None, user)
+        return
+    user.last_login = timezone.now()
+    get_redis().hset(KEY, user.pk, user.last_login.timestamp())
+
+
+def take():
+    """Забирает накопленное время входа из Redis: {id пользователя: секунды Unix}.
+
+    HGETALL и DEL выполняются в одной транзакции Redis, поэтому входы,
+    записанные во время переноса, попадут в следующий."""
+
+    pipeline = get_redis().pipeline()
+    pipeline.hgetall(KEY)
+    pipeline.delete(KEY)
+    logins, _ = pipeline.execute()
+    return {int(user_id): float(timestamp) for user_id, timestamp in logins.items()}
+
+
+def restore(logins):
+    """Возвращает время входа в буфер, не перезаписывая более поздние входы."""
+
+    pipeline = get_redis().pipeline(transaction=False)
+    for user_id, timestamp in logins.items():
+        pipeline.hsetnx(KEY, user_id, timestamp)
+    pipeline.execute()
+
+
+def save(logins):
+    """Записывает время входа в БД одним UPDATE; возвращает число строк.
+
+    Строки обновляются в порядке id, чтобы параллельные переносы не
+    взаимоблокировались, и last_login не сдвигается назад."""
+
+    user_ids = sorted(logins)
+    last_logins = [
+        datetime.fromtimestamp(logins[user_id], tz=dt_timezone.utc)
+        for user_id in user_ids
+    ]
+    table = User._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} SET last_login = rows.last_login
+            FROM unnest(%s::bigint[], %s::timestamptz[]) AS rows (id, last_login)
+            WHERE {table}.id = rows.id
+                AND ({table}.last_login IS NULL OR {table}.last_login < rows.last_login)
+            """,
+            [user_ids, last_logins],
+        )
+        return cursor.rowcount
+
+
+def flush():
+    """Переносит накопленное время входа в БД; возвращает число обновленных строк.
+
+    Если запись в БД не удалась, время входа возвращается в буфер."""
+
+    logins = take()
+    if not logins:
+        return 0
+    try:
+        return save(logins)
+    except Exception:
+        restore(logins)
+        raise
@@ -0,0 +1,85 @@
+import csv
+import os
+import sys
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+
+from users import provisioning
+
+
+class Command(BaseCommand):
+    help = "Создает пользователей из файла CSV или JSONL (по одному на строку)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу или - для стандартного ввода.")
+        parser.add_argument(
+            "--format",
+            choices=provisioning.FORMATS,
+            default=None,
+            help="Формат файла (по умолчанию по расширению).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Количество строк, фиксируемых одной транзакцией.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество пользователей в одном INSERT.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Количество процессов для хэширования паролей.",
+        )
+        parser.add_argument(
+            "--report",
+            default=None,
+            help="CSV-файл для пропущенных строк (дубликаты и ошибки).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or Path(path).suffix.lstrip(".").lower()
+        if file_format not in provisioning.FORMATS:
+            raise CommandError("Укажите формат файла: --format csv или jsonl.")
+        if options["chunk_size"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--chunk-size и --batch-size должны быть больше 0.")
+
+        with ExitStack() as stack:
+            if path == "-":
+                input_file = sys.stdin
+            else:
+                input_file = stack.enter_context(
+                    open(path, newline="", encoding="utf-8")
+                )
+            report = None
+            if options["report"]:
+                report = csv.writer(
+                    stack.enter_context(open(options["report"], "w", newline=""))
+                )
+                report.writerow(["line", "email", "reason", "errors"])
+
+            def on_rejected(line_number, email, reason, messages):
+                report.writerow([line_number, email, reason, " ".join(messages)])
+
+            stats = provisioning.import_users(
+                input_file,
+                file_format,
+                chunk_size=options["chunk_size"],
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+                on_rejected=on_rejected if report else None,
+            )
+
+        self.stdout.write(
+            f"Создано пользователей: {stats[provisioning.CREATED]}, "
+            f"дубликатов: {stats[provisioning.DUPLICATE]}, "
+            f"ошибок: {stats[provisioning.INVALID]}"
+        )
@@ -5,6 +5,6 @@ class IsCreator(BasePermission):
     """Проверяет, является ли пользователь создателем привычки."""
 
     def has_object_permission(self, request, view, obj):
-        if request.user == obj.user:
+        if request.user.pk == obj.user_id:
             return True
         return False
@@ -0,0 +1,168 @@
+"""Массовое создание пользователей из файла CSV или JSONL (команда import_users).
+
+Файл читается потоково и обрабатывается частями по chunk_size строк: пароли
+части хэшируются в пуле процессов (PBKDF2 нагружает процессор, и потоки из-за
+GIL его не ускоряют), пользователи создаются через bulk_create, и каждая часть
+фиксируется своей транзакцией. В памяти находится только текущая часть,
+поэтому размер файла не ограничен. Строки с почтой, которая уже есть в БД или
+встретилась раньше в файле, пропускаются как дубликаты.
+"""
+
+import csv
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from users.models import User
+
+# Поля пользователя, которые можно указать в файле, кроме пароля
+FIELDS = ("email", "first_name", "last_name", "phone_number", "city", "tg_chat_id")
+
+FORMATS = ("csv", "jsonl")
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+
+
+def read_rows(file, file_format):
+    """Строки файла: (номер строки, словарь полей или None, если строку не разобрать)."""
+
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def clean_row(row):
+    """Поля пользователя и пароль из строки файла; выбрасывает ValidationError.
+
+    Пароль может отсутствовать: тогда пользователь создается без возможности
+    входа по паролю."""
+
+    if row is None:
+        raise ValidationError("Строка должна быть объектом JSON.")
+    data = {}
+    for name in FIELDS:
+        field = User._meta.get_field(name)
+        value = row.get(name)
+        value = "" if value is None else str(value).strip()
+        if not value and field.null:
+            value = None
+        data[name] = field.clean(value, None)
+    data["email"] = User.objects.normalize_email(data["email"])
+    password = row.get("password")
+    return data, str(password) if password else None
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@contextmanager
+def password_hasher(workers):
+    """Функция, хэширующая список паролей в workers процессах.
+
+    Процессы настраивают Django сами, чтобы пул работал и при запуске через
+    spawn."""
+
+    if workers <= 1:
+        yield lambda passwords: [make_password(password) for password in passwords]
+        return
+    with ProcessPoolExecutor(workers, initializer=django.setup) as executor:
+        yield lambda passwords: list(
+            executor.map(
+                make_password,
+                passwords,
+                chunksize=max(1, len(passwords) // (workers * 4)),
+            )
+        )
+
+
+def import_chunk(rows, hash_passwords, batch_size, on_rejected):
+    """Создает пользователей из части файла; возвращает Counter по результатам."""
+
+    stats = Counter()
+    candidates = {}
+    for line_number, row in rows:
+        try:
+            data, password = clean_row(row)
+        except ValidationError as error:
+            stats[INVALID] += 1
+            on_rejected(line_number, (row or {}).get("email"), INVALID, error.messages)
+            continue
+        if data["email"] in candidates:
+            stats[DUPLICATE] += 1
+            on_rejected(line_number, data["email"], DUPLICATE, [])
+            continue
+        candidates[data["email"]] = (line_number, data, password)
+
+    existing = set(
+        User.objects.filter(email__in=candidates).values_list("email", flat=True)
+    )
+    for email in existing:
+        line_number, _, _ = candidates.pop(email)
+        stats[DUPLICATE] += 1
+        on_rejected(line_number, email, DUPLICATE, [])
+
+    # Пароли хэшируются вне транзакции, чтобы не держать ее открытой
+    candidates = list(candidates.values())
+    passwords = hash_passwords([password for _, _, password in candidates])
+    users = [
+        User(**data, password=password)
+        for (_, data, _), password in zip(candidates, passwords)
+    ]
+    # Почта, добавленная параллельно после проверки, не прерывает импорт, а
+    # строка с ней считается дубликатом. Вставленные этой частью строки
+    # узнаются по хэшу пароля: в нем случайная соль, в том числе у пароля,
+    # непригодного для входа
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=batch_size, ignore_conflicts=True)
+        inserted = set(
+            User.objects.filter(email__in=[user.email for user in users]).values_list(
+                "email", "password"
+            )
+        )
+    for (line_number, _, _), user in zip(candidates, users):
+        if (user.email, user.password) in inserted:
+            stats[CREATED] += 1
+        else:
+            stats[DUPLICATE] += 1
+            on_rejected(line_number, user.email, DUPLICATE, [])
+    return stats
+
+
+def import_users(
+    file, file_format, chunk_size=5000, batch_size=1000, workers=1, on_rejected=None
+):
+    """Создает пользователей из файла; возвращает Counter: created, duplicate,
+    invalid.
+
+    on_rejected(номер строки, почта, причина, сообщения) вызывается для каждой
+    пропущенной строки."""
+
+    on_rejected = on_rejected or (lambda *args: None)
+    stats = Counter()
+    with password_hasher(workers) as hash_passwords:
+        for rows in chunks(read_rows(file, file_format), chunk_size):
+            stats += import_chunk(rows, hash_passwords, batch_size, on_rejected)
+    return stats
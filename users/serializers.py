@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from users import last_login
 from users.models import User
 
 
@@ -7,3 +9,12 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = "__all__"
+
+
+class LoginSerializer(TokenObtainPairSerializer):
+    """Получение пары токенов; время входа записывается через users.last_login."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        last_login.record(self.user)
+        return data
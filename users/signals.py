@@ -0,0 +1,21 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users import cache
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Удаляет пользователя из кэша аутентификации после изменения или удаления.
+
+    Повторно — после коммита, чтобы не осталась копия, прочитанная параллельным
+    запросом до коммита."""
+
+    if cache.is_enabled():
+        cache.invalidate(instance.pk)
+        transaction.on_commit(partial(cache.invalidate, instance.pk))
@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from users import last_login
+
+
+@shared_task
+def flush_last_login():
+    """Переносит время входа пользователей из буфера Redis в БД."""
+
+    if not last_login.is_enabled():
+        return 0
+    return last_login.flush()
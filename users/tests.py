@@ -1,7 +1,25 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+import fakeredis
+from django.contrib.auth.hashers import make_password
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
+from config.lru import LRUCache
+from users import cache, last_login, provisioning, tasks
 from users.models import User
 
 
@@ -17,3 +35,317 @@ class UserTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(User.objects.all().count(), 1)
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    """Класс для тестирования кэша пользователей при аутентификации по JWT."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.redis = fakeredis.FakeRedis()
+        for patcher in (
+            mock.patch("users.cache.get_redis", return_value=self.redis),
+            mock.patch("users.cache.settings.USER_CACHE_ENABLED", True),
+            mock.patch.object(cache, "_local", LRUCache(100)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create(email="user@email.com")
+        self.user.set_password("123456")
+        self.user.save()
+        self.url = reverse("habits:habit-list")
+        self.authorize(self.user)
+
+    def authorize(self, user):
+        token = AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_cached_user(self):
+        """Тестирование чтения пользователя из кэша."""
+
+        first = self.count_queries()
+        self.assertEqual(self.count_queries(), first - 1)
+
+        # Из Redis, когда в памяти процесса пользователя нет
+        cache._local.clear()
+        self.assertEqual(self.count_queries(), first - 1)
+        self.assertEqual(cache.get(self.user.pk, "другая версия"), None)
+
+    def test_password_not_cached(self):
+        """Тестирование того, что хэш пароля не записывается в Redis."""
+
+        self.count_queries()
+
+        data = json.loads(self.redis.get(cache.redis_key(self.user.pk)))
+        self.assertNotIn("password", data["user"])
+        cache._local.clear()
+        version = AccessToken.for_user(self.user)["hash_password"]
+        user = cache.get(self.user.pk, version)
+        self.assertEqual(user.get_deferred_fields(), {"password"})
+        self.assertTrue(user.check_password("123456"))
+
+    def test_password_change(self):
+        """Тестирование отзыва токена после смены пароля."""
+
+        self.count_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("654321")
+            self.user.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.authorize(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_version_mismatch(self):
+        """Тестирование промаха кэша для токена другой версии."""
+
+        self.count_queries()
+        # update() не вызывает сигналов, и запись в кэше остается прежней
+        User.objects.filter(pk=self.user.pk).update(password="изменен")
+        self.user.refresh_from_db()
+        self.authorize(self.user)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        version = AccessToken.for_user(self.user)["hash_password"]
+        self.assertEqual(cache.get(self.user.pk, version).password, "изменен")
+
+    def test_deactivate_user(self):
+        """Тестирование сброса кэша после деактивации пользователя."""
+
+        self.count_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_delete_user(self):
+        """Тестирование сброса кэша после удаления пользователя."""
+
+        self.count_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        self.assertEqual(self.redis.exists(cache.redis_key(self.user.pk)), 0)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_disabled(self):
+        """Тестирование аутентификации без кэша."""
+
+        with mock.patch("users.cache.settings.USER_CACHE_ENABLED", False):
+            first = self.count_queries()
+            self.assertEqual(self.count_queries(), first)
+        self.assertEqual(self.redis.keys(), [])
+
+
+class LastLoginTestCase(APITestCase):
+    """Класс для тестирования отложенной записи времени входа."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        self.redis = fakeredis.FakeRedis()
+        for patcher in (
+            mock.patch("users.last_login.get_redis", return_value=self.redis),
+            mock.patch("users.last_login.settings.LAST_LOGIN_BUFFER_ENABLED", True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create(email="user@email.com")
+        self.user.set_password("123456")
+        self.user.save()
+        self.url = reverse("users:login")
+
+    def login(self):
+        data = {"email": "user@email.com", "password": "123456"}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [query["sql"] for query in queries]
+
+    def test_login_buffered(self):
+        """Тестирование входа без записи в таблицу пользователей."""
+
+        queries = self.login()
+
+        self.assertFalse(any(query.startswith("UPDATE") for query in queries))
+        self.assertEqual(self.redis.hlen(last_login.KEY), 1)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+    def test_flush(self):
+        """Тестирование переноса времени входа в БД одним запросом."""
+
+        users = [self.user] + [
+            User.objects.create(email=f"user_{i}@email.com") for i in range(3)
+        ]
+        for user in users:
+            last_login.record(user)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(tasks.flush_last_login(), 4)
+
+        self.assertEqual(self.redis.exists(last_login.KEY), 0)
+        for user in users:
+            stored = User.objects.get(pk=user.pk).last_login
+            self.assertAlmostEqual(
+                stored.timestamp(), user.last_login.timestamp(), places=3
+            )
+
+    def test_flush_keeps_latest(self):
+        """Тестирование того, что перенос не сдвигает last_login назад."""
+
+        latest = timezone.now()
+        User.objects.filter(pk=self.user.pk).update(last_login=latest)
+        self.redis.hset(
+            last_login.KEY, self.user.pk, (latest - timedelta(minutes=1)).timestamp()
+        )
+
+        self.assertEqual(last_login.flush(), 0)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, latest)
+
+    def test_flush_failure(self):
+        """Тестирование возврата времени входа в буфер при ошибке БД."""
+
+        last_login.record(self.user)
+        newer = timezone.now().timestamp() + 60
+
+        def save(logins):
+            # Пользователь входит снова, пока перенос еще не завершился
+            self.redis.hset(last_login.KEY, self.user.pk, newer)
+            raise DatabaseError
+
+        with mock.patch("users.last_login.save", side_effect=save):
+            with self.assertRaises(DatabaseError):
+                last_login.flush()
+
+        # Вход во время неудачного переноса не перезаписан прежним значением
+        self.assertEqual(float(self.redis.hget(last_login.KEY, self.user.pk)), newer)
+
+    def test_disabled(self):
+        """Тестирование немедленной записи времени входа без буфера."""
+
+        with mock.patch("users.last_login.settings.LAST_LOGIN_BUFFER_ENABLED", False):
+            self.login()
+            self.assertEqual(tasks.flush_last_login(), 0)
+
+        self.assertEqual(self.redis.exists(last_login.KEY), 0)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportUsersTestCase(TestCase):
+    """Класс для тестирования команды import_users."""
+
+    def setUp(self):
+        """Метод для заполнения первичных данных."""
+
+        User.objects.create(email="existing@email.com")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def call(self, path, *args):
+        stdout = io.StringIO()
+        call_command("import_users", path, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_import_csv(self):
+        """Тестирование импорта из CSV с дубликатами и ошибками."""
+
+        path = self.write(
+            "users.csv",
+            "email,password,city\n"
+            "user_1@EMAIL.com,123456,Москва\n"
+            "existing@email.com,123456,\n"
+            "user_1@email.com,654321,\n"
+            "не почта,123456,\n"
+            "user_2@email.com,,Казань\n",
+        )
+        report = os.path.join(self.directory.name, "report.csv")
+
+        output = self.call(path, "--workers", "1", "--report", report)
+
+        self.assertIn("Создано пользователей: 2, дубликатов: 2, ошибок: 1", output)
+        user = User.objects.get(email="user_1@email.com")
+        self.assertTrue(user.check_password("123456"))
+        self.assertEqual(user.city, "Москва")
+        self.assertFalse(
+            User.objects.get(email="user_2@email.com").has_usable_password()
+        )
+        with open(report, newline="") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(
+            sorted((row["line"], row["reason"]) for row in rows),
+            [("3", "duplicate"), ("4", "duplicate"), ("5", "invalid")],
+        )
+
+    def test_import_jsonl_in_chunks(self):
+        """Тестирование импорта из JSONL по частям в пуле процессов."""
+
+        lines = [
+            json.dumps({"email": f"user_{i}@email.com", "password": f"pass_{i}"})
+            for i in range(7)
+        ]
+        path = self.write("users.jsonl", "\n".join(lines + ["[]", "{"]) + "\n")
+
+        with mock.patch.object(
+            provisioning, "import_chunk", wraps=provisioning.import_chunk
+        ) as import_chunk:
+            output = self.call(path, "--chunk-size", "3", "--workers", "2")
+
+        self.assertEqual(import_chunk.call_count, 3)
+        self.assertIn("Создано пользователей: 7, дубликатов: 0, ошибок: 2", output)
+        self.assertTrue(
+            User.objects.get(email="user_6@email.com").check_password("pass_6")
+        )
+
+    def test_import_concurrent_duplicate(self):
+        """Тестирование почты, добавленной параллельно после проверки дубликатов:
+        строка не считается созданной и попадает в отчет как дубликат."""
+
+        def hash_passwords(passwords):
+            User.objects.create(email="user_1@email.com")
+            return [make_password(password) for password in passwords]
+
+        on_rejected = mock.Mock()
+        stats = provisioning.import_chunk(
+            [(1, {"email": "user_1@email.com"}), (2, {"email": "user_2@email.com"})],
+            hash_passwords,
+            batch_size=1000,
+            on_rejected=on_rejected,
+        )
+
+        self.assertEqual(stats, {provisioning.CREATED: 1, provisioning.DUPLICATE: 1})
+        on_rejected.assert_called_once_with(
+            1, "user_1@email.com", provisioning.DUPLICATE, []
+        )
+
+    def test_unknown_format(self):
+        """Тестирование файла неизвестного формата."""
+
+        path = self.write("users.txt", "")
+        with self.assertRaises(CommandError):
+            self.call(path)